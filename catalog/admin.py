@@ -1,11 +1,23 @@
-from django.contrib import admin
-from .models import Author, Language, Genre, Book, BookInstance
+from django.contrib import admin, messages
+from .models import Author, Language, Genre, Book, BookInstance, Hold, CatalogJob, LoanReminder, Loan
+from .models import ArchivedBookInstance, ArchivedLoan
 from reversion.admin import VersionAdmin
+from . import inventory
+
+class MinimalWriteAdmin(VersionAdmin):
+    """VersionAdmin that UPDATEs only the changed columns of an edited object, and skips the save (and so the
+    signals and the revision) when nothing changed. See TimestampedModel.save_changes() in models.py."""
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            obj.save_changes()
+        else:
+            super().save_model(request, obj, form, change)
 
 # Define the admin class
 # Original syntax: admin.site.register(Author)
 @admin.register(Author)
-class AuthorAdmin(VersionAdmin):
+class AuthorAdmin(MinimalWriteAdmin):
     list_display = ('last_name', 'first_name', 'date_of_birth', 'date_of_death')
     fields = ['first_name', 'last_name', ('date_of_birth', 'date_of_death')]
     #exclude = ['date_of_death']
@@ -16,15 +28,16 @@ class BooksInstanceInline(admin.TabularInline):
 
 # Original syntax: admin.site.register(Book)
 @admin.register(Book)
-class BookAdmin(VersionAdmin):
+class BookAdmin(MinimalWriteAdmin):
     list_display = ('title', 'author', 'display_genre')
     inlines = [BooksInstanceInline]
 
 # Original syntax: admin.site.register(BookInstance)
 @admin.register(BookInstance)
-class BookInstanceAdmin(VersionAdmin):
+class BookInstanceAdmin(MinimalWriteAdmin):
     list_display = ('book', 'status', 'borrower', 'due_back', 'id')
     list_filter = ('status', 'due_back')
+    actions = ['mark_available', 'mark_maintenance']
 
     fieldsets = (
         (None, {
@@ -35,6 +48,64 @@ class BookInstanceAdmin(VersionAdmin):
         }),
     )
 
+    # Bulk status changes in a few queries per 500 copies instead of a save() per copy (see catalog/inventory.py).
+    # Reserved copies are left alone.
+    @admin.action(description='Mark selected copies as available', permissions=['change'])
+    def mark_available(self, request, queryset):
+        changed = inventory.set_status(queryset.values_list('pk', flat=True), 'a')
+        self.message_user(request, f'{changed} copies marked as available.', messages.SUCCESS)
+
+    @admin.action(description='Mark selected copies as in maintenance', permissions=['change'])
+    def mark_maintenance(self, request, queryset):
+        changed = inventory.set_status(queryset.values_list('pk', flat=True), 'm')
+        self.message_user(request, f'{changed} copies marked as in maintenance.', messages.SUCCESS)
+
+@admin.register(Hold)
+class HoldAdmin(admin.ModelAdmin):
+    list_display = ('book', 'patron', 'ticket', 'status', 'placed_at', 'copy')
+    list_filter = ('status',)
+    raw_id_fields = ('book', 'patron', 'copy')
+
+@admin.register(CatalogJob)
+class CatalogJobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'attempts', 'max_attempts', 'run_after', 'started_at', 'finished_at')
+    list_filter = ('status', 'name')
+    readonly_fields = ('attempts', 'created_at', 'started_at', 'finished_at', 'result', 'last_error')
+
+@admin.register(LoanReminder)
+class LoanReminderAdmin(admin.ModelAdmin):
+    list_display = ('borrower', 'book_instance', 'due_back', 'kind', 'sent_at')
+    list_filter = ('kind', 'sent_at')
+    raw_id_fields = ('book_instance', 'borrower')
+
+@admin.register(Loan)
+class LoanAdmin(admin.ModelAdmin):
+    list_display = ('book', 'borrower', 'borrowed_at', 'returned_at', 'book_instance')
+    list_filter = ('returned_at',)
+    raw_id_fields = ('book_instance', 'book', 'borrower')
+
+class ReadOnlyAdmin(admin.ModelAdmin):
+    """ModelAdmin that can only view objects (the archive is changed by catalog/archive.py only)."""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(ArchivedBookInstance)
+class ArchivedBookInstanceAdmin(ReadOnlyAdmin):
+    list_display = ('id', 'book', 'imprint', 'status', 'retired_at', 'archived_at')
+    search_fields = ('=id', 'book__title')
+
+@admin.register(ArchivedLoan)
+class ArchivedLoanAdmin(ReadOnlyAdmin):
+    list_display = ('book', 'borrower', 'borrowed_at', 'returned_at', 'book_instance_id')
+    search_fields = ('=book_instance_id', 'borrower__username')
+
 # Register your models here.
 
 #admin.site.register(Author)
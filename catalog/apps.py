@@ -1,6 +1,18 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class CatalogConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "catalog"
+
+    def ready(self):
+        # Connect the catalog signal handlers
+        from . import signals  # noqa: F401
+        # Register the catalog's system checks (python manage.py check --deploy)
+        from . import shared_cache  # noqa: F401
+
+        # Pre-compile templates at worker startup when the production settings profile asks for it
+        if getattr(settings, 'CATALOG_TEMPLATE_WARMUP', False):
+            from .template_warmup import warm_template_cache
+            warm_template_cache()
@@ -0,0 +1,144 @@
+import datetime
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .conditional import catalog_changed
+from .dashboard import invalidate_dashboard
+from .facets import invalidate_facet_counts
+from .models import ArchivedBookInstance, ArchivedLoan, BookInstance, Loan
+
+# Archival of retired copies and old loan history to cold tables (python manage.py archive_catalog).
+#
+# Copies are never deleted, so catalog_bookinstance and catalog_loan only ever grow, and every query on
+# them (the copy lists and their counts, the status/due_back scans of the reminder emails, the dashboard
+# counts) pays for rows nobody looks at any more. Archiving MOVES those rows to ArchivedBookInstance
+# and ArchivedLoan, which keep the same ids and columns:
+#   - retired copies: in maintenance, without a borrower, and unchanged for RETIRED_AFTER_DAYS. Their
+#     whole loan history moves with them.
+#   - old loans: returned more than LOANS_KEPT_DAYS ago.
+# Rows are moved in batches, one transaction per batch, so the tables are never locked for long and an
+# interrupted run can simply be started again. The archive stays readable (catalog/archive/ and the
+# admin), the loan history readers (popularity, recommendations, dashboard) include it, and
+# restore_copies()/restore_loans() move rows back (python manage.py restore_archive).
+
+RETIRED_AFTER_DAYS = 365
+LOANS_KEPT_DAYS = 2 * 365
+CHUNK_SIZE = 500
+
+COPY_FIELDS = ['id', 'book_id', 'imprint', 'due_back', 'status', 'test']
+LOAN_FIELDS = ['id', 'book_instance_id', 'book_id', 'borrower_id', 'borrowed_at', 'returned_at']
+
+
+def retired_copies(days: int = RETIRED_AFTER_DAYS):
+    """The copies that would be archived: in maintenance, not lent, and unchanged for the given number of days."""
+    return BookInstance.objects.filter(
+        status='m',
+        borrower__isnull=True,
+        updated_at__lt=timezone.now() - datetime.timedelta(days=days),
+    )
+
+
+def old_loans(days: int = LOANS_KEPT_DAYS):
+    """The loans that would be archived: returned more than the given number of days ago."""
+    return Loan.objects.filter(returned_at__lt=timezone.now() - datetime.timedelta(days=days))
+
+
+def _chunks(queryset, chunk_size):
+    """Yields lists of primary keys of the queryset, chunk_size at a time (read before any row is moved)."""
+    ids = list(queryset.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(ids), chunk_size):
+        yield ids[start:start + chunk_size]
+
+
+def _move_loans(loans, model) -> set:
+    """Copies the loans' rows into model, deletes them and returns the ids of their borrowers."""
+    rows = list(loans.values(*LOAN_FIELDS))
+    model.objects.bulk_create([model(**row) for row in rows])
+    loans.delete()
+    return {row['borrower_id'] for row in rows}
+
+
+def _copies_restored(borrower_ids) -> None:
+    # bulk_create() doesn't send the post_save signals that normally invalidate these
+    invalidate_facet_counts()
+    catalog_changed()
+    invalidate_dashboard(*borrower_ids)
+
+
+def archive_copies(days: int = RETIRED_AFTER_DAYS, chunk_size: int = CHUNK_SIZE, dry_run: bool = False) -> dict:
+    """Moves retired copies (and their loans) to the archive tables. Returns {'copies': n, 'loans': n}."""
+    copies = retired_copies(days)
+    report = {'copies': 0, 'loans': 0}
+    if dry_run:
+        report['copies'] = copies.count()
+        report['loans'] = Loan.objects.filter(book_instance__in=copies.values('pk')).count()
+        return report
+
+    for chunk in _chunks(copies, chunk_size):
+        with transaction.atomic():
+            # Check again inside the transaction: a copy may have been lent since the ids were read
+            rows = list(retired_copies(days).filter(pk__in=chunk).select_for_update().values(*COPY_FIELDS, 'updated_at'))
+            copy_ids = [row['id'] for row in rows]
+            loans = Loan.objects.filter(book_instance__in=copy_ids)
+            report['loans'] += loans.count()
+            borrower_ids = _move_loans(loans, ArchivedLoan)
+            ArchivedBookInstance.objects.bulk_create(
+                [ArchivedBookInstance(retired_at=row.pop('updated_at'), **row) for row in rows]
+            )
+            # Holds fulfilled with these copies forget them (SET_NULL), their reminders are deleted (CASCADE).
+            # post_delete invalidates the catalog caches.
+            BookInstance.objects.filter(pk__in=copy_ids).delete()
+            report['copies'] += len(copy_ids)
+        invalidate_dashboard(*borrower_ids)
+    return report
+
+
+def archive_loans(days: int = LOANS_KEPT_DAYS, chunk_size: int = CHUNK_SIZE, dry_run: bool = False) -> dict:
+    """Moves old loans to the archive table. Returns {'loans': n}."""
+    loans = old_loans(days)
+    if dry_run:
+        return {'loans': loans.count()}
+
+    moved = 0
+    for chunk in _chunks(loans, chunk_size):
+        with transaction.atomic():
+            moved += len(chunk)
+            borrower_ids = _move_loans(Loan.objects.filter(pk__in=chunk), ArchivedLoan)
+        invalidate_dashboard(*borrower_ids)
+    return {'loans': moved}
+
+
+def restore_copies(copy_ids, chunk_size: int = CHUNK_SIZE) -> dict:
+    """Moves archived copies (and their archived loans) back to the catalog. Returns {'copies': n, 'loans': n}."""
+    report = {'copies': 0, 'loans': 0}
+    copy_ids = list(copy_ids)
+    for start in range(0, len(copy_ids), chunk_size):
+        chunk = copy_ids[start:start + chunk_size]
+        with transaction.atomic():
+            archived = ArchivedBookInstance.objects.filter(pk__in=chunk)
+            # updated_at is set to now (auto_now), so the copy isn't archived again by the next run
+            BookInstance.objects.bulk_create([BookInstance(**row) for row in archived.values(*COPY_FIELDS)])
+            loans = ArchivedLoan.objects.filter(book_instance_id__in=chunk)
+            report['loans'] += loans.count()
+            borrower_ids = _move_loans(loans, Loan)
+            report['copies'] += archived.delete()[0]
+        _copies_restored(borrower_ids)
+    return report
+
+
+def restore_loans(returned_after: datetime.datetime, chunk_size: int = CHUNK_SIZE) -> dict:
+    """Moves the archived loans returned after the given time back to the loan history. Returns {'loans': n}.
+
+    Loans of copies that are themselves archived stay in the archive (restore the copies instead).
+    """
+    loans = ArchivedLoan.objects.filter(
+        Q(book_instance_id__isnull=True) | Q(book_instance_id__in=BookInstance.objects.values('pk')),
+        returned_at__gt=returned_after,
+    )
+    moved = 0
+    for chunk in _chunks(loans, chunk_size):
+        with transaction.atomic():
+            moved += len(chunk)
+            borrower_ids = _move_loans(ArchivedLoan.objects.filter(pk__in=chunk), Loan)
+        invalidate_dashboard(*borrower_ids)
+    return {'loans': moved}
@@ -0,0 +1,147 @@
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+# Online backups of the SQLite database (python manage.py backup_db / restore_db).
+#
+# Copying db.sqlite3 while the workers write to it can produce a corrupt copy (pages from before and
+# after a transaction), and locking the file for the whole copy stops every writer. SQLite's online
+# backup API copies a consistent snapshot instead:
+#   - rollback journal (SQLite's default): a few pages at a time. Each step holds a read lock for a
+#     moment only, and writers go ahead between the steps. If another connection writes during the
+#     backup, SQLite starts the copy again so that the snapshot stays consistent; after MAX_RESTARTS
+#     restarts (a busy database) the rest is copied in one step, which blocks the writers once.
+#   - WAL (PRAGMA journal_mode=WAL, recommended): in one step. In WAL mode readers don't block writers,
+#     so the copy never blocks anyone, and a snapshot read in one step never has to start again.
+#
+# The snapshot is checked with PRAGMA integrity_check before it is kept, and can be gzipped (streamed,
+# so it never has to fit in memory).
+
+PAGES_PER_STEP = 1024
+STEP_SLEEP = 0.005
+MAX_RESTARTS = 10
+CHUNK_SIZE = 1024 * 1024
+
+
+class BackupError(Exception):
+    pass
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def _temporary_file(directory: str, suffix: str) -> str:
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=directory)
+    os.close(fd)
+    return path
+
+
+def _check_integrity(path: str, quick: bool = False) -> None:
+    connection = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        rows = connection.execute('PRAGMA quick_check' if quick else 'PRAGMA integrity_check').fetchall()
+    except sqlite3.DatabaseError as error:  # e.g. "file is not a database"
+        raise BackupError(f'{path} failed the integrity check: {error}') from error
+    finally:
+        connection.close()
+    if rows != [('ok',)]:
+        problems = '; '.join(row[0] for row in rows[:10])
+        raise BackupError(f'{path} failed the integrity check: {problems}')
+
+
+def _copy(source: sqlite3.Connection, target: sqlite3.Connection, pages: int, sleep: float, progress=None) -> dict:
+    """Runs the online backup from source to target. Returns {'pages': n, 'restarts': n, 'steps': n}."""
+    stats = {'pages': 0, 'restarts': 0, 'steps': 0}
+    last_remaining = None
+
+    def on_step(status, remaining, total):
+        nonlocal last_remaining
+        stats['steps'] += 1
+        stats['pages'] = total
+        # The remaining page count only goes up when SQLite restarted the copy
+        if last_remaining is not None and remaining > last_remaining:
+            stats['restarts'] += 1
+            if stats['restarts'] > MAX_RESTARTS:
+                raise _TooManyRestarts
+        last_remaining = remaining
+        if progress:
+            progress(total - remaining, total)
+
+    try:
+        source.backup(target, pages=pages, progress=on_step, sleep=sleep)
+    except _TooManyRestarts:
+        source.backup(target, pages=-1)
+    return stats
+
+
+def backup(source_path: str, target_path: str, pages: int = PAGES_PER_STEP, sleep: float = STEP_SLEEP,
+           compress: bool = None, verify: bool = True, quick: bool = False, progress=None) -> dict:
+    """Writes a consistent snapshot of the live database to target_path (gzipped if it ends with .gz).
+
+    pages is the number of pages copied per step (rollback journal only, see above). Returns {'pages', 'restarts', 'steps', 'bytes', 'seconds'}.
+    """
+    start = time.perf_counter()
+    compress = target_path.endswith('.gz') if compress is None else compress
+    target_dir = os.path.dirname(os.path.abspath(target_path))
+    # Written next to the target and renamed at the end, so that there are never half-written backups
+    snapshot = _temporary_file(target_dir, '.sqlite3')
+    compressed = _temporary_file(target_dir, '.gz') if compress else None
+    try:
+        source = sqlite3.connect(source_path, timeout=30)
+        target = sqlite3.connect(snapshot)
+        try:
+            if source.execute('PRAGMA journal_mode').fetchone()[0] == 'wal':
+                pages = -1
+            stats = _copy(source, target, pages, sleep, progress)
+        finally:
+            target.close()
+            source.close()
+        if verify:
+            _check_integrity(snapshot, quick)
+        if compress:
+            with open(snapshot, 'rb') as raw, open(compressed, 'wb') as out, gzip.GzipFile(fileobj=out, mode='wb') as gz:
+                shutil.copyfileobj(raw, gz, CHUNK_SIZE)
+            os.replace(compressed, target_path)
+        else:
+            os.replace(snapshot, target_path)
+    finally:
+        for path in (snapshot, compressed):
+            if path and os.path.exists(path):
+                os.remove(path)
+    stats['bytes'] = os.path.getsize(target_path)
+    stats['seconds'] = time.perf_counter() - start
+    return stats
+
+
+def restore(backup_path: str, target_path: str, verify: bool = True, quick: bool = False) -> dict:
+    """Replaces the contents of the database at target_path with a backup (gzipped if it ends with .gz).
+
+    The backup is checked first. It is copied into the database through SQLite, in one step, so that
+    connections that are still open see either the old or the new database, never a mix.
+    Returns {'pages', 'seconds'}.
+    """
+    start = time.perf_counter()
+    snapshot = None
+    try:
+        if backup_path.endswith('.gz'):
+            snapshot = _temporary_file(os.path.dirname(os.path.abspath(target_path)), '.sqlite3')
+            with gzip.open(backup_path, 'rb') as gz, open(snapshot, 'wb') as out:
+                shutil.copyfileobj(gz, out, CHUNK_SIZE)
+        source_path = snapshot or backup_path
+        if verify:
+            _check_integrity(source_path, quick)
+        source = sqlite3.connect(f'file:{source_path}?mode=ro', uri=True)
+        target = sqlite3.connect(target_path, timeout=30)
+        try:
+            stats = _copy(source, target, -1, 0)
+        finally:
+            target.close()
+            source.close()
+    finally:
+        if snapshot and os.path.exists(snapshot):
+            os.remove(snapshot)
+    return {'pages': stats['pages'], 'seconds': time.perf_counter() - start}
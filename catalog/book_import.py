@@ -0,0 +1,99 @@
+import csv
+from django.db import IntegrityError, transaction
+from .conditional import catalog_changed
+from .facets import invalidate_facet_counts
+from .models import Author, Book, Language
+from .validators import Compact_ISBN, To_ISBN13
+
+# Bulk import of books from CSV (python manage.py import_books books.csv).
+#
+# Columns: title, author ("Last, First"), isbn, summary, language (optional)
+#
+# Duplicates are detected in batches: the ISBNs of a whole chunk of rows are normalised to ISBN-13 and
+# checked with one indexed IN query on Book.isbn13 (find_existing_isbns), so importing N books costs
+# N / chunk_size lookups instead of N.
+
+
+def find_existing_isbns(isbns, chunk_size: int = 500) -> dict:
+    """Returns {isbn13: book id} for the given ISBNs (any format) that are already in the catalog."""
+    isbn13s = sorted({isbn13 for isbn13 in (To_ISBN13(isbn) for isbn in isbns) if isbn13})
+    existing = {}
+    for start in range(0, len(isbn13s), chunk_size):
+        chunk = isbn13s[start:start + chunk_size]
+        existing.update(Book.objects.filter(isbn13__in=chunk).values_list('isbn13', 'id'))
+    return existing
+
+
+def import_books(rows, chunk_size: int = 500, dry_run: bool = False) -> dict:
+    """Creates books from an iterable of CSV row dicts, skipping invalid ISBNs and duplicates."""
+    stats = {'created': 0, 'duplicates': 0, 'invalid': 0}
+    authors = {}
+    languages = {}
+
+    def get_author(name):
+        last_name, _, first_name = (part.strip() for part in name.partition(','))
+        if (last_name, first_name) not in authors:
+            authors[(last_name, first_name)], _ = Author.objects.get_or_create(last_name=last_name, first_name=first_name)
+        return authors[(last_name, first_name)]
+
+    def get_language(name):
+        if name not in languages:
+            languages[name], _ = Language.objects.get_or_create(name=name)
+        return languages[name]
+
+    def import_chunk(chunk):
+        existing = find_existing_isbns([row['isbn'] for row in chunk], chunk_size)
+        new_books = []
+        for row in chunk:
+            isbn13 = To_ISBN13(row['isbn'])
+            if isbn13 is None:
+                stats['invalid'] += 1
+                continue
+            if isbn13 in existing:
+                stats['duplicates'] += 1
+                continue
+            # Also catches duplicates within the file itself
+            existing[isbn13] = None
+            if dry_run:
+                stats['created'] += 1
+                continue
+            new_books.append(Book(
+                title=row['title'].strip(),
+                author=get_author(row['author']) if row.get('author') else None,
+                summary=row.get('summary', '').strip(),
+                isbn=Compact_ISBN(row['isbn']),
+                # bulk_create() doesn't call save(), so isbn13 has to be set here
+                isbn13=isbn13,
+                language=get_language(row['language'].strip()) if row.get('language') else None,
+            ))
+        try:
+            with transaction.atomic():
+                Book.objects.bulk_create(new_books)
+        except IntegrityError:
+            # A book with one of these ISBNs was saved since find_existing_isbns() (a concurrent import
+            # or edit) and the unique constraint on isbn13 failed: skip those books as duplicates
+            taken = find_existing_isbns([book.isbn13 for book in new_books], chunk_size)
+            stats['duplicates'] += sum(book.isbn13 in taken for book in new_books)
+            new_books = [book for book in new_books if book.isbn13 not in taken]
+            Book.objects.bulk_create(new_books)
+        stats['created'] += len(new_books)
+        if new_books:
+            # bulk_create() sends no post_save signals
+            invalidate_facet_counts()
+            catalog_changed()
+
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            import_chunk(chunk)
+            chunk = []
+    if chunk:
+        import_chunk(chunk)
+    return stats
+
+
+def import_books_csv(path: str, **kwargs) -> dict:
+    """Imports books from the CSV file at 'path' (see import_books)."""
+    with open(path, newline='', encoding='utf-8') as csv_file:
+        return import_books(csv.DictReader(csv_file), **kwargs)
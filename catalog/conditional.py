@@ -0,0 +1,102 @@
+import functools
+import hashlib
+from django.contrib.messages import get_messages
+from django.db import transaction
+from django.db.models import F, Max
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+from .models import Author, Book, BookInstance, CatalogVersion
+
+# HTTP conditional responses (ETag/Last-Modified -> 304 Not Modified) for the catalog pages.
+#
+# Each page has a "latest change" function that runs ONE cheap query: a MAX(updated_at) over the rows
+# the page shows (updated_at is indexed and maintained by TimestampedModel, also on bulk updates and
+# bulk inserts). Deletions and changes to genres, languages and a book's genres don't change any
+# updated_at, so the ETag also contains the catalog version: a number in the database that every change
+# increments once its transaction commits (catalog_changed(), called from catalog/signals.py and the bulk
+# paths). Saving a copy only increments it when the copy's status or book changes: a renewal changes
+# the copy's updated_at, which the pages showing due dates already include. Both come from the database,
+# so every worker process computes the same ETag.
+#
+# The pages show the logged in user's name and staff links, and the controls their permissions allow
+# ({% if perms.catalog.* %}), so the ETag also depends on the user and their permissions, and the
+# responses are only cacheable by the browser (Cache-Control: private), always revalidated (no-cache).
+# The permissions come from the permission cache (keyed by permissions_version(), see
+# catalog/permissions.py) when it is shared, so a grant or a revocation changes the ETag.
+
+
+def changes_version() -> int:
+    """Returns the catalog version (one primary key lookup)."""
+    return CatalogVersion.objects.filter(pk=1).values_list('version', flat=True).first() or 0
+
+
+def _increment_version() -> None:
+    if not CatalogVersion.objects.filter(pk=1).update(version=F('version') + 1):
+        CatalogVersion.objects.get_or_create(pk=1, defaults={'version': 1})
+
+
+def catalog_changed() -> None:
+    """Changes the ETags of all catalog pages once the current transaction (if any) commits."""
+    # After the commit: the row isn't locked for the rest of the transaction, and a page rendered from
+    # the old data never gets the new version
+    transaction.on_commit(_increment_version)
+
+
+def conditional_page(latest_change):
+    """View decorator adding ETag/Last-Modified handling based on latest_change(request, *args, **kwargs)."""
+
+    def get_latest_change(request, *args, **kwargs):
+        # condition() asks for the ETag and the last modified date separately; only query once
+        if not hasattr(request, '_catalog_latest_change'):
+            request._catalog_latest_change = latest_change(request, *args, **kwargs)
+        return request._catalog_latest_change
+
+    def get_etag(request, *args, **kwargs):
+        latest = get_latest_change(request, *args, **kwargs)
+        user = request.user
+        key = ':'.join([
+            str(user.pk), str(user.is_staff), ','.join(sorted(user.get_all_permissions())), str(changes_version()),
+            latest.isoformat() if latest else '', request.get_full_path(),
+        ])
+        return hashlib.md5(key.encode()).hexdigest()
+
+    def decorator(view_func):
+        conditional_view = condition(etag_func=get_etag, last_modified_func=get_latest_change)(view_func)
+
+        @functools.wraps(view_func)
+        def wrapped_view(request, *args, **kwargs):
+            # A pending one-shot notification (e.g. after an edit) is part of the page: never answer 304 then
+            if len(get_messages(request)):
+                response = view_func(request, *args, **kwargs)
+            else:
+                response = conditional_view(request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapped_view
+    return decorator
+
+
+#### Latest change of the rows shown on each page ####
+
+def _latest(*values):
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+def book_list_changed(request, *args, **kwargs):
+    return Book.objects.aggregate(latest=Max('updated_at'))['latest']
+
+def book_detail_changed(request, pk, *args, **kwargs):
+    # The book and its copies, in one query
+    latest = Book.objects.filter(pk=pk).aggregate(book=Max('updated_at'), copies=Max('bookinstance__updated_at'))
+    return _latest(latest['book'], latest['copies'])
+
+def author_list_changed(request, *args, **kwargs):
+    return Author.objects.aggregate(latest=Max('updated_at'))['latest']
+
+def author_detail_changed(request, pk, *args, **kwargs):
+    # The author and their books, in one query
+    latest = Author.objects.filter(pk=pk).aggregate(author=Max('updated_at'), books=Max('book__updated_at'))
+    return _latest(latest['author'], latest['books'])
+
+def bookinstance_list_changed(request, *args, **kwargs):
+    return BookInstance.objects.aggregate(latest=Max('updated_at'))['latest']
@@ -0,0 +1,93 @@
+import datetime
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from .models import ArchivedLoan, BookInstance, Hold, Loan
+
+# The patron dashboard (mybooks/): current loans, due soon, overdue, holds and loan history counts.
+#
+# However many loans a patron has had, the dashboard costs a fixed number of queries:
+#   - ONE query for all the counts (a correlated COUNT subquery per figure, on the patron's user row)
+#   - ONE query for the current loans with their book titles (a join, not a query per row)
+# Both are cached per patron. Every change to one of the patron's copies or holds bumps the patron's
+# version number, which is part of the cache key (see catalog/signals.py). The date is part of the key
+# as well, because "due soon" and "overdue" change at midnight without anything being saved.
+
+DUE_SOON_DAYS = 3
+DASHBOARD_CACHE_TIMEOUT = 60 * 60
+
+
+def _version_key(user_id) -> str:
+    return f'catalog:dashboard:version:{user_id}'
+
+
+def invalidate_dashboard(*user_ids) -> None:
+    """Invalidates the cached dashboards of the given users (None values are ignored)."""
+    for user_id in {user_id for user_id in user_ids if user_id is not None}:
+        try:
+            cache.incr(_version_key(user_id))
+        except ValueError:
+            cache.set(_version_key(user_id), 1, None)
+
+
+def _count(queryset, owner_field: str):
+    """COUNT(*) of the queryset's rows belonging to the outer user row, as a subquery expression."""
+    rows = (
+        queryset.filter(**{owner_field: OuterRef('pk')})
+        .order_by()
+        .values(owner_field)
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    return Coalesce(Subquery(rows), Value(0))
+
+
+def _compute_summary(user_id, today: datetime.date) -> dict:
+    on_loan = BookInstance.objects.filter(status='o')
+    return (
+        User.objects.filter(pk=user_id)
+        .annotate(
+            on_loan=_count(on_loan, 'borrower'),
+            due_soon=_count(on_loan.filter(
+                due_back__gte=today, due_back__lte=today + datetime.timedelta(days=DUE_SOON_DAYS)), 'borrower'),
+            overdue=_count(on_loan.filter(due_back__lt=today), 'borrower'),
+            holds_waiting=_count(Hold.objects.filter(status='w'), 'patron'),
+            holds_ready=_count(Hold.objects.filter(status='f'), 'patron'),
+            # Old loans moved to the archive (see catalog/archive.py) still count, they have all been returned
+            loans_total=_count(Loan.objects.all(), 'borrower') + _count(ArchivedLoan.objects.all(), 'borrower'),
+            loans_returned=(_count(Loan.objects.filter(returned_at__isnull=False), 'borrower')
+                            + _count(ArchivedLoan.objects.filter(returned_at__isnull=False), 'borrower')),
+        )
+        .values('on_loan', 'due_soon', 'overdue', 'holds_waiting', 'holds_ready', 'loans_total', 'loans_returned')
+        .get()
+    )
+
+
+def _compute_current_loans(user_id, today: datetime.date) -> list:
+    loans = list(
+        BookInstance.objects.filter(borrower=user_id, status='o')
+        .order_by('due_back')
+        .values('id', 'due_back', 'book_id', 'book__title')
+    )
+    due_soon_limit = today + datetime.timedelta(days=DUE_SOON_DAYS)
+    for loan in loans:
+        due_back = loan['due_back']
+        loan['is_overdue'] = bool(due_back and due_back < today)
+        loan['is_due_soon'] = bool(due_back and today <= due_back <= due_soon_limit)
+    return loans
+
+
+def patron_dashboard(user, today=None) -> dict:
+    """Returns {'summary': {...counts...}, 'loans': [...current loans...]} for the user, from the cache if possible."""
+    today = today or datetime.date.today()
+    version = cache.get_or_set(_version_key(user.pk), 1, None)
+    cache_key = f'catalog:dashboard:{user.pk}:{version}:{today.isoformat()}'
+    dashboard = cache.get(cache_key)
+    if dashboard is None:
+        dashboard = {
+            'summary': _compute_summary(user.pk, today),
+            'loans': _compute_current_loans(user.pk, today),
+        }
+        cache.set(cache_key, dashboard, DASHBOARD_CACHE_TIMEOUT)
+    return dashboard
@@ -0,0 +1,134 @@
+from django.core.cache import cache
+from django.db.models import Count, Exists, OuterRef
+from django.utils.http import urlencode
+from .models import Book, BookInstance
+
+# Faceted browsing for the book list (books/?genre=1&language=2&author=3&available=1).
+#
+# Each facet's counts come from ONE grouped query over the books matching the other selected filters
+# (so patrons can see how many books they would get by switching a facet value). The counts are cached
+# per filter combination; any change to the catalog bumps a version number that is part of every cache
+# key, which invalidates them all at once (see catalog/signals.py). The bulk paths, which send no signals
+# (imports, bulk status changes, archive restores), call invalidate_facet_counts() themselves. The
+# version number has to be in a cache shared by all the processes (see catalog/shared_cache.py).
+
+FACET_PARAMS = ('genre', 'language', 'author', 'available')
+FACETS_VERSION_KEY = 'catalog:facets:version'
+FACETS_CACHE_TIMEOUT = 60 * 60
+
+
+def selected_filters(query_params) -> dict:
+    """Returns the valid facet filters from the request's GET parameters, e.g. {'genre': 2, 'available': 1}."""
+    filters = {}
+    for param in FACET_PARAMS:
+        value = query_params.get(param, '')
+        if value.isdigit():
+            filters[param] = int(value)
+    if filters.get('available') != 1:
+        filters.pop('available', None)
+    return filters
+
+
+def _available_copy():
+    return Exists(BookInstance.objects.filter(book=OuterRef('pk'), status='a'))
+
+
+def filter_books(books, filters: dict):
+    """Applies the facet filters to a Book queryset."""
+    if 'genre' in filters:
+        books = books.filter(genre=filters['genre'])
+    if 'language' in filters:
+        books = books.filter(language=filters['language'])
+    if 'author' in filters:
+        books = books.filter(author=filters['author'])
+    if 'available' in filters:
+        books = books.filter(_available_copy())
+    return books
+
+
+def _compute_facet_counts(filters: dict) -> dict:
+    def books_without(param):
+        # Each facet is counted over the books matching all the OTHER selected filters
+        return filter_books(Book.objects.order_by(), {key: value for key, value in filters.items() if key != param})
+
+    genres = (
+        books_without('genre').filter(genre__isnull=False)
+        .values_list('genre__id', 'genre__name')
+        .annotate(count=Count('pk', distinct=True))
+        .order_by('genre__name')
+    )
+    languages = (
+        books_without('language').filter(language__isnull=False)
+        .values_list('language__id', 'language__name')
+        .annotate(count=Count('pk'))
+        .order_by('language__name')
+    )
+    authors = (
+        books_without('author').filter(author__isnull=False)
+        .values_list('author__id', 'author__last_name', 'author__first_name')
+        .annotate(count=Count('pk'))
+        .order_by('author__last_name', 'author__first_name')
+    )
+    availability = dict(
+        books_without('available')
+        .annotate(is_available=_available_copy())
+        .values_list('is_available')
+        .annotate(count=Count('pk'))
+        .order_by()
+    )
+
+    return {
+        'genre': [(pk, name, count) for pk, name, count in genres],
+        'language': [(pk, name, count) for pk, name, count in languages],
+        'author': [(pk, f'{last_name}, {first_name}', count) for pk, last_name, first_name, count in authors],
+        'available': [(1, 'Available now', availability.get(True, 0))],
+    }
+
+
+def facets_version() -> int:
+    """Returns the current version number of the cached facet counts."""
+    return cache.get_or_set(FACETS_VERSION_KEY, 1, None)
+
+
+def invalidate_facet_counts() -> None:
+    """Invalidates every cached facet count (called from catalog/signals.py when the catalog changes)."""
+    try:
+        cache.incr(FACETS_VERSION_KEY)
+    except ValueError:
+        # The version key was evicted, so there is nothing cached under the old version anyway
+        cache.set(FACETS_VERSION_KEY, 1, None)
+
+
+def facet_counts(filters: dict) -> dict:
+    """Returns (and caches) the facet counts for the given filter combination."""
+    key = f"catalog:facets:{facets_version()}:{urlencode(sorted(filters.items()))}"
+    counts = cache.get(key)
+    if counts is None:
+        counts = _compute_facet_counts(filters)
+        cache.set(key, counts, FACETS_CACHE_TIMEOUT)
+    return counts
+
+
+def facet_options(filters: dict) -> list:
+    """Returns the facets for the book list template as (title, options) pairs.
+
+    Each option is a dict with its label, count, whether it is selected and the query string that
+    toggles it.
+    """
+    titles = {'genre': 'Genre', 'language': 'Language', 'author': 'Author', 'available': 'Availability'}
+    facets = []
+    for param, values in facet_counts(filters).items():
+        options = []
+        for pk, label, count in values:
+            selected = filters.get(param) == pk
+            toggled = {key: value for key, value in filters.items() if key != param}
+            if not selected:
+                toggled[param] = pk
+            options.append({
+                'label': label,
+                'count': count,
+                'selected': selected,
+                'query': urlencode(sorted(toggled.items())),
+            })
+        facets.append((titles[param], options))
+    return facets
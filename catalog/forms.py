@@ -1,10 +1,11 @@
-from datetime import datetime
+import datetime
 from django import forms
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
 from django.forms import ModelForm # For class RenewBookModelForm
 from catalog.models import BookInstance
 from catalog.models import Author
+from catalog.models import Book
 from .validators import *
 from django.contrib.auth.models import User
 
@@ -20,7 +21,8 @@ class RenewBookForm(forms.Form):
     new_due_date = forms.DateField(
         label = "New Due Date",
         required = True,
-        widget = forms.DateInput(attrs={'placeholder': (datetime.date.today() + datetime.timedelta(weeks=3))}),
+        # The placeholder date is filled in by __init__() below (computing it here would freeze it at import time)
+        widget = forms.DateInput(),
         validators = [
             # The Check_MinDateValue and Check_MaxDateValue functions take datetime.date as an argument and either errors or returns bool True.
             # In this context, they automatically use whatever is typed into this forms.DateField field as it's datetime.date argument
@@ -40,15 +42,21 @@ class RenewBookForm(forms.Form):
         help_text = "Enter a date between now and 4 weeks (default 3).",
     )
 
-    user_list = User.objects.all().order_by('last_name')
     # This is a form field
     new_borrower = CustomUserChoiceField(
-        queryset = user_list, # Queryset of User objects
+        queryset = User.objects.none(), # Replaced by the real queryset of User objects in __init__() below
         required = True,
         empty_label = "Select a user",  # Optional: Add a default empty label
         label = "Choose a User",
     )
 
+    def __init__(self, *args, **kwargs):
+        super(RenewBookForm, self).__init__(*args, **kwargs)
+
+        # Per-form work that used to run once at import time (when the module was loaded by the worker)
+        self.fields['new_due_date'].widget.attrs['placeholder'] = datetime.date.today() + datetime.timedelta(weeks=3)
+        self.fields['new_borrower'].queryset = User.objects.order_by('last_name')
+
     # The above validators handle this logic already, so we don't really need this. We can just call the .new_due_date attribute in our View
     '''
     def clean_new_due_date(self):
@@ -78,15 +86,14 @@ class RenewBookModelForm(forms.ModelForm):
             'borrower': _('New Borrower'),
             'status': _('Status')
         },
-        widgets = {
-            'new_due_date': forms.DateInput(
-                attrs = {
-                    'placeholder': (datetime.date.today() + datetime.timedelta(weeks=3))
-                }
-            ),
-        },
         help_texts = {'due_back': _('Enter a date between now and 4 weeks (default 3).'), 'status': _('')}
 
+    def __init__(self, *args, **kwargs):
+        super(RenewBookModelForm, self).__init__(*args, **kwargs)
+
+        # Computed per form rather than at import time so the placeholder date never goes stale
+        self.fields['due_back'].widget.attrs['placeholder'] = datetime.date.today() + datetime.timedelta(weeks=3)
+
 class AuthorUpdateForm(forms.Form):
     updated_first_name = forms.CharField(
         label = "Updated First Name",
@@ -116,12 +123,12 @@ class AuthorUpdateForm(forms.Form):
     )
 
     def __init__(self, *args, **kwargs):
-        author_id = kwargs.pop('author_id', None)
+        # The view passes the Author it already fetched, so the form doesn't query it again
+        author = kwargs.pop('author', None)
         super(AuthorUpdateForm, self).__init__(*args, **kwargs)
 
-        # Now you can use the author_id to fetch the author and pre-fill the form fields
-        if author_id is not None:
-            author = Author.objects.get(pk=author_id)
+        # Pre-fill the form fields (has_changed() compares the submitted data with these)
+        if author is not None:
             self.fields['updated_first_name'].initial = author.first_name
             self.fields['updated_last_name'].initial = author.last_name
             self.fields['updated_date_of_birth'].initial = author.date_of_birth
@@ -180,3 +187,34 @@ class BookInstanceUpdateForm(forms.ModelForm):
         widget=forms.DateInput(attrs={'type': 'date'}),
     )
 
+
+class BookModelForm(forms.ModelForm):
+    class Meta:
+        model = Book
+        fields = ['title', 'author', 'summary', 'isbn', 'genre', 'language']
+
+    # Accept ISBNs the way they are printed/scanned (with hyphens or spaces); clean_isbn() checks and compacts them
+    isbn = forms.CharField(
+        label = "ISBN",
+        max_length = 17,
+        help_text = "ISBN-10 or ISBN-13, hyphens optional",
+    )
+
+    def clean_isbn(self):
+        # Older books may have an ISBN that isn't valid: they can still be edited as long as it isn't changed
+        if self.instance.pk is not None and 'isbn' not in self.changed_data:
+            return self.cleaned_data['isbn']
+
+        ISBNValidator()(self.cleaned_data['isbn'])
+        isbn = Compact_ISBN(self.cleaned_data['isbn'])
+
+        # Catch the same book entered as ISBN-10 vs ISBN-13 (or with/without hyphens) here, with a
+        # single indexed lookup, instead of relying on the IntegrityError from the unique isbn column
+        duplicates = Book.objects.filter(isbn13=To_ISBN13(isbn))
+        if self.instance.pk is not None:
+            duplicates = duplicates.exclude(pk=self.instance.pk)
+        duplicate = duplicates.only('id', 'title').first()
+        if duplicate is not None:
+            raise ValidationError(_('This ISBN is already in the catalog: %(title)s'), params={'title': duplicate.title})
+
+        return isbn
@@ -0,0 +1,125 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from .models import Book, BookInstance, Hold
+
+# Hold queue ("reservations") for books whose copies are all on loan.
+#
+# Every book hands out increasing ticket numbers (Book.hold_tickets_issued), so each book's queue is
+# simply its waiting holds ordered by ticket. With the (book, status, ticket) index:
+#   - the next patron in line is a single index lookup (O(log n)), never a table scan
+#   - a patron's queue position is an index range count over the holds ahead of their ticket,
+#     computed for all of a patron's holds in the same query that loads them (see with_queue_position)
+
+
+def place_hold(book: Book, patron) -> Hold:
+    """Puts the patron in the queue for the book and returns their hold.
+
+    Placing a hold twice returns the existing waiting hold. If a copy of the book is available, the
+    hold is fulfilled straight away by reserving that copy for the patron.
+    """
+    with transaction.atomic():
+        existing = Hold.objects.filter(book=book, patron=patron, status='w').first()
+        if existing is not None:
+            return existing
+
+        try:
+            # In a savepoint: a concurrent request from the same patron (e.g. a double click) may have
+            # placed the hold since the check above, and the one-waiting-hold constraint then fails
+            with transaction.atomic():
+                # Atomically take the next ticket number for this book
+                Book.objects.filter(pk=book.pk).update(hold_tickets_issued=F('hold_tickets_issued') + 1)
+                ticket = Book.objects.filter(pk=book.pk).values_list('hold_tickets_issued', flat=True).get()
+                hold = Hold.objects.create(book=book, patron=patron, ticket=ticket)
+        except IntegrityError:
+            return Hold.objects.get(book=book, patron=patron, status='w')
+
+        available_copy = (
+            BookInstance.objects.select_for_update()
+            .filter(book=book, status='a')
+            .order_by()
+            .first()
+        )
+        if available_copy is not None:
+            assign_next_hold(available_copy)
+            hold.refresh_from_db()
+    return hold
+
+
+def cancel_hold(hold: Hold) -> None:
+    """Takes the patron out of the queue. A copy that was reserved for them goes to the next patron in line."""
+    with transaction.atomic():
+        reserved_copy = hold.copy if hold.status == 'f' else None
+        hold.status = 'c'
+        hold.save(update_fields=['status'])
+
+        if reserved_copy is not None and reserved_copy.status == 'r' and reserved_copy.borrower_id == hold.patron_id:
+            # Making the copy available again hands it to the next waiting patron (see catalog/signals.py)
+            reserved_copy.status = 'a'
+            reserved_copy.borrower = None
+            reserved_copy.save(update_fields=['status', 'borrower'])
+
+
+def assign_next_hold(copy: BookInstance):
+    """Reserves an available copy for the first patron waiting for its book.
+
+    Returns the fulfilled Hold, or None if nobody is waiting (the copy then stays available).
+    """
+    with transaction.atomic():
+        next_hold = (
+            Hold.objects.select_for_update()
+            .filter(book_id=copy.book_id, status='w')
+            .order_by('ticket')
+            .first()
+        )
+        if next_hold is None:
+            return None
+
+        copy.status = 'r'
+        copy.borrower_id = next_hold.patron_id
+        copy.save(update_fields=['status', 'borrower'])
+
+        next_hold.status = 'f'
+        next_hold.copy = copy
+        next_hold.save(update_fields=['status', 'copy'])
+    return next_hold
+
+
+def close_reserved_hold(copy: BookInstance, created: bool = False) -> None:
+    """Closes the fulfilled hold of a copy that is no longer reserved for the hold's patron.
+
+    The hold is collected if the copy was lent to the patron, and expired otherwise (the copy was
+    released, reserved for someone else, lost...).
+    """
+    if created or getattr(copy, '_loaded_status', None) != 'r':
+        return
+    if copy.status == 'r':
+        # Still reserved: only a change of borrower ends the reservation. The borrower is unknown if it
+        # wasn't loaded (.only()); then it can't have been changed either.
+        if 'borrower_id' not in copy.__dict__ or getattr(copy, '_loaded_borrower_id', None) == copy.borrower_id:
+            return
+
+    for hold in Hold.objects.filter(copy=copy, status='f'):
+        collected = copy.status == 'o' and copy.borrower_id == hold.patron_id
+        hold.status = 'o' if collected else 'e'
+        # save() rather than update(): the patron's dashboard is invalidated by the Hold post_save signal
+        hold.save(update_fields=['status'])
+
+
+def expire_reserved_holds(copy: BookInstance) -> None:
+    """Expires the fulfilled holds of a copy that is being deleted."""
+    for hold in Hold.objects.filter(copy=copy, status='f'):
+        hold.status = 'e'
+        hold.save(update_fields=['status'])
+
+
+def with_queue_position(holds):
+    """Annotates a Hold queryset with 'queue_position' (1 = next in line) for its waiting holds."""
+    holds_ahead = (
+        Hold.objects.filter(book=OuterRef('book'), status='w', ticket__lt=OuterRef('ticket'))
+        .order_by()
+        .values('book')
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    return holds.annotate(queue_position=Coalesce(Subquery(holds_ahead), Value(0)) + 1)
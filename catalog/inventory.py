@@ -0,0 +1,130 @@
+import uuid
+from django.db import transaction
+from .conditional import catalog_changed
+from .dashboard import invalidate_dashboard
+from .facets import invalidate_facet_counts
+from .holds import assign_next_hold
+from .live import publish_copy_change
+from .loans import close_loans
+from .models import BookInstance, Hold
+
+# Bulk status changes for BookInstance, and the inventory audit (python manage.py inventory_audit scans.txt).
+#
+# Changing the status of thousands of copies one save() at a time costs several queries per copy (the
+# save itself, the signal handlers, the revision). Here the copies are handled in chunks instead, with
+# one QuerySet.update() per chunk, and the signal handlers' work is done once per chunk:
+#   - the open loans of copies that were on loan are closed (the copy is back on the shelf)
+#   - copies that become available go to the next patron in their book's hold queue
+#   - the facet counts, page ETags and affected patrons' dashboards are invalidated
+# Reserved copies are never changed: they are set aside for a patron's fulfilled hold.
+#
+# The audit compares the copies that were scanned on the shelves with the database using set
+# operations, one chunk of UUIDs at a time, so it runs at the speed of the scanner rather than of
+# the database.
+
+CHUNK_SIZE = 500
+BULK_STATUSES = ('a', 'm')
+
+
+def _chunks(items, chunk_size):
+    items = list(items)
+    for start in range(0, len(items), chunk_size):
+        yield items[start:start + chunk_size]
+
+
+def set_status(copy_ids, status: str, chunk_size: int = CHUNK_SIZE) -> int:
+    """Sets the status of the given copies ('a' available or 'm' maintenance). Returns the number of copies changed."""
+    if status not in BULK_STATUSES:
+        raise ValueError(f'Copies can only be bulk marked as {" or ".join(BULK_STATUSES)}, not {status!r}')
+
+    changed = 0
+    for chunk in _chunks(copy_ids, chunk_size):
+        with transaction.atomic():
+            copies = (
+                BookInstance.objects.select_for_update()
+                .filter(pk__in=chunk)
+                .exclude(status__in=[status, 'r'])
+                .values_list('id', 'status', 'borrower_id', 'book_id')
+            )
+            copies = list(copies)
+            if not copies:
+                continue
+            ids = [copy_id for copy_id, _, _, _ in copies]
+            on_loan = [copy_id for copy_id, copy_status, _, _ in copies if copy_status == 'o']
+            borrower_ids = {borrower_id for _, _, borrower_id, _ in copies if borrower_id is not None}
+
+            # Nobody borrows an available copy or one in maintenance
+            changed += BookInstance.objects.filter(pk__in=ids).update(status=status, borrower=None, due_back=None)
+            # update() sends no post_save: tell the live pages here, before any copy is reserved below
+            for copy_id, _, _, book_id in copies:
+                publish_copy_change(copy_id, book_id, status)
+            if on_loan:
+                close_loans(on_loan)
+
+            if status == 'a':
+                # Only the copies of books that patrons are waiting for need assign_next_hold()
+                waited_for = set(
+                    Hold.objects.filter(book__in={book_id for _, _, _, book_id in copies}, status='w')
+                    .values_list('book_id', flat=True)
+                    .distinct()
+                )
+                for copy in BookInstance.objects.filter(pk__in=ids, book__in=waited_for):
+                    assign_next_hold(copy)
+
+        invalidate_dashboard(*borrower_ids)
+    if changed:
+        invalidate_facet_counts()
+        catalog_changed()
+    return changed
+
+
+def parse_copy_ids(lines):
+    """Splits scanned lines into (set of valid copy UUIDs, list of lines that aren't UUIDs). Blank lines are ignored."""
+    copy_ids, invalid = set(), []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            copy_ids.add(uuid.UUID(line))
+        except ValueError:
+            invalid.append(line)
+    return copy_ids, invalid
+
+
+def audit(scanned_ids, mark_found: bool = True, mark_missing: bool = False, chunk_size: int = CHUNK_SIZE,
+          dry_run: bool = False) -> dict:
+    """Compares the copies scanned on the shelves with the database and returns a report.
+
+    Report keys (lists of copy UUIDs):
+      - 'unknown': scanned, but not in the catalog
+      - 'found': scanned copies that weren't recorded as available (on loan or in maintenance);
+                 made available if mark_found
+      - 'reserved': scanned copies set aside for a patron's hold (left alone)
+      - 'missing': copies recorded as available that weren't scanned; put in maintenance if mark_missing
+    plus 'scanned' (the number of distinct copies scanned) and 'changed' (the number of copies updated, or
+    that would be updated on a dry run).
+    """
+    scanned_ids = set(scanned_ids)
+    report = {'scanned': len(scanned_ids), 'unknown': [], 'found': [], 'reserved': [], 'missing': [], 'changed': 0}
+
+    # Scanned copies: one indexed IN query per chunk of UUIDs
+    for chunk in _chunks(sorted(scanned_ids), chunk_size):
+        statuses = dict(BookInstance.objects.filter(pk__in=chunk).values_list('id', 'status'))
+        report['unknown'] += [copy_id for copy_id in chunk if copy_id not in statuses]
+        report['found'] += [copy_id for copy_id in chunk if statuses.get(copy_id) in ('o', 'm')]
+        report['reserved'] += [copy_id for copy_id in chunk if statuses.get(copy_id) == 'r']
+
+    # Copies that should be on the shelves, streamed in chunks and diffed against the scans
+    available = BookInstance.objects.filter(status='a').order_by().values_list('id', flat=True)
+    report['missing'] = [copy_id for copy_id in available.iterator(chunk_size=chunk_size * 4)
+                         if copy_id not in scanned_ids]
+
+    if dry_run:
+        report['changed'] = len(report['found']) * mark_found + len(report['missing']) * mark_missing
+    else:
+        if mark_found:
+            report['changed'] += set_status(report['found'], 'a', chunk_size)
+        if mark_missing:
+            report['changed'] += set_status(report['missing'], 'm', chunk_size)
+    return report
@@ -0,0 +1,208 @@
+import logging
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, close_old_connections, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import CatalogJob
+
+logger = logging.getLogger(__name__)
+
+# Lightweight database-backed background task queue for the catalog app. No external broker needed:
+#
+#   1. Register a task (see catalog/tasks.py):
+#          @jobs.task('recompute_catalog_counts')
+#          def recompute_catalog_counts(): ...
+#   2. Queue it from anywhere (a view, a signal handler, the shell):
+#          jobs.enqueue('recompute_catalog_counts')
+#      or, for a refresh that only needs to run once however often it is asked for:
+#          jobs.enqueue_once('recompute_catalog_counts')
+#   3. Run one or more workers:
+#          python manage.py run_catalog_worker --concurrency 4 --mode thread
+#
+# Jobs that raise are retried with exponential backoff until max_attempts is reached.
+
+_registry = {}
+
+
+def task(name):
+    """Decorator registering a function as a task that can be queued with enqueue(name, **kwargs)."""
+    def decorator(func):
+        _registry[name] = func
+        return func
+    return decorator
+
+
+def registered_tasks() -> dict:
+    """Returns the registered tasks by name."""
+    # Importing the module registers the built-in catalog tasks
+    from . import tasks  # noqa: F401
+    return dict(_registry)
+
+
+def enqueue(name: str, *, run_after=None, max_attempts: int = 3, **kwargs) -> CatalogJob:
+    """Queues the task called 'name' to be run by a worker with the given (JSON-serialisable) keyword arguments."""
+    return _create_job(name, kwargs, run_after=run_after, max_attempts=max_attempts)
+
+
+def enqueue_once(name: str, **kwargs) -> CatalogJob:
+    """Like enqueue(), unless a job queued with enqueue_once(name) is already queued or running (which is returned instead)."""
+    pending = CatalogJob.objects.filter(name=name, once=True, status__in=['q', 'r'])
+    job = pending.first()
+    if job is not None:
+        return job
+    try:
+        # In a savepoint: a concurrent request may queue the job since the check above, and the
+        # one-pending-job constraint (catalog_job_once_pending) then fails
+        with transaction.atomic():
+            return _create_job(name, kwargs, once=True)
+    except IntegrityError:
+        # The other job can only have finished since if a worker ran it straight away: queue another
+        return pending.first() or enqueue_once(name, **kwargs)
+
+
+def _create_job(name: str, kwargs: dict, *, run_after=None, max_attempts: int = 3, once: bool = False) -> CatalogJob:
+    if name not in registered_tasks():
+        raise KeyError(f'No catalog task registered as {name!r}')
+    return CatalogJob.objects.create(
+        name=name,
+        kwargs=kwargs,
+        max_attempts=max_attempts,
+        run_after=run_after or timezone.now(),
+        once=once,
+    )
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Backoff before retrying a job that failed 'attempts' times: 10s, 20s, 40s, ... capped at one hour."""
+    return timedelta(seconds=min(10 * 2 ** (attempts - 1), 3600))
+
+
+def claim_next_job():
+    """Atomically marks the next due job as running and returns it, or returns None if no job is due."""
+    now = timezone.now()
+    # Always the primary: a job claimed there may not have reached a read replica yet
+    jobs = CatalogJob.objects.using(DEFAULT_DB_ALIAS)
+    candidates = (
+        jobs.filter(status='q', run_after__lte=now)
+        .order_by('run_after')
+        .values_list('pk', flat=True)[:10]
+    )
+    for pk in candidates:
+        # Only one worker can win this conditional UPDATE, so a job is never run twice at the same time
+        claimed = jobs.filter(pk=pk, status='q').update(
+            status='r', started_at=now, attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return jobs.get(pk=pk)
+    return None
+
+
+def run_job(job: CatalogJob) -> None:
+    """Runs a claimed job and records its outcome."""
+    func = registered_tasks().get(job.name)
+    if func is None:
+        # Retrying can't help, fail straight away
+        job.status = 'f'
+        job.last_error = f'No catalog task registered as {job.name!r}'
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'last_error', 'finished_at'])
+        return
+
+    try:
+        job.result = func(**job.kwargs)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        logger.exception('Catalog job %s failed (attempt %s of %s)', job, job.attempts, job.max_attempts)
+        if job.attempts < job.max_attempts:
+            job.status = 'q'
+            job.run_after = timezone.now() + retry_delay(job.attempts)
+        else:
+            job.status = 'f'
+            job.finished_at = timezone.now()
+    else:
+        job.status = 'd'
+        job.finished_at = timezone.now()
+    try:
+        # In a savepoint, so that a failed save doesn't break the caller's transaction (if any)
+        with transaction.atomic():
+            job.save(update_fields=['status', 'result', 'last_error', 'run_after', 'finished_at'])
+    except (TypeError, ValueError):
+        # The task returned a result that can't be stored as JSON. Without this the job would stay
+        # 'running' until the next worker start (requeue_stale_jobs) and then run again.
+        logger.exception('Catalog job %s returned a result that is not JSON-serialisable', job)
+        job.result = None
+        job.status = 'f'
+        job.last_error = traceback.format_exc()
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'result', 'last_error', 'run_after', 'finished_at'])
+
+
+def requeue_stale_jobs(older_than: timedelta) -> int:
+    """Puts jobs back in the queue that have been 'running' for too long (e.g. their worker was killed)."""
+    return CatalogJob.objects.filter(status='r', started_at__lt=timezone.now() - older_than).update(status='q')
+
+
+def work(poll_interval: float = 1.0, once: bool = False, stop_event=None) -> int:
+    """Runs jobs one at a time until stop_event is set (or, with once=True, until the queue is empty).
+
+    Returns the number of jobs run.
+    """
+    jobs_run = 0
+    try:
+        while stop_event is None or not stop_event.is_set():
+            close_old_connections()
+            job = claim_next_job()
+            if job is None:
+                if once:
+                    break
+                time.sleep(poll_interval)
+                continue
+            run_job(job)
+            jobs_run += 1
+    finally:
+        connections.close_all()
+    return jobs_run
+
+
+def run_worker(concurrency: int = 1, mode: str = 'thread', poll_interval: float = 1.0, once: bool = False,
+               stop_event=None) -> int:
+    """Runs 'concurrency' worker loops in threads or in forked processes and returns the number of jobs run."""
+    if concurrency <= 1:
+        return work(poll_interval, once, stop_event)
+
+    if mode == 'thread':
+        stop_event = stop_event or threading.Event()
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='catalog-worker') as pool:
+            futures = [pool.submit(work, poll_interval, once, stop_event) for _ in range(concurrency)]
+            try:
+                return sum(future.result() for future in futures)
+            except KeyboardInterrupt:
+                stop_event.set()
+                raise
+
+    # mode == 'process': database connections can't be shared with forked children
+    connections.close_all()
+    children = []
+    for _ in range(concurrency):
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                work(poll_interval, once)
+            except KeyboardInterrupt:
+                pass
+            except Exception:
+                logger.exception('Catalog worker process crashed')
+                exit_code = 1
+            finally:
+                os._exit(exit_code)
+        children.append(pid)
+    for pid in children:
+        os.waitpid(pid, 0)
+    # Job counts aren't reported back from the child processes
+    return 0
@@ -0,0 +1,179 @@
+import asyncio
+import contextvars
+import json
+import threading
+from django.db import transaction
+from .models import BookInstance
+
+# Live copy availability: server-sent events (SSE) pushed to the book detail and bookinstances/ pages
+# (see catalog/static/catalog/js/live_copies.js), so patrons and librarians don't have to reload.
+#
+# One CopyEventHub per process fans the changes out. The BookInstance post_save/post_delete signals
+# publish each change once, after the transaction commits (see catalog/signals.py), and the hub puts it
+# in the queue of every subscriber of that book (or of all books). Idle subscribers are coroutines
+# waiting on their queue in the event loop: no database polling and only a keepalive comment every
+# KEEPALIVE_SECONDS so that proxies don't close the connection. Django's ASGI handler also keeps one idle
+# thread per open request (it runs the sync middleware in it), about 60 KiB of memory per stream in all
+# (python manage.py bench_live_subscribers).
+#
+# Django 4.2's ASGI handler doesn't listen for the client disconnecting while it streams a response, and
+# ASGI servers drop what is sent after that without an error, so a stream would run (and keep its
+# subscriber queue and thread) for as long as the process. DisconnectMiddleware (locallibrary/asgi.py)
+# watches for the disconnect and ends the stream of the request, like when a slow client is dropped.
+#
+# The stream needs the ASGI server (locallibrary/asgi.py); under WSGI copy_events() answers 204, which
+# tells the browser not to reconnect. The hub only sees the changes made in its own process: run the
+# site in a single ASGI process, or route catalog/live/ to one process that also serves the writes.
+
+KEEPALIVE_SECONDS = 15
+# Events kept for a slow client; a client that falls further behind is disconnected (and reconnects)
+QUEUE_SIZE = 100
+ALL_BOOKS = None
+STATUS_DISPLAY = dict(BookInstance.LOAN_STATUS)
+
+
+class CopyEventHub:
+    """In-process fan-out of copy status changes to the subscribed event streams."""
+
+    def __init__(self):
+        self.loop = None
+        # {book id (or ALL_BOOKS): set of subscriber queues}, only changed in the event loop's thread
+        self.subscribers = {}
+        self.lock = threading.Lock()
+
+    def subscribe(self, book_id=ALL_BOOKS) -> asyncio.Queue:
+        """Returns the queue of a new subscriber (call from the event loop)."""
+        with self.lock:
+            self.loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.subscribers.setdefault(book_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue, book_id=ALL_BOOKS) -> None:
+        queues = self.subscribers.get(book_id, set())
+        queues.discard(queue)
+        if not queues:
+            self.subscribers.pop(book_id, None)
+
+    def subscriber_count(self) -> int:
+        return sum(len(queues) for queues in self.subscribers.values())
+
+    def publish(self, event: dict) -> None:
+        """Sends an event to the subscribers of its book. Can be called from any thread."""
+        with self.lock:
+            loop = self.loop
+        if loop is None or loop.is_closed() or not self.subscribers:
+            return
+        loop.call_soon_threadsafe(self._dispatch, event)
+
+    def _dispatch(self, event: dict) -> None:
+        for book_id in (event['book_id'], ALL_BOOKS):
+            for queue in list(self.subscribers.get(book_id, ())):
+                try:
+                    queue.put_nowait(event)
+                except asyncio.QueueFull:
+                    # Too slow: drop the subscriber, its stream ends and the browser reconnects
+                    self.unsubscribe(queue, book_id)
+                    end_stream(queue)
+
+
+hub = CopyEventHub()
+
+
+def end_stream(queue: asyncio.Queue) -> None:
+    """Makes the event stream of a subscriber queue end, even if the queue is full."""
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(None)
+
+
+class ClientConnection:
+    """The client connection of an ASGI request, for the event stream of the request."""
+
+    def __init__(self):
+        self.disconnected = False
+        self.queue = None
+
+    def disconnect(self) -> None:
+        self.disconnected = True
+        if self.queue is not None:
+            end_stream(self.queue)
+
+
+# The connection of the current request (set by DisconnectMiddleware)
+client_connection = contextvars.ContextVar('client_connection', default=None)
+
+
+class DisconnectMiddleware:
+    """ASGI middleware ending the event streams of the requests under path_prefix when their client disconnects."""
+
+    def __init__(self, app, path_prefix='/catalog/live/'):
+        self.app = app
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not scope['path'].startswith(self.path_prefix):
+            return await self.app(scope, receive, send)
+        connection = ClientConnection()
+        messages = asyncio.Queue()
+
+        async def watch():
+            # Passes the request body on to Django, then waits for the disconnect
+            while True:
+                message = await receive()
+                messages.put_nowait(message)
+                if message['type'] == 'http.disconnect':
+                    connection.disconnect()
+                    return
+
+        token = client_connection.set(connection)
+        watcher = asyncio.create_task(watch())
+        try:
+            await self.app(scope, messages.get, send)
+        finally:
+            watcher.cancel()
+            client_connection.reset(token)
+
+
+def copy_event(copy_id, book_id, status: str, due_back=None) -> dict:
+    """The event sent for a copy's new status ('deleted' if the copy was deleted)."""
+    return {
+        'id': str(copy_id),
+        'book_id': book_id,
+        'status': status,
+        'status_display': STATUS_DISPLAY.get(status, status.capitalize()),
+        'due_back': due_back.isoformat() if due_back else None,
+    }
+
+
+def publish_copy_change(copy_id, book_id, status: str, due_back=None) -> None:
+    """Publishes a copy's new status once the current transaction (if any) commits."""
+    if not hub.subscribers:
+        return
+    event = copy_event(copy_id, book_id, status, due_back)
+    transaction.on_commit(lambda: hub.publish(event))
+
+
+async def event_stream(book_id=ALL_BOOKS, keepalive: float = None):
+    """Yields the text/event-stream of the copy changes of a book (or of all books)."""
+    keepalive = keepalive or KEEPALIVE_SECONDS
+    connection = client_connection.get()
+    if connection is not None and connection.disconnected:
+        return
+    queue = hub.subscribe(book_id)
+    if connection is not None:
+        connection.queue = queue
+    try:
+        # Tells EventSource to wait 5 seconds before reconnecting
+        yield 'retry: 5000\n\n'
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), keepalive)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            if event is None:
+                return
+            yield f"event: copy\ndata: {json.dumps(event)}\n\n"
+    finally:
+        hub.unsubscribe(queue, book_id)
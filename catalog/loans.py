@@ -0,0 +1,36 @@
+from django.utils import timezone
+from .holds import close_reserved_hold
+from .models import BookInstance, Loan
+
+# Loan history: one Loan row per checkout of a copy, closed (returned_at) when the copy is returned.
+# Recorded from the BookInstance post_save signal (see catalog/signals.py), so it is kept up to date
+# by every view, form and the admin without them knowing about it.
+
+
+def record_loan_change(copy: BookInstance, created: bool = False) -> None:
+    """Opens and/or closes Loan rows after a copy was saved, based on its status and borrower changes."""
+    # A copy reserved for a hold that is lent to the patron (or released) closes the hold
+    close_reserved_hold(copy, created)
+
+    was_on_loan = not created and getattr(copy, '_loaded_status', None) == 'o'
+    is_on_loan = copy.status == 'o' and copy.borrower_id is not None
+
+    if was_on_loan and is_on_loan:
+        # Still on loan: only a change of borrower (e.g. fixed in the admin) starts a new loan.
+        # The borrower is unknown if it wasn't loaded (.only()); then it can't have been changed either.
+        loaded_borrower_id = getattr(copy, '_loaded_borrower_id', None)
+        if 'borrower_id' not in copy.__dict__ or loaded_borrower_id == copy.borrower_id:
+            return
+
+    now = timezone.now()
+    if was_on_loan:
+        close_loans([copy.pk], now)
+    if is_on_loan:
+        Loan.objects.create(book_instance=copy, book_id=copy.book_id, borrower_id=copy.borrower_id, borrowed_at=now)
+
+
+def close_loans(copy_ids, returned_at=None) -> int:
+    """Closes the open loans of the given copies (they were returned). Returns the number of loans closed."""
+    return Loan.objects.filter(book_instance__in=copy_ids, returned_at__isnull=True).update(
+        returned_at=returned_at or timezone.now()
+    )
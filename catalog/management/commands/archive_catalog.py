@@ -0,0 +1,28 @@
+import time
+from django.core.management.base import BaseCommand
+from catalog import archive
+
+class Command(BaseCommand):
+    help = ('Moves retired copies (with their loan history) and old loans to the archive tables, in batches '
+            '(see catalog/archive.py). The archive is shown on catalog/archive/; see also restore_archive.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retired-after-days', type=int, default=archive.RETIRED_AFTER_DAYS,
+                            help='Archive copies in maintenance (and not lent) unchanged for this many days')
+        parser.add_argument('--loans-kept-days', type=int, default=archive.LOANS_KEPT_DAYS,
+                            help='Archive loans returned more than this many days ago')
+        parser.add_argument('--copies-only', action='store_true', help='Do not archive old loans of other copies')
+        parser.add_argument('--loans-only', action='store_true', help='Do not archive retired copies')
+        parser.add_argument('--chunk-size', type=int, default=archive.CHUNK_SIZE, help='Rows moved per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Count what would be archived but move nothing')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        verb = 'Would archive' if options['dry_run'] else 'Archived'
+        if not options['loans_only']:
+            report = archive.archive_copies(options['retired_after_days'], options['chunk_size'], options['dry_run'])
+            self.stdout.write(f"{verb} {report['copies']} retired copies with {report['loans']} loans")
+        if not options['copies_only']:
+            report = archive.archive_loans(options['loans_kept_days'], options['chunk_size'], options['dry_run'])
+            self.stdout.write(f"{verb} {report['loans']} old loans")
+        self.stdout.write(self.style.SUCCESS(f'Done in {time.perf_counter() - start:.1f}s'))
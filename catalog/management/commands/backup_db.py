@@ -0,0 +1,63 @@
+import datetime
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from catalog import backup
+
+class Command(BaseCommand):
+    help = ('Writes a consistent snapshot of the SQLite database while the site keeps running, using SQLite\'s '
+            'online backup API a few pages at a time, and checks its integrity (see catalog/backup.py).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('target', nargs='?',
+                            help='Backup file (default: backups/db-<timestamp>.sqlite3[.gz]); ending in .gz compresses it')
+        parser.add_argument('--database', default='default', help='Database alias (an SQLite database)')
+        parser.add_argument('--gzip', action='store_true', help='Compress the backup (implied by a .gz target)')
+        parser.add_argument('--pages', type=int, default=backup.PAGES_PER_STEP,
+                            help='Pages copied per step; writers only wait for one step (-1: all at once). '
+                                 'WAL databases are copied in one step, which never blocks writers')
+        parser.add_argument('--sleep', type=float, default=backup.STEP_SLEEP, help='Seconds between two steps')
+        parser.add_argument('--no-verify', action='store_true', help='Skip the integrity check of the snapshot')
+        parser.add_argument('--quick', action='store_true', help='Use PRAGMA quick_check instead of integrity_check')
+
+    def handle(self, *args, **options):
+        source = database_path(options['database'])
+        target = options['target']
+        if not target:
+            directory = os.path.join(settings.BASE_DIR, 'backups')
+            os.makedirs(directory, exist_ok=True)
+            target = os.path.join(directory, f'db-{datetime.datetime.now():%Y%m%d-%H%M%S}.sqlite3')
+            if options['gzip']:
+                target += '.gz'
+
+        def progress(done, total):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'  {done}/{total} pages')
+
+        try:
+            stats = backup.backup(
+                source, target,
+                pages=options['pages'],
+                sleep=options['sleep'],
+                compress=options['gzip'] or target.endswith('.gz'),
+                verify=not options['no_verify'],
+                quick=options['quick'],
+                progress=progress,
+            )
+        except backup.BackupError as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS(
+            f"Backed up {source} to {target} in {stats['seconds']:.1f}s: {stats['pages']} pages in {stats['steps']} "
+            f"steps ({stats['restarts']} restarts caused by writes), {stats['bytes'] / 1024 / 1024:.1f} MiB"
+        ))
+
+
+def database_path(alias: str) -> str:
+    """The file of an SQLite database alias (also used by restore_db)."""
+    if alias not in connections.databases:
+        raise CommandError(f'Unknown database {alias!r}')
+    settings_dict = connections.databases[alias]
+    if settings_dict['ENGINE'] != 'django.db.backends.sqlite3':
+        raise CommandError(f'{alias!r} is not an SQLite database: use the database\'s own backup tools')
+    return str(settings_dict['NAME'])
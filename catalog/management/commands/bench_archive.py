@@ -0,0 +1,93 @@
+import datetime
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from catalog import archive
+from catalog.models import Author, Book, BookInstance, Loan
+
+class Rollback(Exception):
+    pass
+
+class Command(BaseCommand):
+    help = ('Times the hot copy and loan queries before and after archiving the retired copies and old loans '
+            '(see catalog/archive.py). The sample data is created inside a transaction that is rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--copies', type=int, default=100_000, help='Number of sample copies')
+        parser.add_argument('--retired', type=float, default=0.9, help='Fraction of the copies that are retired')
+        parser.add_argument('--books', type=int, default=100, help='Number of sample books the copies belong to')
+        parser.add_argument('--repeat', type=int, default=20, help='Runs of each query')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.create_sample_data(options)
+                self.time_queries('Before archiving', options['repeat'])
+                start = time.perf_counter()
+                copies = archive.archive_copies()
+                loans = archive.archive_loans()
+                self.stdout.write(f"Archived {copies['copies']} copies and {copies['loans'] + loans['loans']} loans "
+                                  f'in {time.perf_counter() - start:.1f}s')
+                self.time_queries('After archiving', options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def create_sample_data(self, options):
+        author = Author.objects.create(first_name='Sample', last_name='Author')
+        self.books = Book.objects.bulk_create(
+            Book(title=f'Sample book {i}', author=author, summary='Sample', isbn=f'bench{i:08d}')
+            for i in range(options['books'])
+        )
+        self.borrower = User.objects.create_user('bench-archive-patron')
+        today = datetime.date.today()
+        now = timezone.now()
+        retired = int(options['copies'] * options['retired'])
+        copies = []
+        for i in range(options['copies']):
+            book = self.books[i % len(self.books)]
+            if i < retired:
+                copies.append(BookInstance(book=book, imprint='Sample imprint', status='m'))
+            elif i % 3 == 0:
+                copies.append(BookInstance(book=book, imprint='Sample imprint', status='o', borrower=self.borrower,
+                                           due_back=today + datetime.timedelta(days=i % 21)))
+            else:
+                copies.append(BookInstance(book=book, imprint='Sample imprint', status='a'))
+        # bulk_create() sends no signals: no Loan rows yet
+        BookInstance.objects.bulk_create(copies, batch_size=1000)
+        long_ago = now - datetime.timedelta(days=3 * 365)
+        BookInstance.objects.filter(pk__in=[copy.pk for copy in copies[:retired]]).update(updated_at=long_ago)
+
+        # Every copy was lent once, long ago; the copies on loan now have an open loan as well
+        loans = [
+            Loan(book_instance=copy, book=copy.book, borrower=self.borrower, borrowed_at=long_ago,
+                 returned_at=long_ago + datetime.timedelta(days=14))
+            for copy in copies
+        ]
+        loans += [Loan(book_instance=copy, book=copy.book, borrower=self.borrower, borrowed_at=now)
+                  for copy in copies if copy.status == 'o']
+        Loan.objects.bulk_create(loans, batch_size=1000)
+        self.stdout.write(f'{len(copies)} copies ({retired} retired), {len(loans)} loans')
+
+    def time_queries(self, label, repeat):
+        today = datetime.date.today()
+        book = self.books[0]
+        queries = [
+            ('All copies, count (bookinstances/ paginator)', lambda: BookInstance.objects.count()),
+            ('All copies, first page by due date', lambda: list(BookInstance.objects.select_related('book')[:10])),
+            ('Due in 3 days (reminder emails)', lambda: list(BookInstance.objects.filter(
+                status='o', due_back__gte=today, due_back__lte=today + datetime.timedelta(days=3)))),
+            ('Available copies of a book', lambda: BookInstance.objects.filter(book=book, status='a').count()),
+            ("Patron's current loans", lambda: list(Loan.objects.filter(borrower=self.borrower, returned_at__isnull=True))),
+            ("Patron's returned loans, count", lambda: Loan.objects.filter(
+                borrower=self.borrower, returned_at__isnull=False).count()),
+        ]
+        self.stdout.write(f'{label}:')
+        for name, query in queries:
+            query()  # Warm up
+            start = time.perf_counter()
+            for _ in range(repeat):
+                query()
+            self.stdout.write(f'  {name:<46} {(time.perf_counter() - start) / repeat * 1e3:8.2f} ms')
@@ -0,0 +1,75 @@
+import os
+import sqlite3
+import tempfile
+import time
+import uuid
+from django.core.management.base import BaseCommand
+from catalog.ids import uuid7
+
+class Command(BaseCommand):
+    help = ('Compares insert rate and index size of random (v4) and time-ordered (v7) UUID primary keys, '
+            'stored as text (what UUIDField uses on SQLite) or as 16-byte blobs, in a scratch SQLite database '
+            'shaped like catalog_bookinstance (see catalog/ids.py).')
+
+    VARIANTS = [
+        ('uuid4 char(32)', uuid.uuid4, 'char(32)', lambda key: key.hex),
+        ('uuid7 char(32)', uuid7, 'char(32)', lambda key: key.hex),
+        ('uuid4 blob(16)', uuid.uuid4, 'blob', lambda key: key.bytes),
+        ('uuid7 blob(16)', uuid7, 'blob', lambda key: key.bytes),
+    ]
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help='Rows per variant (e.g. 10000000)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk insert (like bulk_create)')
+        parser.add_argument('--cache-mib', type=int, default=64, help='SQLite page cache size')
+        parser.add_argument('--directory', help='Where to create the scratch databases (default: temp dir)')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{options['rows']:,} rows, bulk inserts of {options['batch_size']}, "
+                          f"{options['cache_mib']} MiB page cache")
+        for label, new_key, column_type, to_db in self.VARIANTS:
+            with tempfile.TemporaryDirectory(dir=options['directory']) as directory:
+                path = os.path.join(directory, 'copies.sqlite3')
+                self.run_variant(label, path, new_key, column_type, to_db, options)
+
+    def run_variant(self, label, path, new_key, column_type, to_db, options):
+        rows, batch_size = options['rows'], options['batch_size']
+        db = sqlite3.connect(path, isolation_level=None)
+        db.execute(f"PRAGMA cache_size = -{options['cache_mib'] * 1024}")
+        db.execute('PRAGMA journal_mode = WAL')
+        db.execute(f'CREATE TABLE copy (id {column_type} NOT NULL PRIMARY KEY, book_id bigint NULL, '
+                   f'imprint varchar(200) NOT NULL, due_back date NULL, status varchar(1) NOT NULL)')
+        db.execute('CREATE INDEX copy_book_idx ON copy (book_id)')
+
+        # Insert rate of the first and of the last tenth of the rows, to show how it changes as the table grows
+        tenth = max(rows // 10, batch_size)
+        rates = []
+        start = section_start = time.perf_counter()
+        for offset in range(0, rows, batch_size):
+            count = min(batch_size, rows - offset)
+            batch = [(to_db(new_key()), (offset + i) % 5000, 'Sample imprint', None, 'a') for i in range(count)]
+            db.execute('BEGIN')
+            db.executemany('INSERT INTO copy VALUES (?, ?, ?, ?, ?)', batch)
+            db.execute('COMMIT')
+            done = offset + count
+            if done % tenth < batch_size or done == rows:
+                now = time.perf_counter()
+                rates.append(tenth / (now - section_start))
+                section_start = now
+        elapsed = time.perf_counter() - start
+
+        index_mib = self.index_size(db, path) / 1024 / 1024
+        file_mib = os.path.getsize(path) / 1024 / 1024
+        db.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        db.close()
+        self.stdout.write(f'{label:<16} {rows / elapsed:9,.0f} rows/s (first 10%: {rates[0]:9,.0f}, '
+                          f'last 10%: {rates[-1]:9,.0f}) | primary key index {index_mib:8.1f} MiB | '
+                          f'database {file_mib:8.1f} MiB')
+
+    def index_size(self, db, path):
+        """Size of the primary key index (dbstat, if SQLite was compiled with it)."""
+        try:
+            (size,) = db.execute("SELECT SUM(pgsize) FROM dbstat WHERE name = 'sqlite_autoindex_copy_1'").fetchone()
+            return size or 0
+        except sqlite3.OperationalError:
+            return float('nan')
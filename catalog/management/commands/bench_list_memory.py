@@ -0,0 +1,58 @@
+import gc
+import time
+import tracemalloc
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from catalog.models import Author, Book
+from catalog.readmodels import iter_book_rows
+
+class Rollback(Exception):
+    pass
+
+class Command(BaseCommand):
+    help = ('Measures per-row memory of full Book instances vs the narrow list projections (tracemalloc). '
+            'The sample books are created inside a transaction that is rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Number of sample books')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        try:
+            with transaction.atomic():
+                self.create_sample_books(rows)
+                self.run_benchmarks(rows)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def create_sample_books(self, rows):
+        author = Author.objects.create(first_name='Sample', last_name='Author')
+        Book.objects.bulk_create(
+            (Book(title=f'Sample book {i}', author=author, summary='x' * 1000, isbn=f'bench{i:08d}') for i in range(rows)),
+            batch_size=1000,
+        )
+
+    def measure(self, label, rows, load):
+        gc.collect()
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = load()
+        elapsed = time.perf_counter() - start
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        assert len(result) >= rows
+        self.stdout.write(f'{label:<48} {current / len(result):8.0f} B/row retained | '
+                          f'{peak / 1024 / 1024:7.1f} MiB peak | {elapsed * 1e3:7.0f} ms')
+        del result
+
+    def run_benchmarks(self, rows):
+        books = Book.objects.filter(isbn__startswith='bench')
+        self.measure('Full Book instances (with select_related author)', rows,
+                     lambda: list(books.select_related('author')))
+        self.measure("BookListView projection (.only())", rows,
+                     lambda: list(books.select_related('author').only('id', 'title', 'author__id', 'author__first_name', 'author__last_name')))
+        self.measure('values_list() tuples', rows,
+                     lambda: list(books.values_list('id', 'title', 'author__first_name', 'author__last_name')))
+        self.measure('BookRow slotted rows (export)', rows,
+                     lambda: list(iter_book_rows(books)))
@@ -0,0 +1,105 @@
+import asyncio
+import gc
+import resource
+import threading
+import time
+from django.core.management.base import BaseCommand
+from catalog import live
+from locallibrary.asgi import application
+
+class Command(BaseCommand):
+    help = ('Opens thousands of idle live copy streams (catalog/live/copies/, see catalog/live.py) through the ASGI '
+            'application and measures their memory, the CPU they use while idle and the time to fan one change '
+            'out to all of them.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscribers', type=int, default=2000, help='Number of open streams')
+        parser.add_argument('--batch', type=int, default=100, help='Streams opened at the same time')
+        parser.add_argument('--books', type=int, default=50, help='Number of different books subscribed to')
+        parser.add_argument('--idle', type=float, default=30, help='Seconds to stay idle')
+
+    def handle(self, *args, **options):
+        asyncio.run(self.run(options))
+
+    def resident_memory(self):
+        """The resident set size of the process in bytes (Linux)."""
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize()
+
+    def scope(self, book_id):
+        query = f'book={book_id}'.encode()
+        return {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': '/catalog/live/copies/', 'raw_path': b'/catalog/live/copies/', 'query_string': query,
+            'root_path': '', 'headers': [(b'host', b'localhost')], 'client': ('127.0.0.1', 50000),
+            'server': ('localhost', 8000),
+        }
+
+    async def run(self, options):
+        subscribers = options['subscribers']
+        disconnect = asyncio.Event()
+        received = [0]
+        all_received = asyncio.Event()
+
+        def make_receive():
+            # The request has no body, then the client stays connected until the end of the benchmark
+            sent_body = False
+
+            async def receive():
+                nonlocal sent_body
+                if not sent_body:
+                    sent_body = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                await disconnect.wait()
+                return {'type': 'http.disconnect'}
+            return receive
+
+        async def send(message):
+            if b'event: copy' in message.get('body', b''):
+                received[0] += 1
+                if received[0] == subscribers:
+                    all_received.set()
+
+        gc.collect()
+        memory_start = self.resident_memory()
+        threads_start = threading.active_count()
+        start = time.perf_counter()
+        tasks = []
+        for n in range(subscribers):
+            tasks.append(asyncio.create_task(application(self.scope(1 + n % options['books']), make_receive(), send)))
+            # Like clients connecting over time rather than all in the same millisecond
+            if len(tasks) % options['batch'] == 0 or len(tasks) == subscribers:
+                while live.hub.subscriber_count() < len(tasks):
+                    await asyncio.sleep(0.01)
+        connect_seconds = time.perf_counter() - start
+        gc.collect()
+        memory = self.resident_memory() - memory_start
+        self.stdout.write(f'{subscribers} streams opened in {connect_seconds:.1f}s: '
+                          f'{memory / subscribers / 1024:.1f} KiB of resident memory and '
+                          f'{(threading.active_count() - threads_start) / subscribers:.2f} threads each')
+
+        # Idle: nothing happens apart from the keepalive comments
+        cpu = resource.getrusage(resource.RUSAGE_SELF)
+        cpu_start = cpu.ru_utime + cpu.ru_stime
+        await asyncio.sleep(options['idle'])
+        cpu = resource.getrusage(resource.RUSAGE_SELF)
+        cpu_seconds = cpu.ru_utime + cpu.ru_stime - cpu_start
+        self.stdout.write(f"Idle for {options['idle']:.0f}s: {cpu_seconds:.2f}s of CPU "
+                          f"({cpu_seconds / options['idle'] * 100:.2f}% of one core, "
+                          f"keepalive every {live.KEEPALIVE_SECONDS}s)")
+
+        # Fan-out: one change per subscribed book, as the post_save signal would publish it
+        start = time.perf_counter()
+        for book_id in range(1, options['books'] + 1):
+            live.hub.publish(live.copy_event('00000000-0000-7000-8000-000000000000', book_id, 'a'))
+        await asyncio.wait_for(all_received.wait(), 60)
+        self.stdout.write(f"{options['books']} changes delivered to all {subscribers} streams in "
+                          f'{(time.perf_counter() - start) * 1e3:.1f} ms')
+
+        # The clients go away: every stream must end on its own (DisconnectMiddleware)
+        start = time.perf_counter()
+        disconnect.set()
+        await asyncio.wait_for(asyncio.gather(*tasks), 60)
+        self.stdout.write(f'All {subscribers} clients disconnected: streams ended in '
+                          f'{(time.perf_counter() - start) * 1e3:.1f} ms, {live.hub.subscriber_count()} subscribers '
+                          f'and {threading.active_count() - threads_start} extra threads left')
@@ -0,0 +1,59 @@
+import time
+from unittest import mock
+from django.contrib.auth.models import Group, Permission, User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from catalog.permissions import PERMISSIONS_VERSION_KEY
+
+class Rollback(Exception):
+    pass
+
+class Command(BaseCommand):
+    help = ('Counts the queries of the staff pages with Django\'s ModelBackend vs the cached permission backend '
+            '(see catalog/permissions.py). The sample librarian is created inside a transaction that is rolled back.')
+
+    PAGES = ['/catalog/', '/catalog/books/', '/catalog/authors/', '/catalog/bookinstances/', '/catalog/borrowed/']
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help='Requests per page')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                librarian = User.objects.create_user('bench-librarian', is_staff=True)
+                librarians = Group.objects.create(name='Bench librarians')
+                librarians.permissions.add(Permission.objects.get(codename='can_mark_returned'))
+                librarian.groups.add(librarians)
+
+                # This command is a single process, so the cache behaves like a shared one here even
+                # if it is the local memory cache of the development settings
+                for label, backends in [
+                    ('ModelBackend', ['django.contrib.auth.backends.ModelBackend']),
+                    ('CachedPermissionBackend', ['catalog.permissions.CachedPermissionBackend',
+                                                 'django.contrib.auth.backends.ModelBackend']),
+                ]:
+                    with override_settings(AUTHENTICATION_BACKENDS=backends, ALLOWED_HOSTS=['testserver']), \
+                            mock.patch('catalog.permissions.cache_is_shared', return_value=True):
+                        self.run_benchmark(label, librarian, options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+        cache.delete(PERMISSIONS_VERSION_KEY)
+
+    def run_benchmark(self, label, librarian, repeat):
+        client = Client()
+        client.force_login(librarian)
+        self.stdout.write(f'{label}:')
+        for page in self.PAGES:
+            client.get(page)  # Warm up (template loading, caches)
+            start = time.perf_counter()
+            with CaptureQueriesContext(connection) as queries:
+                for _ in range(repeat):
+                    response = client.get(page)
+            elapsed = time.perf_counter() - start
+            permission_queries = sum('auth_permission' in query['sql'] for query in queries.captured_queries)
+            self.stdout.write(f'  {page:<26} {response.status_code} | {len(queries) / repeat:5.1f} queries/request '
+                              f'({permission_queries / repeat:.1f} permission) | {elapsed / repeat * 1e3:6.1f} ms')
@@ -0,0 +1,61 @@
+import time
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.template import engines
+from django.template.loader import get_template
+from django.test import RequestFactory
+from catalog.template_warmup import warmup_template_names
+
+class Command(BaseCommand):
+    help = 'Measures first-request (cold) and steady-state template render latency for the catalog pages.'
+
+    # Templates rendered on the most common pages; they can all be rendered with an empty context
+    TEMPLATES = (
+        'index.html',
+        'catalog/book_list.html',
+        'catalog/author_list.html',
+        'catalog/bookinstance_list_borrowed_user.html',
+        'registration/login.html',
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--number', type=int, default=200, help='Steady-state renders per template')
+
+    def handle(self, *args, **options):
+        number = options['number']
+        engine = engines['django'].engine
+        cached_loaders = [loader for loader in engine.template_loaders if hasattr(loader, 'reset')]
+        self.stdout.write(f'Cached template loader enabled: {bool(cached_loaders)}')
+
+        request = RequestFactory().get('/catalog/')
+        request.user = AnonymousUser()
+        request.session = {}
+
+        def reset_cache():
+            for loader in cached_loaders:
+                loader.reset()
+
+        def render(name):
+            return get_template(name).render({}, request)
+
+        # Cost of a full warmup, as done by CatalogConfig.ready() with CATALOG_TEMPLATE_WARMUP = True
+        reset_cache()
+        start = time.perf_counter()
+        for name in warmup_template_names():
+            get_template(name)
+        self.stdout.write(f'Warmup of all catalog/registration templates: {(time.perf_counter() - start) * 1e3:.1f} ms\n')
+
+        for name in self.TEMPLATES:
+            # First request in a fresh worker: nothing compiled yet
+            reset_cache()
+            start = time.perf_counter()
+            render(name)
+            cold = time.perf_counter() - start
+
+            # Steady state: templates (and base_generic.html) come from the cached loader
+            start = time.perf_counter()
+            for _ in range(number):
+                render(name)
+            warm = (time.perf_counter() - start) / number
+
+            self.stdout.write(f'{name:<48} first render: {cold * 1e3:7.2f} ms | steady state: {warm * 1e3:7.2f} ms')
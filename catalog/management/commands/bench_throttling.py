@@ -0,0 +1,97 @@
+import itertools
+import logging
+import math
+import statistics
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+from catalog.models import Book
+from catalog.views import BookListView
+
+class Command(BaseCommand):
+    help = ('Load test of the rate limits (see catalog/throttling.py): crawlers hammer the book and author lists '
+            'while normal visitors browse, all served by the same small pool of workers. Prints the latency '
+            'of the normal visitors (including the wait for a free worker) without and with throttling.')
+
+    CRAWLER_PATHS = ['/catalog/books/?page={n}', '/catalog/authors/']
+    VISITOR_PATHS = ['/catalog/', '/catalog/books/', '/catalog/authors/', '/catalog/popular/']
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Requests served at the same time (e.g. gunicorn workers)')
+        parser.add_argument('--crawlers', type=int, default=8, help='Crawlers (IP addresses)')
+        parser.add_argument('--crawler-rate', type=float, default=300,
+                            help='Requests per second sent by all the crawlers together, whether answered or not')
+        parser.add_argument('--visitor-interval', type=float, default=0.05, help='Seconds between two visitor requests')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds per run')
+
+    def handle(self, *args, **options):
+        self.pages = max(1, math.ceil(Book.objects.count() / BookListView.paginate_by))
+        # Don't log every 429 response
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        for run, throttling in enumerate([False, True]):
+            with override_settings(CATALOG_THROTTLING=throttling, ALLOWED_HOSTS=['testserver']):
+                self.run_load(f"Throttling {'on' if throttling else 'off'}", run, options)
+
+    def serve(self, path, address):
+        """Serves a request in a worker thread. Returns (status code, time the response was ready)."""
+        # One client per worker thread: clients aren't thread safe
+        if not hasattr(self.local, 'client'):
+            self.local.client = Client()
+        status_code = self.local.client.get(path, REMOTE_ADDR=address).status_code
+        return status_code, time.perf_counter()
+
+    def run_load(self, label, run, options):
+        self.local = threading.local()
+        workers = ThreadPoolExecutor(max_workers=options['workers'])
+        start = time.perf_counter()
+        end = start + options['duration']
+
+        # Crawlers: requests at a fixed rate, over all the pages (each run uses other addresses, so
+        # that the buckets of the previous run don't count)
+        crawled = []
+
+        def crawl():
+            for n in itertools.count(1):
+                due = start + n / options['crawler_rate']
+                if due >= end:
+                    return
+                time.sleep(max(0, due - time.perf_counter()))
+                address = f"10.{run}.0.{n % options['crawlers']}"
+                path = self.CRAWLER_PATHS[n % len(self.CRAWLER_PATHS)].format(n=n % self.pages + 1)
+                crawled.append(workers.submit(self.serve, path, address))
+
+        crawler = threading.Thread(target=crawl)
+        crawler.start()
+
+        # Normal visitors: a few requests each (far below the limits), from many addresses
+        visited = []
+        for n in itertools.count():
+            if time.perf_counter() >= end:
+                break
+            address = f'10.{run}.1.{n % 250}'
+            path = self.VISITOR_PATHS[n % len(self.VISITOR_PATHS)]
+            visited.append((time.perf_counter(), workers.submit(self.serve, path, address)))
+            time.sleep(options['visitor_interval'])
+        crawler.join()
+
+        latencies, visitor_statuses = [], Counter()
+        for submitted, future in visited:
+            status, done = future.result()
+            visitor_statuses[status] += 1
+            latencies.append(done - submitted)
+        crawler_statuses = Counter(future.result()[0] for future in crawled)
+        workers.shutdown()
+        self.report(label, latencies, visitor_statuses, crawler_statuses)
+
+    def report(self, label, latencies, visitor_statuses, crawler_statuses):
+        latencies = sorted(latencies)
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        self.stdout.write(
+            f'{label}: visitors {len(latencies)} requests {dict(visitor_statuses)}, '
+            f'median {statistics.median(latencies) * 1e3:7.1f} ms, p95 {p95 * 1e3:7.1f} ms | '
+            f'crawlers {sum(crawler_statuses.values())} requests {dict(crawler_statuses)}'
+        )
@@ -0,0 +1,37 @@
+import timeit
+from django.core.management.base import BaseCommand
+from django.urls import reverse
+from catalog.url_builder import build_url
+
+class Command(BaseCommand):
+    help = 'Micro-benchmark of catalog.url_builder.build_url() against django.urls.reverse().'
+
+    # URL names used per row by the catalog list templates, with a sample pk for each
+    URL_NAMES = (
+        ('book-detail', 42),
+        ('author-detail', 42),
+        ('book-update', 42),
+        ('renew-book-librarian', '5f0c6f3e-1b8e-4f7e-9a55-2d6f1a3c9b10'),
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--number', type=int, default=20000, help='Calls per URL name and timing run')
+        parser.add_argument('--repeat', type=int, default=5, help='Timing runs (the best one is reported)')
+
+    def handle(self, *args, **options):
+        number = options['number']
+        repeat = options['repeat']
+
+        for url_name, pk in self.URL_NAMES:
+            # Both approaches must produce exactly the same URL
+            expected = reverse(url_name, args=[pk])
+            assert build_url(url_name, pk) == expected, url_name
+
+            reverse_time = min(timeit.repeat(lambda: reverse(url_name, args=[pk]), number=number, repeat=repeat))
+            build_time = min(timeit.repeat(lambda: build_url(url_name, pk), number=number, repeat=repeat))
+
+            self.stdout.write(
+                f'{url_name:<22} reverse(): {reverse_time / number * 1e6:7.2f} us/call | '
+                f'build_url(): {build_time / number * 1e6:7.2f} us/call | '
+                f'speedup: {reverse_time / build_time:5.1f}x'
+            )
@@ -0,0 +1,27 @@
+import time
+from django.core.management.base import BaseCommand
+from catalog.recommendations import TOP_K, build_recommendations, sparse
+
+class Command(BaseCommand):
+    help = 'Rebuilds the "patrons also borrowed" recommendations from the loan history (see catalog/recommendations.py).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=TOP_K, help='Recommendations stored per book')
+        parser.add_argument('--min-co-borrowers', type=int, default=1,
+                            help='Only recommend books that at least this many patrons borrowed together')
+        parser.add_argument('--engine', choices=['auto', 'scipy', 'python'], default='auto',
+                            help='scipy: vectorised sparse matrix product; python: pure Python; '
+                                 'auto: scipy when numpy and scipy are installed')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        stats = build_recommendations(
+            top_k=options['top_k'],
+            min_co_borrowers=options['min_co_borrowers'],
+            engine=options['engine'],
+        )
+        engine = options['engine'] if options['engine'] != 'auto' else ('scipy' if sparse is not None else 'python')
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {stats['recommendations']} recommendations for {stats['books']} books "
+            f"in {time.perf_counter() - start:.1f}s ({engine} engine)"
+        ))
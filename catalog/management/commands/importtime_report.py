@@ -0,0 +1,69 @@
+import os
+import subprocess
+import sys
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Python code run in a fresh interpreter under "python -X importtime". It does the same work as a
+# gunicorn worker booting locallibrary/wsgi.py, plus loading the URLconf (which imports all views and
+# forms and normally happens on the first request).
+# -X importtime only reports imports done through the import statement, so importlib.import_module()
+# (which Django uses for the settings, INSTALLED_APPS and the URLconf) is routed through __import__().
+BOOT_SCRIPT = """
+import importlib, sys
+_import_module = importlib.import_module
+def import_module(name, package=None):
+    if package is None and not name.startswith('.'):
+        __import__(name)
+        return sys.modules[name]
+    return _import_module(name, package)
+importlib.import_module = import_module
+
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns
+"""
+
+class Command(BaseCommand):
+    help = 'Boots the project in a fresh interpreter under "python -X importtime" and reports the slowest imports.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=25, help='Number of imports to list')
+        parser.add_argument('--sort', choices=['self', 'cumulative'], default='cumulative',
+                            help='Sort by time spent in the module itself or including its own imports')
+        parser.add_argument('--prefix', action='append', default=[],
+                            help='Only list modules starting with this prefix (e.g. catalog). Can be repeated.')
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', settings.SETTINGS_MODULE))
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', BOOT_SCRIPT],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        wall_time = time.perf_counter() - start
+        if result.returncode != 0:
+            raise CommandError(f'Booting the project failed:\n{result.stderr[-2000:]}')
+
+        # Each line looks like: "import time:       123 |       4567 |   package.module"
+        imports = []
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'self [us]' in line:
+                continue
+            self_us, cumulative_us, module = line[len('import time:'):].split('|')
+            imports.append((int(self_us), int(cumulative_us), module.strip()))
+
+        total_us = sum(self_us for self_us, _, _ in imports)
+        self.stdout.write(f'Worker boot: {wall_time * 1e3:.0f} ms wall time, {len(imports)} modules, '
+                          f'{total_us / 1e3:.0f} ms importing\n')
+
+        if options['prefix']:
+            imports = [entry for entry in imports if entry[2].startswith(tuple(options['prefix']))]
+        sort_index = 0 if options['sort'] == 'self' else 1
+        imports.sort(key=lambda entry: entry[sort_index], reverse=True)
+
+        self.stdout.write(f'{"self [ms]":>10} {"cumulative [ms]":>16}  module')
+        for self_us, cumulative_us, module in imports[:options['top']]:
+            self.stdout.write(f'{self_us / 1e3:>10.1f} {cumulative_us / 1e3:>16.1f}  {module}')
@@ -0,0 +1,52 @@
+import csv
+import sys
+import time
+from django.core.management.base import BaseCommand
+from catalog.inventory import audit, parse_copy_ids
+
+class Command(BaseCommand):
+    help = ('Compares the BookInstance UUIDs scanned on the shelves (one per line) with the catalog: copies '
+            'found on the shelves are made available, and copies missing from them are reported '
+            '(see catalog/inventory.py).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('scans', help='File with one scanned copy UUID per line ("-" for stdin)')
+        parser.add_argument('--mark-missing', action='store_true',
+                            help='Put available copies that were not scanned in maintenance (full inventories only)')
+        parser.add_argument('--no-mark-found', action='store_true',
+                            help='Only report scanned copies that are on loan or in maintenance, without making them available')
+        parser.add_argument('--report', help='Write the unknown, found, reserved and missing copies to this CSV file')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Copies looked up/updated per query')
+        parser.add_argument('--dry-run', action='store_true', help='Report the differences but change nothing')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        if options['scans'] == '-':
+            copy_ids, invalid = parse_copy_ids(sys.stdin)
+        else:
+            with open(options['scans'], encoding='utf-8') as scans:
+                copy_ids, invalid = parse_copy_ids(scans)
+        for line in invalid:
+            self.stderr.write(f'Not a copy UUID, ignored: {line}')
+
+        report = audit(
+            copy_ids,
+            mark_found=not options['no_mark_found'],
+            mark_missing=options['mark_missing'],
+            chunk_size=options['chunk_size'],
+            dry_run=options['dry_run'],
+        )
+
+        if options['report']:
+            with open(options['report'], 'w', newline='', encoding='utf-8') as report_file:
+                writer = csv.writer(report_file)
+                writer.writerow(['problem', 'copy'])
+                for problem in ('unknown', 'found', 'reserved', 'missing'):
+                    writer.writerows([problem, copy_id] for copy_id in report[problem])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Audited {report['scanned']} scanned copies in {time.perf_counter() - start:.1f}s: "
+            f"{len(report['unknown'])} unknown, {len(report['found'])} found (on loan/in maintenance), "
+            f"{len(report['reserved'])} reserved, {len(report['missing'])} missing; "
+            f"{'would change' if options['dry_run'] else 'changed'} {report['changed']} copies"
+        ))
@@ -0,0 +1,12 @@
+import time
+from django.core.management.base import BaseCommand
+from catalog.popularity import rebuild_popularity
+
+class Command(BaseCommand):
+    help = ('Recomputes the popularity rankings from the whole loan history (see catalog/popularity.py). '
+            'Only needed once, or after loans were imported without signals: checkouts update them as they happen.')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        stored = rebuild_popularity()
+        self.stdout.write(self.style.SUCCESS(f'Stored {stored} popularity scores in {time.perf_counter() - start:.1f}s'))
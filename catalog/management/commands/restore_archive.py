@@ -0,0 +1,40 @@
+import datetime
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from catalog import archive
+from catalog.inventory import parse_copy_ids
+
+class Command(BaseCommand):
+    help = ('Moves archived copies (with their archived loans) and/or archived loans back from the archive '
+            'tables (see catalog/archive.py).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('copies', nargs='*', help='UUIDs of the archived copies to restore')
+        parser.add_argument('--file', help='File with one copy UUID per line ("-" for stdin)')
+        parser.add_argument('--loans-returned-after', type=datetime.date.fromisoformat, metavar='YYYY-MM-DD',
+                            help='Also restore the archived loans returned after this date')
+        parser.add_argument('--chunk-size', type=int, default=archive.CHUNK_SIZE, help='Rows moved per transaction')
+
+    def handle(self, *args, **options):
+        lines = list(options['copies'])
+        if options['file'] == '-':
+            lines += sys.stdin.readlines()
+        elif options['file']:
+            with open(options['file'], encoding='utf-8') as copies:
+                lines += copies.readlines()
+        copy_ids, invalid = parse_copy_ids(lines)
+        if invalid:
+            raise CommandError(f'Not copy UUIDs: {", ".join(invalid)}')
+        if not copy_ids and not options['loans_returned_after']:
+            raise CommandError('Give the copies to restore and/or --loans-returned-after')
+
+        if copy_ids:
+            report = archive.restore_copies(copy_ids, options['chunk_size'])
+            self.stdout.write(f"Restored {report['copies']} of {len(copy_ids)} copies with {report['loans']} loans")
+        if options['loans_returned_after']:
+            returned_after = datetime.datetime.combine(options['loans_returned_after'], datetime.time.min,
+                                                       tzinfo=timezone.get_current_timezone())
+            report = archive.restore_loans(returned_after, options['chunk_size'])
+            self.stdout.write(f"Restored {report['loans']} loans")
+        self.stdout.write(self.style.SUCCESS('Done'))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from catalog import backup
+from .backup_db import database_path
+
+class Command(BaseCommand):
+    help = ('Replaces the SQLite database with a backup written by backup_db, after checking the backup\'s '
+            'integrity (see catalog/backup.py). Stop the workers first: their changes since the backup are lost.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('backup', help='Backup file (.sqlite3 or .sqlite3.gz)')
+        parser.add_argument('--database', default='default', help='Database alias (an SQLite database)')
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive',
+                            help='Do not ask for confirmation')
+        parser.add_argument('--no-verify', action='store_true', help='Skip the integrity check of the backup')
+
+    def handle(self, *args, **options):
+        target = database_path(options['database'])
+        if options['interactive']:
+            answer = input(f"This replaces everything in {target} with {options['backup']}. Type 'yes' to continue: ")
+            if answer != 'yes':
+                raise CommandError('Restore cancelled.')
+
+        connections[options['database']].close()
+        try:
+            stats = backup.restore(options['backup'], target, verify=not options['no_verify'])
+        except backup.BackupError as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS(
+            f"Restored {target} from {options['backup']} in {stats['seconds']:.1f}s ({stats['pages']} pages)"
+        ))
@@ -0,0 +1,36 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from catalog import jobs
+
+class Command(BaseCommand):
+    help = 'Runs the catalog background job worker (see catalog/jobs.py).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=1, help='Number of jobs run in parallel')
+        parser.add_argument('--mode', choices=['thread', 'process'], default='thread',
+                            help='Run parallel jobs in a thread pool or in forked worker processes')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty instead of polling forever')
+        parser.add_argument('--stale-after', type=int, default=3600,
+                            help='Requeue jobs that have been running for more than this many seconds at startup')
+
+    def handle(self, *args, **options):
+        requeued = jobs.requeue_stale_jobs(timedelta(seconds=options['stale_after']))
+        if requeued:
+            self.stdout.write(f'Requeued {requeued} stale job(s)')
+
+        self.stdout.write(
+            f"Catalog worker started ({options['concurrency']} x {options['mode']}), "
+            f"tasks: {', '.join(sorted(jobs.registered_tasks()))}"
+        )
+        try:
+            jobs_run = jobs.run_worker(
+                concurrency=options['concurrency'],
+                mode=options['mode'],
+                poll_interval=options['poll_interval'],
+                once=options['once'],
+            )
+        except KeyboardInterrupt:
+            self.stdout.write('Catalog worker stopped')
+            return
+        self.stdout.write(self.style.SUCCESS(f'Catalog worker finished, {jobs_run} job(s) run'))
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:31
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('catalog', '0005_bookinstance_test'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='hold_tickets_issued',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='Hold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticket', models.PositiveBigIntegerField()),
+                ('placed_at', models.DateTimeField(auto_now_add=True)),
+                ('status', models.CharField(choices=[('w', 'Waiting'), ('f', 'Fulfilled'), ('c', 'Cancelled')], default='w', help_text='Hold status', max_length=1)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holds', to='catalog.book')),
+                ('copy', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='catalog.bookinstance')),
+                ('patron', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holds', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['book', 'ticket'],
+                'indexes': [models.Index(fields=['book', 'status', 'ticket'], name='catalog_hold_queue_idx'), models.Index(fields=['patron', 'status'], name='catalog_hold_patron_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='hold',
+            constraint=models.UniqueConstraint(fields=('book', 'ticket'), name='catalog_hold_unique_ticket'),
+        ),
+        migrations.AddConstraint(
+            model_name='hold',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'w')), fields=('book', 'patron'), name='catalog_hold_one_waiting_per_patron'),
+        ),
+    ]
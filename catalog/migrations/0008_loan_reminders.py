@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:33
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('catalog', '0007_catalog_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoanReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('due_back', models.DateField()),
+                ('kind', models.CharField(choices=[('s', 'Due soon'), ('o', 'Overdue')], max_length=1)),
+                ('sent_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-sent_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='bookinstance',
+            index=models.Index(fields=['status', 'due_back'], name='catalog_bi_status_due_idx'),
+        ),
+        migrations.AddField(
+            model_name='loanreminder',
+            name='book_instance',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='catalog.bookinstance'),
+        ),
+        migrations.AddField(
+            model_name='loanreminder',
+            name='borrower',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='loanreminder',
+            constraint=models.UniqueConstraint(fields=('book_instance', 'borrower', 'due_back', 'kind'), name='catalog_loanreminder_once'),
+        ),
+    ]
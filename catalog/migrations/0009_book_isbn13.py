@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:36
+
+from django.db import migrations, models
+from catalog.validators import To_ISBN13
+
+
+def fill_isbn13(apps, schema_editor):
+    Book = apps.get_model('catalog', 'Book')
+    db_alias = schema_editor.connection.alias
+    books = list(Book.objects.using(db_alias).only('id', 'isbn'))
+    for book in books:
+        book.isbn13 = To_ISBN13(book.isbn or '')
+    Book.objects.using(db_alias).bulk_update(books, ['isbn13'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0008_loan_reminders'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='isbn13',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=13, null=True, verbose_name='ISBN-13'),
+        ),
+        migrations.RunPython(fill_isbn13, migrations.RunPython.noop),
+    ]
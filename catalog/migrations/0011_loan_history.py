@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:42
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def open_current_loans(apps, schema_editor):
+    # The history starts now: copies already on loan get an open loan (their real start date is unknown)
+    BookInstance = apps.get_model('catalog', 'BookInstance')
+    Loan = apps.get_model('catalog', 'Loan')
+    db_alias = schema_editor.connection.alias
+    copies = BookInstance.objects.using(db_alias).filter(status='o', borrower__isnull=False)
+    Loan.objects.using(db_alias).bulk_create(
+        [Loan(book_instance_id=copy.id, book_id=copy.book_id, borrower_id=copy.borrower_id)
+         for copy in copies.only('id', 'book_id', 'borrower_id')],
+        batch_size=500,
+    )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('catalog', '0010_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Loan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('borrowed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('returned_at', models.DateTimeField(blank=True, help_text='Empty while the copy is still on loan', null=True)),
+                ('book', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='loans', to='catalog.book')),
+                ('book_instance', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='loans', to='catalog.bookinstance')),
+                ('borrower', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='loans', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-borrowed_at'],
+                'indexes': [models.Index(fields=['borrower', 'returned_at'], name='catalog_loan_borrower_idx'), models.Index(fields=['book_instance', 'returned_at'], name='catalog_loan_copy_idx')],
+            },
+        ),
+        migrations.RunPython(open_current_loans, migrations.RunPython.noop),
+    ]
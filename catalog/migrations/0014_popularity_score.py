@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0013_book_recommendation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PopularityScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('b', 'Book'), ('a', 'Author'), ('g', 'Genre')], max_length=1)),
+                ('window', models.CharField(choices=[('d', 'Today'), ('w', 'This week'), ('t', 'All time')], max_length=1)),
+                ('object_id', models.PositiveIntegerField()),
+                ('log_score', models.FloatField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['kind', 'window', '-log_score'],
+                'indexes': [models.Index(fields=['kind', 'window', '-log_score'], name='catalog_popularity_rank_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='popularityscore',
+            constraint=models.UniqueConstraint(fields=('kind', 'window', 'object_id'), name='catalog_popularity_once'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:55
+
+import catalog.ids
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0014_popularity_score'),
+    ]
+
+    # The default is only applied by Django, not by the database: change the model state only, instead
+    # of letting SQLite rebuild the whole catalog_bookinstance table. Existing ids are kept as they are.
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='bookinstance',
+                    name='id',
+                    field=models.UUIDField(default=catalog.ids.new_copy_id, help_text='Unique ID for this particular book across whole library', primary_key=True, serialize=False),
+                ),
+            ],
+        ),
+    ]
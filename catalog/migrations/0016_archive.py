@@ -0,0 +1,47 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:25
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('catalog', '0015_time_ordered_copy_ids'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedLoan',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('book_instance_id', models.UUIDField(db_index=True, null=True)),
+                ('borrowed_at', models.DateTimeField()),
+                ('returned_at', models.DateTimeField(null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('book', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='catalog.book')),
+                ('borrower', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-borrowed_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedBookInstance',
+            fields=[
+                ('id', models.UUIDField(primary_key=True, serialize=False)),
+                ('imprint', models.CharField(max_length=200)),
+                ('due_back', models.DateField(blank=True, null=True)),
+                ('test', models.DateField(blank=True, null=True)),
+                ('status', models.CharField(blank=True, choices=[('m', 'Maintenance'), ('o', 'On loan'), ('a', 'Available'), ('r', 'Reserved')], max_length=1)),
+                ('retired_at', models.DateTimeField(help_text='When the copy was last changed before it was archived')),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('book', models.ForeignKey(null=True, on_delete=django.db.models.deletion.RESTRICT, related_name='archived_copies', to='catalog.book')),
+            ],
+            options={
+                'ordering': ['-retired_at'],
+            },
+        ),
+    ]
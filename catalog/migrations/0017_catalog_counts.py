@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0016_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogCounts',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('counts', models.JSONField()),
+                ('computed_at', models.DateTimeField()),
+            ],
+        ),
+    ]
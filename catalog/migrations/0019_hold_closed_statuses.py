@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:27
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def close_collected_holds(apps, schema_editor):
+    # Fulfilled holds whose copy is no longer reserved for the patron were never closed until now
+    Hold = apps.get_model('catalog', 'Hold')
+    db_alias = schema_editor.connection.alias
+    fulfilled = Hold.objects.using(db_alias).filter(status='f')
+    fulfilled.filter(copy__status='o', copy__borrower=F('patron')).update(status='o')
+    fulfilled.exclude(copy__status='r', copy__borrower=F('patron')).update(status='e')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0018_catalog_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='hold',
+            name='status',
+            field=models.CharField(choices=[('w', 'Waiting'), ('f', 'Fulfilled'), ('c', 'Cancelled'), ('o', 'Collected'), ('e', 'Expired')], default='w', help_text='Hold status', max_length=1),
+        ),
+        migrations.RunPython(close_collected_holds, migrations.RunPython.noop),
+    ]
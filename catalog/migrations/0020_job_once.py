@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0019_hold_closed_statuses'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='catalogjob',
+            name='once',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddConstraint(
+            model_name='catalogjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('once', True), ('status__in', ['q', 'r'])), fields=('name',), name='catalog_job_once_pending'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:34
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def clear_duplicate_isbn13s(apps, schema_editor):
+    # Books entered twice under different ISBN formats (e.g. ISBN-10 and ISBN-13) before the constraint:
+    # the oldest keeps its isbn13, the others are left without one, like old records with invalid ISBNs
+    Book = apps.get_model('catalog', 'Book')
+    db_alias = schema_editor.connection.alias
+    duplicates = (
+        Book.objects.using(db_alias).filter(isbn13__isnull=False)
+        .values('isbn13').annotate(count=Count('id'), first_id=Min('id')).filter(count__gt=1)
+    )
+    for duplicate in duplicates:
+        (Book.objects.using(db_alias).filter(isbn13=duplicate['isbn13'])
+         .exclude(pk=duplicate['first_id']).update(isbn13=None))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0020_job_once'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_duplicate_isbn13s, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='book',
+            name='isbn13',
+            field=models.CharField(blank=True, editable=False, max_length=13, null=True, verbose_name='ISBN-13'),
+        ),
+        migrations.AddConstraint(
+            model_name='book',
+            constraint=models.UniqueConstraint(condition=models.Q(('isbn13__isnull', False)), fields=('isbn13',), name='catalog_book_unique_isbn13'),
+        ),
+    ]
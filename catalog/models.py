@@ -1,11 +1,83 @@
 from django.db import models
-from django.urls import reverse
-import uuid # Required for unique book instances
+from .url_builder import build_url
+from .validators import To_ISBN13
+from .ids import new_copy_id # Time-ordered primary keys for book instances
 from django.contrib.auth.models import User
 from datetime import date
+from django.utils import timezone
 
 # Create your models here.
 
+class TimestampedQuerySet(models.QuerySet):
+    """QuerySet that also bumps updated_at on the bulk update paths (which don't call save())."""
+
+    def update(self, **kwargs):
+        kwargs.setdefault('updated_at', timezone.now())
+        return super().update(**kwargs)
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        objs = list(objs)
+        now = timezone.now()
+        for obj in objs:
+            obj.updated_at = now
+        return super().bulk_update(objs, {*fields, 'updated_at'}, batch_size=batch_size)
+
+class TimestampedModel(models.Model):
+    """Abstract model tracking when each row was last changed (used for HTTP caching, see catalog/conditional.py).
+
+    It also remembers the column values it was loaded with, so that save_changes() can write only the
+    columns that were actually changed (or nothing at all).
+    """
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = TimestampedQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        # auto_now only gets written if it is part of update_fields
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'updated_at'}
+        super().save(*args, **kwargs)
+        # What is in the database now (deferred fields, which weren't loaded, stay unknown)
+        self._loaded_values = {
+            field.attname: getattr(self, field.attname)
+            for field in self._meta.concrete_fields
+            if field.attname in self.__dict__
+        }
+
+    def changed_fields(self) -> list:
+        """Returns the names of the fields changed since the instance was loaded or last saved."""
+        loaded = getattr(self, '_loaded_values', {})
+        return [
+            field.name
+            for field in self._meta.concrete_fields
+            if not field.primary_key and field.attname in loaded and getattr(self, field.attname) != loaded[field.attname]
+        ]
+
+    def save_changes(self) -> list:
+        """Saves only the changed fields and returns their names.
+
+        If nothing changed, nothing is written: no UPDATE, no pre_save/post_save signals (and so no
+        cache invalidation and no django-reversion version). New instances are saved in full.
+        """
+        if self._state.adding or not hasattr(self, '_loaded_values'):
+            self.save()
+            return [field.name for field in self._meta.concrete_fields]
+        changed = self.changed_fields()
+        if changed:
+            self.save(update_fields=changed)
+        return changed
+
+
 class Genre(models.Model):
     """Model representing a book genre."""
     name = models.CharField(max_length=200, help_text='Enter a book genre (e.g. Science Fiction)')
@@ -23,7 +95,7 @@ class Language(models.Model):
         """String for representing the Model object (in Admin site etc.)"""
         return self.name
 
-class Book(models.Model):
+class Book(TimestampedModel):
     """Model representing a book (but not a specific copy of a book)."""
     title = models.CharField(max_length=200)
 
@@ -34,14 +106,25 @@ class Book(models.Model):
     summary = models.TextField(max_length=1000, help_text='Enter a brief description of the book')
     isbn = models.CharField('ISBN', max_length=13, unique=True,
                              help_text='13 Character <a href="https://www.isbn-international.org/content/what-isbn">ISBN number</a>')
+    # The ISBN normalised to ISBN-13 (no hyphens), kept up to date by save(). Unique (the same book
+    # can't be entered as ISBN-10 and as ISBN-13), and indexed by its constraint for fast lookups by
+    # scanned barcode and duplicate detection. Null if isbn isn't a valid ISBN (old records).
+    isbn13 = models.CharField('ISBN-13', max_length=13, null=True, blank=True, editable=False)
 
     # ManyToManyField used because genre can contain many books. Books can cover many genres.
     # Genre class has already been defined so we can specify the object above.
     genre = models.ManyToManyField(Genre, help_text='Select a genre for this book')
     language = models.ForeignKey('Language', on_delete=models.SET_NULL, null=True)
 
+    # Number of hold tickets handed out for this book so far (see Hold below and catalog/holds.py)
+    hold_tickets_issued = models.PositiveBigIntegerField(default=0, editable=False)
+
     class Meta:
         ordering = ['title']
+        constraints = [
+            models.UniqueConstraint(fields=['isbn13'], condition=models.Q(isbn13__isnull=False),
+                                    name='catalog_book_unique_isbn13'),
+        ]
 
     def display_genre(self):
         """Creates a string for the Genre. This is required to display genre in Admin."""
@@ -53,13 +136,21 @@ class Book(models.Model):
         """String for representing the Model object."""
         return self.title
 
+    def save(self, *args, **kwargs):
+        self.isbn13 = To_ISBN13(self.isbn or '')
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'isbn' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'isbn13'}
+        super().save(*args, **kwargs)
+
     def get_absolute_url(self):
         """Returns the URL to access a detail record for this book."""
-        return reverse('book-detail', args=[str(self.id)])
+        # build_url() is a cached equivalent of reverse('book-detail', args=[str(self.id)])
+        return build_url('book-detail', self.id)
 
-class BookInstance(models.Model):
+class BookInstance(TimestampedModel):
     """Model representing a specific copy of a book (i.e. that can be borrowed from the library)."""
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, help_text='Unique ID for this particular book across whole library')
+    id = models.UUIDField(primary_key=True, default=new_copy_id, help_text='Unique ID for this particular book across whole library')
     book = models.ForeignKey('Book', on_delete=models.RESTRICT, null=True)
     imprint = models.CharField(max_length=200)
     due_back = models.DateField(null=True, blank=True)
@@ -84,6 +175,32 @@ class BookInstance(models.Model):
     class Meta:
         ordering = ['due_back']
         permissions = (("can_mark_returned", "Set book as returned"),)
+        indexes = [
+            # Loans by status and due date (e.g. due-soon/overdue loans for the reminder emails)
+            models.Index(fields=['status', 'due_back'], name='catalog_bi_status_due_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the status as loaded from the database so that signal handlers (see catalog/signals.py)
+        # can tell when a copy changes status, e.g. when it is returned and becomes available
+        loaded = dict(zip(field_names, values))
+        instance._loaded_status = loaded.get('status')
+        # ... and the borrower, so that their loan history and dashboard can be updated too
+        instance._loaded_borrower_id = loaded.get('borrower_id')
+        # ... and the book, which the facet counts and the catalog pages' ETags depend on
+        instance._loaded_book_id = loaded.get('book_id')
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # post_save handlers have seen the previous status and borrower by now
+        self._loaded_status = self.status
+        if 'borrower_id' in self.__dict__:
+            self._loaded_borrower_id = self.borrower_id
+        if 'book_id' in self.__dict__:
+            self._loaded_book_id = self.book_id
 
     @property
     def is_overdue(self):
@@ -94,7 +211,7 @@ class BookInstance(models.Model):
         """String for representing the Model object."""
         return f'{self.id} ({self.book.title})'
 
-class Author(models.Model):
+class Author(TimestampedModel):
     """Model representing an author."""
     first_name = models.CharField(max_length=100)
     last_name = models.CharField(max_length=100)
@@ -106,10 +223,287 @@ class Author(models.Model):
 
     def get_absolute_url(self):
         """Returns the URL to access a particular author instance."""
-        return reverse('author-detail', args=[str(self.id)])
+        # build_url() is a cached equivalent of reverse('author-detail', args=[str(self.id)])
+        return build_url('author-detail', self.id)
 
     def __str__(self):
         """String for representing the Model object."""
         return f'{self.last_name}, {self.first_name}'
 
 
+
+class Hold(models.Model):
+    """Model representing a patron's place in the queue for a book (a hold on any copy of the book)."""
+    book = models.ForeignKey('Book', on_delete=models.CASCADE, related_name='holds')
+    patron = models.ForeignKey(User, on_delete=models.CASCADE, related_name='holds')
+
+    # Position in the book's queue as a ticket number. Tickets only ever increase, so the next patron
+    # in line is the waiting hold with the lowest ticket, found through the (book, status, ticket) index.
+    ticket = models.PositiveBigIntegerField()
+    placed_at = models.DateTimeField(auto_now_add=True)
+
+    # The copy that was reserved for the patron once the hold was fulfilled
+    copy = models.ForeignKey('BookInstance', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+
+    HOLD_STATUS = (
+        ('w', 'Waiting'),
+        ('f', 'Fulfilled'),
+        ('c', 'Cancelled'),
+        # Closed once the reserved copy is no longer reserved for the patron (see holds.close_reserved_hold)
+        ('o', 'Collected'),
+        ('e', 'Expired'),
+    )
+
+    status = models.CharField(
+        max_length=1,
+        choices=HOLD_STATUS,
+        default='w',
+        help_text='Hold status',
+    )
+
+    class Meta:
+        ordering = ['book', 'ticket']
+        indexes = [
+            models.Index(fields=['book', 'status', 'ticket'], name='catalog_hold_queue_idx'),
+            models.Index(fields=['patron', 'status'], name='catalog_hold_patron_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['book', 'ticket'], name='catalog_hold_unique_ticket'),
+            # A patron can only wait in the queue for a given book once
+            models.UniqueConstraint(fields=['book', 'patron'], condition=models.Q(status='w'),
+                                    name='catalog_hold_one_waiting_per_patron'),
+        ]
+
+    def __str__(self):
+        """String for representing the Model object."""
+        return f'{self.patron} - {self.book} (#{self.ticket})'
+
+class CatalogJob(models.Model):
+    """Model representing a background task queued for the catalog worker (see catalog/jobs.py)."""
+    name = models.CharField(max_length=100, help_text='Name of the registered task to run')
+    kwargs = models.JSONField(default=dict, blank=True, help_text='Keyword arguments passed to the task')
+
+    JOB_STATUS = (
+        ('q', 'Queued'),
+        ('r', 'Running'),
+        ('d', 'Done'),
+        ('f', 'Failed'),
+    )
+
+    status = models.CharField(max_length=1, choices=JOB_STATUS, default='q')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now, help_text='The job will not start before this time')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    # Queued with enqueue_once(): at most one such job per name is queued or running at a time
+    once = models.BooleanField(default=False)
+
+    class Meta:
+        ordering = ['run_after']
+        indexes = [
+            # The worker polls for status='q' AND run_after <= now
+            models.Index(fields=['status', 'run_after'], name='catalog_job_queue_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['name'], condition=models.Q(once=True, status__in=['q', 'r']),
+                                    name='catalog_job_once_pending'),
+        ]
+
+    def __str__(self):
+        """String for representing the Model object."""
+        return f'{self.name} #{self.pk} ({self.get_status_display()})'
+
+class CatalogCounts(models.Model):
+    """Model holding the record counts shown on the home page (a single row, see catalog/tasks.py)."""
+    counts = models.JSONField()
+    computed_at = models.DateTimeField()
+
+    def __str__(self):
+        """String for representing the Model object."""
+        return f'Catalog counts of {self.computed_at:%Y-%m-%d %H:%M:%S}'
+
+class CatalogVersion(models.Model):
+    """Model holding a number that every change to the catalog increments (a single row, see catalog/conditional.py)."""
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        """String for representing the Model object."""
+        return f'Catalog version {self.version}'
+
+class LoanReminder(models.Model):
+    """Model recording a reminder email sent for a loan, so that each reminder is only ever sent once."""
+    book_instance = models.ForeignKey('BookInstance', on_delete=models.CASCADE, related_name='+')
+    borrower = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    # A renewal changes the due date, which makes the loan eligible for new reminders
+    due_back = models.DateField()
+
+    REMINDER_KIND = (
+        ('s', 'Due soon'),
+        ('o', 'Overdue'),
+    )
+
+    kind = models.CharField(max_length=1, choices=REMINDER_KIND)
+    sent_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-sent_at']
+        constraints = [
+            models.UniqueConstraint(fields=['book_instance', 'borrower', 'due_back', 'kind'],
+                                    name='catalog_loanreminder_once'),
+        ]
+
+    def __str__(self):
+        """String for representing the Model object."""
+        return f'{self.get_kind_display()} reminder to {self.borrower} for {self.book_instance_id}'
+
+class Loan(models.Model):
+    """Model representing one loan of a copy to a patron (the loan history, recorded by catalog/signals.py)."""
+    # The history outlives the copy (and the book) being removed from the catalog
+    book_instance = models.ForeignKey('BookInstance', on_delete=models.SET_NULL, null=True, related_name='loans')
+    book = models.ForeignKey('Book', on_delete=models.SET_NULL, null=True, related_name='loans')
+    borrower = models.ForeignKey(User, on_delete=models.CASCADE, related_name='loans')
+    borrowed_at = models.DateTimeField(default=timezone.now)
+    returned_at = models.DateTimeField(null=True, blank=True, help_text='Empty while the copy is still on loan')
+
+    class Meta:
+        ordering = ['-borrowed_at']
+        indexes = [
+            # A patron's loans, current ones (returned_at IS NULL) first
+            models.Index(fields=['borrower', 'returned_at'], name='catalog_loan_borrower_idx'),
+            # The open loan of a copy, closed when the copy is returned
+            models.Index(fields=['book_instance', 'returned_at'], name='catalog_loan_copy_idx'),
+        ]
+
+    def __str__(self):
+        """String for representing the Model object."""
+        return f'{self.borrower} - {self.book_instance_id} ({self.borrowed_at:%Y-%m-%d})'
+
+class BookRecommendation(models.Model):
+    """Model representing one "patrons also borrowed" neighbour of a book (built by catalog/recommendations.py)."""
+    book = models.ForeignKey('Book', on_delete=models.CASCADE, related_name='recommendations')
+    recommended = models.ForeignKey('Book', on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField(help_text='1 = most similar')
+    # Cosine similarity of the two books' sets of borrowers
+    score = models.FloatField()
+    # Number of patrons who borrowed both books
+    co_borrowers = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ['book', 'rank']
+        constraints = [
+            # Also the index behind the detail page's lookup: WHERE book_id = ? ORDER BY rank
+            models.UniqueConstraint(fields=['book', 'rank'], name='catalog_recommendation_rank'),
+        ]
+
+    def __str__(self):
+        """String for representing the Model object."""
+        return f'{self.book_id} -> {self.recommended_id} (#{self.rank})'
+
+class PopularityScore(models.Model):
+    """Model representing the decayed popularity of a book, author or genre over a time window (see catalog/popularity.py)."""
+    KIND = (
+        ('b', 'Book'),
+        ('a', 'Author'),
+        ('g', 'Genre'),
+    )
+    WINDOW = (
+        ('d', 'Today'),
+        ('w', 'This week'),
+        ('t', 'All time'),
+    )
+
+    kind = models.CharField(max_length=1, choices=KIND)
+    window = models.CharField(max_length=1, choices=WINDOW)
+    # Id of the Book, Author or Genre
+    object_id = models.PositiveIntegerField()
+    # log of the decayed number of checkouts, relative to popularity.EPOCH (only the order is meaningful)
+    log_score = models.FloatField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['kind', 'window', '-log_score']
+        indexes = [
+            # Top N of a kind and window: an index range scan of N entries
+            models.Index(fields=['kind', 'window', '-log_score'], name='catalog_popularity_rank_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'window', 'object_id'], name='catalog_popularity_once'),
+        ]
+
+    def __str__(self):
+        """String for representing the Model object."""
+        return f'{self.get_kind_display()} {self.object_id} ({self.get_window_display()})'
+
+class RequestProfile(models.Model):
+    """Model representing the profile of one request, recorded on demand by catalog/profiling.py."""
+    created_at = models.DateTimeField(auto_now_add=True)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=2000)
+    view_name = models.CharField(max_length=200, blank=True)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField(help_text='Total time spent in the view and the middleware below the profiler')
+    sql_count = models.PositiveIntegerField()
+    sql_ms = models.FloatField(help_text='Time spent running SQL queries')
+    # [{function, calls, tottime_ms, cumtime_ms}], slowest (cumulative) first
+    functions = models.JSONField(default=list)
+    # [{sql, count, total_ms}], identical SQL grouped together, slowest first
+    queries = models.JSONField(default=list)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def get_absolute_url(self):
+        """Returns the URL to access this profile."""
+        return build_url('request-profile-detail', self.id)
+
+    def __str__(self):
+        """String for representing the Model object."""
+        return f'{self.method} {self.path} ({self.duration_ms:.0f} ms)'
+
+class ArchivedBookInstance(models.Model):
+    """Model representing a retired copy moved out of BookInstance (see catalog/archive.py). Read only."""
+    # Same id as the copy had, so that the copy can be restored as it was
+    id = models.UUIDField(primary_key=True)
+    # Archived copies still belong to their book, like the copies in the catalog
+    book = models.ForeignKey('Book', on_delete=models.RESTRICT, null=True, related_name='archived_copies')
+    imprint = models.CharField(max_length=200)
+    due_back = models.DateField(null=True, blank=True)
+    test = models.DateField(null=True, blank=True)
+    status = models.CharField(max_length=1, choices=BookInstance.LOAN_STATUS, blank=True)
+    retired_at = models.DateTimeField(help_text='When the copy was last changed before it was archived')
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-retired_at']
+
+    def get_absolute_url(self):
+        """Returns the URL to access this archived copy."""
+        return build_url('archived-copy-detail', self.id)
+
+    def __str__(self):
+        """String for representing the Model object."""
+        return f'{self.id} (archived)'
+
+class ArchivedLoan(models.Model):
+    """Model representing an old loan moved out of Loan (see catalog/archive.py). Read only."""
+    # Same id as the loan had
+    id = models.BigIntegerField(primary_key=True)
+    # Not a foreign key: the copy may be in BookInstance or in ArchivedBookInstance
+    book_instance_id = models.UUIDField(null=True, db_index=True)
+    book = models.ForeignKey('Book', on_delete=models.SET_NULL, null=True, related_name='+')
+    borrower = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    borrowed_at = models.DateTimeField()
+    returned_at = models.DateTimeField(null=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-borrowed_at']
+
+    def __str__(self):
+        """String for representing the Model object."""
+        return f'{self.borrower} - {self.book_instance_id} ({self.borrowed_at:%Y-%m-%d}, archived)'
@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from catalog.shared_cache import cache_is_shared
+
+# Permission caching for the catalog's permission checks ({% if perms.catalog.can_mark_returned %},
+# PermissionRequiredMixin, @permission_required).
+#
+# Django's ModelBackend already caches a user's permissions on the user object, i.e. for the rest of
+# the request, but loads them again (a user permissions query and a group permissions query) in every
+# request that checks one. CachedPermissionBackend keeps them in the configured cache for
+# CATALOG_PERMISSION_CACHE_TIMEOUT seconds as well. The cache keys contain a version number that is
+# bumped whenever permissions, groups or their memberships change (see catalog/signals.py), so a
+# revoked permission stops working straight away - provided every process sees the new version number.
+# With a cache local to each process (the development settings), the other processes would keep
+# granting a revoked permission until their cache entry expires, so the cross-request cache is only
+# used with a shared cache (see catalog/shared_cache.py) and otherwise this is a plain ModelBackend.
+#
+# The backend only checks permissions and never logs anyone in: the ModelBackend after it in
+# AUTHENTICATION_BACKENDS does, so the sessions keep pointing at ModelBackend and stay valid whether
+# or not this backend is configured.
+
+PERMISSIONS_VERSION_KEY = 'catalog:permissions:version'
+
+
+def permissions_version() -> int:
+    return cache.get_or_set(PERMISSIONS_VERSION_KEY, 1, None)
+
+
+def permissions_changed() -> None:
+    """Invalidates every user's cached permissions (called from catalog/signals.py)."""
+    try:
+        cache.incr(PERMISSIONS_VERSION_KEY)
+    except ValueError:
+        cache.set(PERMISSIONS_VERSION_KEY, 1, None)
+
+
+class CachedPermissionBackend(ModelBackend):
+    """ModelBackend that also caches each user's set of permissions across requests (with a shared cache)."""
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        # Logging in is left to ModelBackend (see above)
+        return None
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        if not cache_is_shared():
+            return super().get_all_permissions(user_obj)
+        if not hasattr(user_obj, '_perm_cache'):
+            # is_superuser is part of the key: superusers have every permission without any group
+            key = f'catalog:permissions:{permissions_version()}:{user_obj.pk}:{int(user_obj.is_superuser)}'
+            perms = cache.get(key)
+            if perms is None:
+                perms = super().get_all_permissions(user_obj)
+                cache.set(key, perms, getattr(settings, 'CATALOG_PERMISSION_CACHE_TIMEOUT', 300))
+            user_obj._perm_cache = perms
+        return user_obj._perm_cache
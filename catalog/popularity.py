@@ -0,0 +1,159 @@
+import datetime
+import logging
+import math
+from collections import defaultdict
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import ArchivedLoan, Author, Book, Genre, Loan, PopularityScore
+
+# Trending and popularity rankings of books, authors and genres (catalog/popular/).
+#
+# Every checkout adds 1 to the score of its book, the book's author and each of its genres, in three
+# windows: "today" and "this week" scores decay exponentially (half-lives of a day and a week), the
+# "all time" score doesn't decay. The scores are kept up to date incrementally when a Loan is created
+# (see catalog/signals.py), so the page never has to count loans.
+#
+# Decay without rewriting every row: a checkout at time t is stored with weight exp(rate * (t - EPOCH))
+# instead of 1. Decaying all scores to "now" multiplies them all by the same factor, so the ORDER of the
+# stored scores is already the current order and the top N is an index range scan. The weights grow
+# very quickly, so the scores are stored as logarithms and added with logaddexp.
+
+EPOCH = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+HALF_LIVES = {
+    'd': datetime.timedelta(days=1),
+    'w': datetime.timedelta(days=7),
+    't': None,
+}
+KIND_MODELS = {'b': Book, 'a': Author, 'g': Genre}
+
+logger = logging.getLogger(__name__)
+
+
+def _decay_rate(window: str) -> float:
+    half_life = HALF_LIVES[window]
+    return math.log(2) / half_life.total_seconds() if half_life else 0.0
+
+
+def _log_weight(window: str, when: datetime.datetime) -> float:
+    return _decay_rate(window) * (when - EPOCH).total_seconds()
+
+
+def logaddexp(a: float, b: float) -> float:
+    """log(exp(a) + exp(b)) without overflowing."""
+    if a < b:
+        a, b = b, a
+    return a + math.log1p(math.exp(b - a))
+
+
+def current_score(score: PopularityScore, now=None) -> float:
+    """The score decayed to now, i.e. the (fractional) number of recent checkouts."""
+    now = now or timezone.now()
+    return math.exp(score.log_score - _log_weight(score.window, now))
+
+
+def _accumulate(events, log_scores=None) -> dict:
+    """Adds (kind, object id, time) checkout events to {(kind, window, object id): log score}."""
+    log_scores = log_scores if log_scores is not None else {}
+    for kind, object_id, when in events:
+        for window in HALF_LIVES:
+            key = (kind, window, object_id)
+            weight = _log_weight(window, when)
+            log_scores[key] = logaddexp(log_scores[key], weight) if key in log_scores else weight
+    return log_scores
+
+
+def _checkout_events(book_id, when, author_id, genre_ids):
+    yield 'b', book_id, when
+    if author_id is not None:
+        yield 'a', author_id, when
+    for genre_id in genre_ids:
+        yield 'g', genre_id, when
+
+
+def record_checkout(book_id, when=None) -> None:
+    """Adds one checkout of the book (and its author and genres) to the popularity scores."""
+    when = when or timezone.now()
+    rows = list(Book.objects.filter(pk=book_id).values_list('author_id', 'genre__id'))
+    if not rows:
+        return
+    author_id = rows[0][0]
+    genre_ids = {genre_id for _, genre_id in rows if genre_id is not None}
+    increments = _accumulate(_checkout_events(book_id, when, author_id, genre_ids))
+
+    # select_for_update() can't lock the scores that don't exist yet (and does nothing on SQLite), so two
+    # first checkouts of the same book, author or genre at the same time may both create its score. The
+    # second one fails the unique constraint in its savepoint and is retried, adding to the new score.
+    # This runs in the checkout's transaction (the Loan post_save signal): a popularity update must
+    # never fail a checkout, so it gives up with a warning rather than raise (rebuild_popularity()
+    # recomputes the scores from the loans).
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                _add_to_scores(increments)
+            return
+        except IntegrityError:
+            continue
+    logger.warning('Popularity scores of book %s not updated: concurrent checkouts kept conflicting', book_id)
+
+
+def _add_to_scores(increments: dict) -> None:
+    lookup = Q()
+    for kind, window, object_id in increments:
+        lookup |= Q(kind=kind, window=window, object_id=object_id)
+    existing = {
+        (score.kind, score.window, score.object_id): score
+        for score in PopularityScore.objects.select_for_update().filter(lookup)
+    }
+    new_scores = []
+    for key, log_increment in increments.items():
+        if key in existing:
+            existing[key].log_score = logaddexp(existing[key].log_score, log_increment)
+            existing[key].updated_at = timezone.now()
+        else:
+            kind, window, object_id = key
+            new_scores.append(PopularityScore(kind=kind, window=window, object_id=object_id, log_score=log_increment))
+    PopularityScore.objects.bulk_update(existing.values(), ['log_score', 'updated_at'])
+    PopularityScore.objects.bulk_create(new_scores)
+
+
+def rebuild_popularity(batch_size: int = 1000) -> int:
+    """Recomputes all the scores from the loan history. Returns the number of scores stored."""
+    authors = dict(Book.objects.values_list('id', 'author_id'))
+    genres = defaultdict(set)
+    for book_id, genre_id in Book.genre.through.objects.values_list('book_id', 'genre_id'):
+        genres[book_id].add(genre_id)
+
+    log_scores = {}
+    # Including the loans moved to the archive (see catalog/archive.py)
+    loans = Loan.objects.filter(book__isnull=False).order_by().values_list('book_id', 'borrowed_at').union(
+        ArchivedLoan.objects.filter(book__isnull=False).order_by().values_list('book_id', 'borrowed_at'), all=True
+    )
+    for book_id, borrowed_at in loans.iterator(chunk_size=10000):
+        _accumulate(_checkout_events(book_id, borrowed_at, authors.get(book_id), genres[book_id]), log_scores)
+
+    with transaction.atomic():
+        PopularityScore.objects.all().delete()
+        PopularityScore.objects.bulk_create(
+            [PopularityScore(kind=kind, window=window, object_id=object_id, log_score=log_score)
+             for (kind, window, object_id), log_score in log_scores.items()],
+            batch_size=batch_size,
+        )
+    return len(log_scores)
+
+
+def top(kind: str, window: str, limit: int = 10) -> list:
+    """Returns the top [(object, current score)] of a kind and window, best first (2 queries)."""
+    scores = list(PopularityScore.objects.filter(kind=kind, window=window).order_by('-log_score')[:limit])
+    objects = KIND_MODELS[kind].objects.in_bulk([score.object_id for score in scores])
+    now = timezone.now()
+    return [
+        (objects[score.object_id], current_score(score, now))
+        for score in scores
+        if score.object_id in objects
+    ]
+
+
+def forget(kind: str, object_id) -> None:
+    """Drops the scores of a deleted book, author or genre."""
+    PopularityScore.objects.filter(kind=kind, object_id=object_id).delete()
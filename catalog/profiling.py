@@ -0,0 +1,115 @@
+import contextlib
+import cProfile
+import pstats
+import time
+from collections import defaultdict
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from .models import RequestProfile
+
+# On-demand profiling of single requests, for "this page is slow" reports from production.
+#
+# A staff user adds ?_profile to any URL (or sends the X-Catalog-Profile header, e.g. for POSTs); the
+# request then runs under cProfile with every SQL query timed, and the result is stored as a
+# RequestProfile shown on the staff-only profiles/ pages. The profile's URL is returned in the
+# X-Catalog-Profile response header.
+#
+# Requests that don't ask for a profile only pay for one dictionary lookup; the profiler and the
+# query timing are only installed for the requests being profiled.
+
+PROFILE_PARAM = '_profile'
+PROFILE_HEADER = 'HTTP_X_CATALOG_PROFILE'
+# How many profiles to keep (older ones are deleted when a new one is stored)
+PROFILES_KEPT = 100
+TOP_FUNCTIONS = 40
+TOP_QUERIES = 50
+
+
+class QueryTimer:
+    """Database execute wrapper (see connection.execute_wrapper()) recording how long each query takes."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.by_sql = defaultdict(lambda: [0, 0.0])
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.total += duration
+            # Grouped by SQL text (without the parameters), which makes N+1 queries stand out
+            self.by_sql[sql][0] += 1
+            self.by_sql[sql][1] += duration
+
+    def top_queries(self, limit=TOP_QUERIES) -> list:
+        queries = sorted(self.by_sql.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+        return [{'sql': sql, 'count': count, 'total_ms': total * 1000} for sql, (count, total) in queries]
+
+
+def top_functions(profiler: cProfile.Profile, limit=TOP_FUNCTIONS) -> list:
+    """Returns the profiled functions with the highest cumulative time."""
+    stats = pstats.Stats(profiler).stats
+    rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    return [
+        {
+            'function': pstats.func_std_string(function),
+            'calls': calls,
+            'tottime_ms': tottime * 1000,
+            'cumtime_ms': cumtime * 1000,
+        }
+        for function, (_, calls, tottime, cumtime, _) in rows
+    ]
+
+
+class RequestProfilingMiddleware:
+    """Profiles the requests of staff users that ask for it with ?_profile or the X-Catalog-Profile header."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'CATALOG_PROFILING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if PROFILE_PARAM not in request.GET and PROFILE_HEADER not in request.META:
+            return self.get_response(request)
+        if not request.user.is_staff:
+            return self.get_response(request)
+        return self.profile(request)
+
+    def profile(self, request):
+        timer = QueryTimer()
+        profiler = cProfile.Profile()
+        with contextlib.ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            start = time.perf_counter()
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+            duration = time.perf_counter() - start
+
+        match = request.resolver_match
+        profile = RequestProfile.objects.create(
+            user=request.user,
+            method=request.method,
+            path=request.get_full_path()[:2000],
+            view_name=(match.view_name if match else '')[:200],
+            status_code=response.status_code,
+            duration_ms=duration * 1000,
+            sql_count=timer.count,
+            sql_ms=timer.total * 1000,
+            functions=top_functions(profiler),
+            queries=timer.top_queries(),
+        )
+        old_profiles = RequestProfile.objects.values_list('pk', flat=True)[PROFILES_KEPT:]
+        RequestProfile.objects.filter(pk__in=list(old_profiles)).delete()
+
+        response['X-Catalog-Profile'] = request.build_absolute_uri(profile.get_absolute_url())
+        return response
@@ -0,0 +1,41 @@
+from .models import Book
+from .url_builder import build_url
+
+# Lightweight read models for pages/exports that only print a few columns of many rows.
+#
+# A full Book instance carries every column (including the up-to-1000-character summary), a model
+# state object and a __dict__. The row classes below are built straight from values_list() tuples and
+# use __slots__, so each row only holds the fields that are actually printed.
+
+
+class BookRow:
+    """Read-only row for book listings and exports."""
+    __slots__ = ('id', 'title', 'isbn', 'author_id', 'author_first_name', 'author_last_name', 'language')
+
+    FIELDS = ('id', 'title', 'isbn', 'author_id', 'author__first_name', 'author__last_name', 'language__name')
+
+    def __init__(self, id, title, isbn, author_id, author_first_name, author_last_name, language):
+        self.id = id
+        self.title = title
+        self.isbn = isbn
+        self.author_id = author_id
+        self.author_first_name = author_first_name
+        self.author_last_name = author_last_name
+        self.language = language
+
+    @property
+    def author_name(self) -> str:
+        """Same format as str(Author)."""
+        if self.author_id is None:
+            return ''
+        return f'{self.author_last_name}, {self.author_first_name}'
+
+    def get_absolute_url(self) -> str:
+        return build_url('book-detail', self.id)
+
+
+def iter_book_rows(books=None, chunk_size: int = 2000):
+    """Streams BookRow objects for a Book queryset (all books by default) without loading it all at once."""
+    books = Book.objects.all() if books is None else books
+    for values in books.values_list(*BookRow.FIELDS).iterator(chunk_size=chunk_size):
+        yield BookRow(*values)
@@ -0,0 +1,130 @@
+import heapq
+import math
+from collections import Counter, defaultdict
+from django.db import transaction
+from .conditional import catalog_changed
+from .models import ArchivedLoan, BookRecommendation, Loan
+
+try:
+    import numpy
+    from scipy import sparse
+except ImportError:  # Optional: pip install numpy scipy for the vectorised build (same results)
+    numpy = sparse = None
+
+# "Patrons also borrowed" recommendations (python manage.py build_recommendations).
+#
+# The loan history (catalog.models.Loan) is turned into a sparse patron x book matrix B (1 = the patron
+# borrowed the book at least once). B.T @ B is the book x book co-borrowing matrix: entry (i, j) is the
+# number of patrons who borrowed both books, and the diagonal is each book's number of borrowers.
+# Each book's neighbours are ranked by cosine similarity, co(i, j) / sqrt(n(i) * n(j)), so that very
+# popular books don't end up recommended everywhere.
+#
+# The build runs offline; only the top TOP_K neighbours of each book are stored, so the detail page
+# reads its recommendations with ONE indexed lookup on (book, rank).
+
+TOP_K = 10
+
+
+def borrow_pairs():
+    """Yields the distinct (borrower id, book id) pairs of the loan history, archived loans included."""
+    # UNION (not UNION ALL) removes the duplicates
+    return (
+        Loan.objects.filter(book__isnull=False)
+        .order_by()
+        .values_list('borrower_id', 'book_id')
+        .union(ArchivedLoan.objects.filter(book__isnull=False).order_by().values_list('borrower_id', 'book_id'))
+        .iterator(chunk_size=10000)
+    )
+
+
+def _top_k(candidates, top_k):
+    # Highest score first; ties go to the book with more co-borrowers, then the lower id (stable output)
+    return heapq.nsmallest(top_k, candidates, key=lambda item: (-item[1], -item[2], item[0]))
+
+
+def compute_with_scipy(pairs, top_k: int = TOP_K, min_co_borrowers: int = 1) -> dict:
+    """Vectorised compute_recommendations() using a scipy.sparse matrix product."""
+    pairs = numpy.array(list(pairs), dtype=numpy.int64).reshape(-1, 2)
+    if not len(pairs):
+        return {}
+    borrower_ids, borrower_index = numpy.unique(pairs[:, 0], return_inverse=True)
+    book_ids, book_index = numpy.unique(pairs[:, 1], return_inverse=True)
+    borrowed = sparse.csr_matrix(
+        (numpy.ones(len(pairs), dtype=numpy.int32), (borrower_index, book_index)),
+        shape=(len(borrower_ids), len(book_ids)),
+    )
+    co_borrowed = (borrowed.T @ borrowed).tocsr()
+    borrowers = co_borrowed.diagonal().astype(numpy.float64)
+    co_borrowed.setdiag(0)
+    co_borrowed.eliminate_zeros()
+
+    recommendations = {}
+    for row in range(co_borrowed.shape[0]):
+        start, end = co_borrowed.indptr[row], co_borrowed.indptr[row + 1]
+        columns, counts = co_borrowed.indices[start:end], co_borrowed.data[start:end]
+        keep = counts >= min_co_borrowers
+        columns, counts = columns[keep], counts[keep]
+        if not len(columns):
+            continue
+        scores = counts / numpy.sqrt(borrowers[row] * borrowers[columns])
+        if len(columns) > top_k:
+            # Only sort the best candidates (ties at the cut are settled by _top_k below)
+            best = numpy.argpartition(-scores, top_k - 1)[:top_k]
+            cut = scores[best].min()
+            best = numpy.flatnonzero(scores >= cut)
+            columns, counts, scores = columns[best], counts[best], scores[best]
+        candidates = zip(book_ids[columns].tolist(), scores.tolist(), counts.tolist())
+        recommendations[int(book_ids[row])] = _top_k(candidates, top_k)
+    return recommendations
+
+
+def compute_in_python(pairs, top_k: int = TOP_K, min_co_borrowers: int = 1) -> dict:
+    """Pure Python compute_recommendations(), for installs without numpy/scipy."""
+    books_by_borrower = defaultdict(set)
+    for borrower_id, book_id in pairs:
+        books_by_borrower[borrower_id].add(book_id)
+
+    borrowers = Counter()
+    co_borrowed = defaultdict(Counter)
+    for books in books_by_borrower.values():
+        borrowers.update(books)
+        for book_id in books:
+            co_borrowed[book_id].update(other for other in books if other != book_id)
+
+    recommendations = {}
+    for book_id, counts in co_borrowed.items():
+        candidates = [
+            (other, count / math.sqrt(borrowers[book_id] * borrowers[other]), count)
+            for other, count in counts.items()
+            if count >= min_co_borrowers
+        ]
+        if candidates:
+            recommendations[book_id] = _top_k(candidates, top_k)
+    return recommendations
+
+
+def compute_recommendations(pairs, top_k: int = TOP_K, min_co_borrowers: int = 1, engine: str = 'auto') -> dict:
+    """Returns {book id: [(recommended book id, score, co-borrowers), ...best first]} from (borrower, book) pairs."""
+    if engine == 'scipy' or (engine == 'auto' and sparse is not None):
+        if sparse is None:
+            raise ImportError('The scipy engine needs numpy and scipy (pip install numpy scipy)')
+        return compute_with_scipy(pairs, top_k, min_co_borrowers)
+    return compute_in_python(pairs, top_k, min_co_borrowers)
+
+
+def build_recommendations(top_k: int = TOP_K, min_co_borrowers: int = 1, engine: str = 'auto',
+                          batch_size: int = 1000) -> dict:
+    """Rebuilds the BookRecommendation table from the loan history and returns some statistics."""
+    recommendations = compute_recommendations(borrow_pairs(), top_k, min_co_borrowers, engine)
+    rows = [
+        BookRecommendation(book_id=book_id, recommended_id=other, rank=rank, score=score, co_borrowers=count)
+        for book_id, neighbours in recommendations.items()
+        for rank, (other, score, count) in enumerate(neighbours, start=1)
+    ]
+    # Swap the whole table at once, so the detail pages never see a half-built set
+    with transaction.atomic():
+        BookRecommendation.objects.all().delete()
+        BookRecommendation.objects.bulk_create(rows, batch_size=batch_size)
+    # The book detail pages show the recommendations: their ETags must change
+    catalog_changed()
+    return {'books': len(recommendations), 'recommendations': len(rows)}
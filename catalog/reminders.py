@@ -0,0 +1,98 @@
+import datetime
+from itertools import groupby
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import Case, CharField, Exists, OuterRef, Value, When
+from django.template.loader import get_template
+from .models import BookInstance, LoanReminder
+
+# Due-soon/overdue reminder emails for borrowers (python manage.py send_loan_reminders).
+#
+#   - One query finds every loan needing a reminder, sorted by borrower, and streams it in chunks
+#   - Each borrower gets ONE digest email listing all their due-soon and overdue loans
+#   - All emails go through a single reused connection, in batches (send_messages)
+#   - Sent reminders are recorded in LoanReminder after each batch, so running the command again
+#     (e.g. from cron, or after a crash) doesn't send the same reminder twice
+
+
+def pending_reminders(today: datetime.date, due_soon_days: int = 3):
+    """Returns the loans needing a reminder, annotated with 'reminder_kind' and ordered by borrower."""
+    loans = (
+        BookInstance.objects.filter(
+            status='o',
+            borrower__isnull=False,
+            due_back__lte=today + datetime.timedelta(days=due_soon_days),
+        )
+        .annotate(reminder_kind=Case(
+            When(due_back__lt=today, then=Value('o')),
+            default=Value('s'),
+            output_field=CharField(),
+        ))
+    )
+    already_sent = LoanReminder.objects.filter(
+        book_instance=OuterRef('pk'),
+        borrower=OuterRef('borrower'),
+        due_back=OuterRef('due_back'),
+        kind=OuterRef('reminder_kind'),
+    )
+    return (
+        loans.filter(~Exists(already_sent))
+        .select_related('book', 'borrower')
+        .only('id', 'due_back', 'book__title', 'borrower__username', 'borrower__first_name', 'borrower__email')
+        .order_by('borrower_id', 'due_back')
+    )
+
+
+def build_digest(borrower, loans: list, today: datetime.date) -> EmailMessage:
+    """Returns the reminder email for one borrower, listing all of their due-soon and overdue loans."""
+    overdue = [loan for loan in loans if loan.reminder_kind == 'o']
+    due_soon = [loan for loan in loans if loan.reminder_kind == 's']
+    body = get_template('catalog/email/loan_reminder.txt').render({
+        'borrower': borrower,
+        'overdue': overdue,
+        'due_soon': due_soon,
+        'today': today,
+    })
+    subject = 'Local Library: overdue books' if overdue else 'Local Library: books due soon'
+    return EmailMessage(subject, body, settings.DEFAULT_FROM_EMAIL, [borrower.email])
+
+
+def send_loan_reminders(today=None, due_soon_days: int = 3, batch_size: int = 500, dry_run: bool = False,
+                        connection=None) -> dict:
+    """Sends one reminder digest per borrower with due-soon or overdue loans and returns some statistics."""
+    today = today or datetime.date.today()
+    stats = {'emails': 0, 'loans': 0, 'skipped_no_email': 0}
+    messages, reminders = [], []
+
+    def flush():
+        if not dry_run and messages:
+            connection.send_messages(messages)
+            LoanReminder.objects.bulk_create(reminders, ignore_conflicts=True)
+        messages.clear()
+        reminders.clear()
+
+    connection = connection or get_connection()
+    connection.open()
+    try:
+        loans = pending_reminders(today, due_soon_days).iterator(chunk_size=2000)
+        for _, borrower_loans in groupby(loans, key=lambda loan: loan.borrower_id):
+            borrower_loans = list(borrower_loans)
+            borrower = borrower_loans[0].borrower
+            if not borrower.email:
+                stats['skipped_no_email'] += 1
+                continue
+
+            messages.append(build_digest(borrower, borrower_loans, today))
+            reminders += [
+                LoanReminder(book_instance_id=loan.pk, borrower_id=borrower.pk, due_back=loan.due_back,
+                             kind=loan.reminder_kind)
+                for loan in borrower_loans
+            ]
+            stats['emails'] += 1
+            stats['loans'] += len(borrower_loans)
+            if len(messages) >= batch_size:
+                flush()
+        flush()
+    finally:
+        connection.close()
+    return stats
@@ -0,0 +1,108 @@
+import contextlib
+import contextvars
+import functools
+import random
+from django.conf import settings
+from django.http.request import HttpRequest
+from django.urls import reverse
+
+# Read replica routing for the catalog app.
+#
+# Catalog reads go to the primary ('default') database unless they are made in a request that may read
+# from one of settings.CATALOG_READ_REPLICAS (if any are configured): a GET/HEAD request, outside the
+# admin, from a browser that didn't write anything in the last CATALOG_REPLICA_STICKY_SECONDS (a replica
+# may not have caught up with that write yet: read-your-writes). Everything else reads from the primary:
+# requests that write, management commands, the job worker, the Create/Update/Delete and renewal views
+# (primary_db_view), and a request that may use the replicas from its first catalog write onwards.
+# Writes always go to the primary.
+
+PRIMARY_DB = 'default'
+STICKY_COOKIE = 'catalog_use_primary'
+
+_use_replicas = contextvars.ContextVar('catalog_use_replicas', default=False)
+
+
+def read_replicas() -> list:
+    return list(getattr(settings, 'CATALOG_READ_REPLICAS', []))
+
+
+class CatalogReplicaRouter:
+    """Database router sending catalog reads to the read replicas and catalog writes to the primary."""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label != 'catalog':
+            return None
+        replicas = read_replicas()
+        if not replicas or not _use_replicas.get():
+            return PRIMARY_DB
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label != 'catalog':
+            return None
+        # Whatever reads what was just written must see it: the rest of the request reads from the primary
+        _use_replicas.set(False)
+        return PRIMARY_DB
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replicas hold the same data as the primary
+        databases = {PRIMARY_DB, *read_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary, never from migrate
+        if db in read_replicas():
+            return False
+        return None
+
+
+@contextlib.contextmanager
+def use_read_replicas(enabled: bool = True):
+    """Context manager letting the catalog reads go to the read replicas (or not, with enabled=False)."""
+    token = _use_replicas.set(enabled)
+    try:
+        yield
+    finally:
+        _use_replicas.reset(token)
+
+
+def use_primary_db():
+    """Context manager sending catalog reads to the primary database."""
+    return use_read_replicas(False)
+
+
+def primary_db_view(view_func):
+    """View decorator sending all of the view's catalog reads to the primary database."""
+    @functools.wraps(view_func)
+    def wrapped_view(*args, **kwargs):
+        with use_primary_db():
+            return view_func(*args, **kwargs)
+    return wrapped_view
+
+
+class ReplicaRoutingMiddleware:
+    """Lets safe requests read from the replicas, except just after the same browser wrote something."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest):
+        writes = request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+        replicas_allowed = (
+            request.method in ('GET', 'HEAD')
+            and STICKY_COOKIE not in request.COOKIES
+            and not request.path.startswith(reverse('admin:index'))
+        )
+        with use_read_replicas(replicas_allowed):
+            response = self.get_response(request)
+
+        if writes and read_replicas():
+            # Read-your-writes: keep this browser on the primary until the replicas have caught up
+            response.set_cookie(
+                STICKY_COOKIE, '1',
+                max_age=getattr(settings, 'CATALOG_REPLICA_STICKY_SECONDS', 5),
+                httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+# Several catalog features keep state in the default cache that every worker process must see: the
+# version numbers that invalidate the facet counts and the patron dashboards, the cached permissions and
+# the rate limit buckets. With a cache that each process keeps to itself, a change only invalidates the
+# cache of the process that made it, a revoked permission would still be granted by the other processes
+# (so permissions aren't cached across requests, see catalog/permissions.py), and each process would
+# count the rate limits on its own (so throttling is switched off, see catalog/throttling.py).
+#
+# The development server is a single process, so the default local memory cache is fine there (apart
+# from changes made by python manage.py run_catalog_worker). Production needs a shared cache, such as
+# the Redis cache of locallibrary/settings_production.py.
+
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def cache_is_shared(alias: str = 'default') -> bool:
+    """Whether every process sees the same cache (not a local memory or dummy cache)."""
+    return settings.CACHES[alias]['BACKEND'] not in PROCESS_LOCAL_CACHES
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    if cache_is_shared():
+        return []
+    return [Warning(
+        'The default cache is local to each process, so the catalog caches are only invalidated in the '
+        'process where a change is made, and rate limiting is switched off.',
+        hint='Configure a cache shared by all the processes, e.g. Redis (see locallibrary/settings_production.py).',
+        id='catalog.W001',
+    )]
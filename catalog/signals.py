@@ -0,0 +1,130 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.contrib.auth.models import Group, Permission, User
+from django.dispatch import receiver
+from .models import Author, Book, BookInstance, Genre, Hold, Language, Loan
+from .facets import invalidate_facet_counts
+from .conditional import catalog_changed
+from .holds import assign_next_hold, expire_reserved_holds
+from .loans import record_loan_change
+from .dashboard import invalidate_dashboard
+from . import popularity
+from .permissions import permissions_changed
+from .live import publish_copy_change
+
+# Signal handlers for the catalog app. They are connected in CatalogConfig.ready() (see catalog/apps.py)
+
+@receiver(post_save, sender=BookInstance)
+def record_loan_history(sender, instance, created, raw=False, **kwargs):
+    """Opens a Loan when a copy is lent and closes it when the copy is returned (see catalog/loans.py)."""
+    if raw:
+        return
+    record_loan_change(instance, created)
+
+
+# Connected before hand_available_copy_to_next_hold, which saves the copy again for its new borrower
+@receiver(post_save, sender=BookInstance)
+@receiver(post_delete, sender=BookInstance)
+def invalidate_borrower_dashboard(sender, instance, **kwargs):
+    """A copy changing hands changes the dashboards of its previous and its new borrower."""
+    invalidate_dashboard(instance.__dict__.get('borrower_id'), getattr(instance, '_loaded_borrower_id', None))
+
+
+# Also connected before hand_available_copy_to_next_hold, so that the pages receive "available" before
+# "reserved" when a returned copy goes straight to the next patron in the queue
+@receiver(post_save, sender=BookInstance)
+def publish_copy_status(sender, instance, raw=False, **kwargs):
+    """Pushes the copy's status to the pages showing it live (see catalog/live.py)."""
+    if raw:
+        return
+    publish_copy_change(instance.pk, instance.book_id, instance.status, instance.due_back)
+
+
+@receiver(post_delete, sender=BookInstance)
+def publish_copy_deleted(sender, instance, **kwargs):
+    """Tells the pages showing the copy live that it is gone."""
+    publish_copy_change(instance.pk, instance.book_id, 'deleted')
+
+
+@receiver(post_save, sender=BookInstance)
+def hand_available_copy_to_next_hold(sender, instance, created, **kwargs):
+    """When a copy becomes available (e.g. it was returned), reserve it for the next patron in its book's hold queue."""
+    if instance.status != 'a' or instance.book_id is None:
+        return
+    if not created and getattr(instance, '_loaded_status', None) == 'a':
+        return
+
+    assign_next_hold(instance)
+
+
+@receiver(pre_delete, sender=BookInstance)
+def expire_holds_of_deleted_copy(sender, instance, **kwargs):
+    """A deleted copy can't be collected: its holds expire (before Hold.copy is set to NULL)."""
+    expire_reserved_holds(instance)
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=BookInstance)
+@receiver(post_save, sender=Author)
+@receiver(post_delete, sender=Author)
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+@receiver(post_save, sender=Language)
+@receiver(post_delete, sender=Language)
+@receiver(m2m_changed, sender=Book.genre.through)
+def invalidate_catalog_caches(sender, **kwargs):
+    """Any change to the catalog may change the facet counts on the book list and the catalog pages' ETags."""
+    invalidate_facet_counts()
+    catalog_changed()
+
+
+@receiver(post_save, sender=BookInstance)
+def invalidate_catalog_caches_for_copy(sender, instance, created, **kwargs):
+    """A copy only changes the facet counts and the catalog pages when it is added or changes status or book.
+
+    Renewals, reminders and other saves that only change the due date or the borrower leave them alone.
+    """
+    # A copy that wasn't loaded from the database has no previous status to compare with
+    if not created and hasattr(instance, '_loaded_status'):
+        # A field that wasn't loaded (.only()) can't have been changed either
+        status_changed = 'status' in instance.__dict__ and instance.status != instance._loaded_status
+        book_changed = ('book_id' in instance.__dict__
+                        and instance.book_id != getattr(instance, '_loaded_book_id', instance.book_id))
+        if not status_changed and not book_changed:
+            return
+    invalidate_catalog_caches(sender)
+
+
+@receiver(post_save, sender=Hold)
+@receiver(post_delete, sender=Hold)
+def invalidate_patron_dashboard(sender, instance, **kwargs):
+    """The patron's hold counts are shown on their dashboard."""
+    invalidate_dashboard(instance.patron_id)
+
+
+@receiver(post_save, sender=Loan)
+def count_checkout(sender, instance, created, raw=False, **kwargs):
+    """Every new loan is a checkout for the popularity rankings (see catalog/popularity.py)."""
+    if created and not raw and instance.book_id is not None:
+        popularity.record_checkout(instance.book_id, instance.borrowed_at)
+
+
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Genre)
+def forget_popularity(sender, instance, **kwargs):
+    """Deleted books, authors and genres leave the popularity rankings."""
+    kind = {Book: 'b', Author: 'a', Genre: 'g'}[sender]
+    popularity.forget(kind, instance.pk)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+@receiver(m2m_changed, sender=Group.permissions.through)
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def invalidate_permission_cache(sender, **kwargs):
+    """Any change to permissions, groups or memberships may change what users are allowed to do (see catalog/permissions.py)."""
+    permissions_changed()
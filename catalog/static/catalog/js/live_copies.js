@@ -0,0 +1,36 @@
+// Live copy availability (see catalog/live.py).
+//
+// Elements with a data-copy-id attribute show one copy; inside them, the elements with the
+// data-copy-status and data-copy-due attributes are updated when the copy changes. The stream URL
+// is taken from the data-live-copies attribute of the page element that lists the copies.
+(function () {
+  var STATUS_CLASSES = {a: 'text-success', m: 'text-danger'};
+
+  function updateCopy(copy) {
+    document.querySelectorAll('[data-copy-id="' + copy.id + '"]').forEach(function (element) {
+      element.querySelectorAll('[data-copy-status]').forEach(function (status) {
+        status.textContent = copy.status_display;
+        status.classList.remove('text-success', 'text-danger', 'text-warning');
+        status.classList.add(STATUS_CLASSES[copy.status] || 'text-warning');
+      });
+      element.querySelectorAll('[data-copy-due]').forEach(function (due) {
+        due.textContent = copy.due_back || '';
+        var row = due.closest('[data-copy-due-row]');
+        if (row) {
+          row.hidden = copy.status === 'a';
+        }
+      });
+    });
+  }
+
+  document.addEventListener('DOMContentLoaded', function () {
+    var list = document.querySelector('[data-live-copies]');
+    if (!list || !window.EventSource) {
+      return;
+    }
+    var source = new EventSource(list.dataset.liveCopies);
+    source.addEventListener('copy', function (event) {
+      updateCopy(JSON.parse(event.data));
+    });
+  });
+})();
@@ -0,0 +1,129 @@
+import mimetypes
+import os
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_etags
+
+# Efficient in-process static file serving for deployments without a front proxy (nginx, a CDN, ...).
+# Enabled by the production settings profile (locallibrary/settings_production.py) when
+# CATALOG_SERVE_STATIC is True. Unlike django.conf.urls.static.static() (development only):
+#   - STATIC_ROOT is scanned ONCE at startup, so serving a file needs no filesystem lookups
+#   - the .br/.gz copies written by catalog.storage.CompressedManifestStaticFilesStorage are served to
+#     browsers that accept them, instead of compressing on every request
+#   - hashed file names (styles.3f2a9c1b.css) are cached forever by browsers (Cache-Control: immutable)
+# Each encoding of a file is a different representation, so it has its own ETag ("...-br", "...-gz").
+
+FAR_FUTURE = 60 * 60 * 24 * 365
+UNHASHED_MAX_AGE = 60
+
+# Preferred first: (encoding, file name suffix, ETag suffix)
+ENCODINGS = (('br', '.br', '-br'), ('gzip', '.gz', '-gz'))
+
+
+def accepted_encodings(header: str) -> dict:
+    """Parses an Accept-Encoding header into {coding: q-value}, e.g. 'gzip, br;q=0' -> {'gzip': 1.0, 'br': 0.0}."""
+    accepted = {}
+    for item in header.split(','):
+        coding, _, params = item.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def encoding_quality(accepted: dict, coding: str) -> float:
+    """The q-value of a coding: given explicitly, or through '*' (not acceptable if neither)."""
+    return accepted.get(coding, accepted.get('*', 0.0))
+
+
+class StaticFile:
+    __slots__ = ('path', 'content_type', 'size', 'etag', 'last_modified', 'cache_control', 'variants')
+
+    def __init__(self, path, immutable):
+        stat = os.stat(path)
+        self.path = path
+        self.content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        if self.content_type.startswith('text/') or self.content_type in ('application/javascript', 'image/svg+xml'):
+            self.content_type += '; charset=utf-8'
+        self.size = stat.st_size
+        etag = f'{int(stat.st_mtime)}-{stat.st_size}'
+        self.etag = f'"{etag}"'
+        self.last_modified = http_date(stat.st_mtime)
+        max_age = f'max-age={FAR_FUTURE}, immutable' if immutable else f'max-age={UNHASHED_MAX_AGE}'
+        self.cache_control = f'public, {max_age}'
+        # Pre-compressed copies: [(encoding, path, size, ETag)]
+        self.variants = [
+            (encoding, path + suffix, os.path.getsize(path + suffix), f'"{etag}{etag_suffix}"')
+            for encoding, suffix, etag_suffix in ENCODINGS
+            if os.path.exists(path + suffix)
+        ]
+
+
+class StaticFilesMiddleware:
+    """Serves the collected static files (STATIC_ROOT) directly from the Django process."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'CATALOG_SERVE_STATIC', False) or not settings.STATIC_ROOT:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.prefix = settings.STATIC_URL if settings.STATIC_URL.startswith('/') else '/' + settings.STATIC_URL
+        self.files = self.scan(str(settings.STATIC_ROOT))
+
+    def scan(self, root):
+        hashed_names = set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+        files = {}
+        for directory, _, filenames in os.walk(root):
+            for filename in filenames:
+                if filename.endswith(('.gz', '.br')):
+                    continue
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, root).replace(os.sep, '/')
+                files[name] = StaticFile(path, immutable=name in hashed_names)
+        return files
+
+    def __call__(self, request):
+        if request.method in ('GET', 'HEAD') and request.path_info.startswith(self.prefix):
+            static_file = self.files.get(request.path_info[len(self.prefix):])
+            if static_file is not None:
+                return self.serve(request, static_file)
+        return self.get_response(request)
+
+    def serve(self, request, static_file):
+        # The accepted encoding with the highest q-value (q=0 means "not acceptable"), the first
+        # of ENCODINGS if several are as good, or the uncompressed file
+        path, size, encoding, etag = static_file.path, static_file.size, None, static_file.etag
+        accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        best_quality = 0.0
+        for variant_encoding, variant_path, variant_size, variant_etag in static_file.variants:
+            quality = encoding_quality(accepted, variant_encoding)
+            if quality > best_quality:
+                path, size, encoding, etag = variant_path, variant_size, variant_encoding, variant_etag
+                best_quality = quality
+
+        if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        if etag in if_none_match or '*' in if_none_match:
+            response = HttpResponseNotModified()
+        else:
+            # For HEAD requests the WSGI/ASGI server drops the body
+            response = FileResponse(open(path, 'rb'), content_type=static_file.content_type)
+            response['Content-Length'] = size
+            if 'Content-Disposition' in response:
+                del response['Content-Disposition']
+            if encoding:
+                response['Content-Encoding'] = encoding
+        response['ETag'] = etag
+        response['Last-Modified'] = static_file.last_modified
+        response['Cache-Control'] = static_file.cache_control
+        response['Vary'] = 'Accept-Encoding'
+        return response
@@ -0,0 +1,53 @@
+import gzip
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:  # Optional: pip install brotli to also get .br files
+    brotli = None
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage that also writes pre-compressed .gz (and .br) copies at collectstatic time.
+
+    The hashed file names (styles.3f2a9c1b.css) never change content, so they can be cached forever by
+    browsers and CDNs, and the compressed copies can be served as they are by a front proxy or by
+    catalog.static_middleware.StaticFilesMiddleware without compressing on every request.
+    """
+
+    # Formats that are already compressed: compressing them again only costs time
+    SKIP_EXTENSIONS = ('.gz', '.br', '.png', '.jpg', '.jpeg', '.gif', '.webp', '.woff', '.woff2', '.zip')
+    # Below this size the compressed file (plus headers) isn't worth it
+    MIN_SIZE = 256
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+
+        for name in sorted(set(self.hashed_files.values())):
+            if name.lower().endswith(self.SKIP_EXTENSIONS):
+                continue
+            for compressed_name in self.compress(name):
+                yield name, compressed_name, True
+
+    def compress(self, name):
+        """Writes the compressed copies of a collected file and returns their names."""
+        with self.open(name) as original:
+            content = original.read()
+        if len(content) < self.MIN_SIZE:
+            return []
+
+        written = []
+        variants = [('.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', lambda data: brotli.compress(data, quality=11)))
+        for suffix, compress in variants:
+            compressed = compress(content)
+            # Only keep it if it actually saves space
+            if len(compressed) < len(content):
+                path = self.path(name + suffix)
+                with open(path, 'wb') as compressed_file:
+                    compressed_file.write(compressed)
+                written.append(name + suffix)
+        return written
@@ -0,0 +1,98 @@
+from datetime import timedelta
+from django.core.management import call_command
+from django.db.models import Q
+from django.utils import timezone
+from .jobs import enqueue_once, task
+from .models import Author, Book, BookInstance, CatalogCounts
+from . import reminders
+from .book_import import import_books_csv
+from . import recommendations
+from . import popularity
+
+# Built-in background tasks for the catalog worker (python manage.py run_catalog_worker).
+# Queue them with catalog.jobs.enqueue('<name>', **kwargs).
+
+# The home page shows the counts stored by the last 'recompute_catalog_counts' job. Once they are older
+# than INDEX_COUNTS_MAX_AGE the home page queues a new job (one at a time) and keeps showing them until it
+# has run. The page never writes them itself: when there are none yet, it computes them for itself and
+# leaves storing them to the job.
+INDEX_COUNTS_MAX_AGE = timedelta(minutes=1)
+
+
+def compute_index_counts() -> dict:
+    """Returns the record counts shown on the home page."""
+    # Generate counts of some of the main objects
+    # ManyToManyField to a related model requires .all()
+    num_books = Book.objects.all().count()
+    num_instances = BookInstance.objects.all().count()
+
+    # Available books (status = 'a')
+    num_instances_available = BookInstance.objects.filter(status__exact='a').count()
+
+    # Get count of books with Harry in the title AND in the Fantasy genre
+    harry_condition = Q(title__contains='Harry')
+    fantasy_condition = Q(genre__name__contains='Fantasy')
+    # Combine conditions using logical operators
+    # For 'AND' conditions, use '&' (bitwise AND)
+    # For 'OR' conditions, use '|' (bitwise OR)
+    # For 'NOT' conditions, use '~' (bitwise NOT)
+    combined_conditions = harry_condition & fantasy_condition
+    # Apply the filter to your model using the filter() method
+    num_books_harry_fantasy = Book.objects.filter(combined_conditions).count()
+
+    # The 'all()' is implied by default because it is not a ManyToManyField to a related model
+    num_authors = Author.objects.count()
+
+    return {
+        'num_books': num_books,
+        'num_books_harry_fantasy': num_books_harry_fantasy,
+        'num_instances': num_instances,
+        'num_instances_available': num_instances_available,
+        'num_authors': num_authors,
+    }
+
+
+@task('recompute_catalog_counts')
+def recompute_catalog_counts() -> dict:
+    """Recomputes the home page counts and stores them, so the index view doesn't have to run the COUNT queries."""
+    counts = compute_index_counts()
+    CatalogCounts.objects.update_or_create(pk=1, defaults={'counts': counts, 'computed_at': timezone.now()})
+    return counts
+
+
+def index_counts() -> dict:
+    """Returns the home page counts (see INDEX_COUNTS_MAX_AGE above)."""
+    stored = CatalogCounts.objects.filter(pk=1).first()
+    if stored is None or timezone.now() - stored.computed_at > INDEX_COUNTS_MAX_AGE:
+        enqueue_once('recompute_catalog_counts')
+    return stored.counts if stored is not None else compute_index_counts()
+
+
+@task('prune_revisions')
+def prune_revisions(days: int = 90, keep: int = 1) -> None:
+    """Deletes django-reversion history of catalog objects older than 'days', keeping the last 'keep' versions."""
+    call_command('deleterevisions', 'catalog', days=days, keep=keep, verbosity=0)
+
+
+@task('send_loan_reminders')
+def send_loan_reminders(due_soon_days: int = 3, batch_size: int = 500) -> dict:
+    """Emails the due-soon/overdue reminder digests (same as python manage.py send_loan_reminders)."""
+    return reminders.send_loan_reminders(due_soon_days=due_soon_days, batch_size=batch_size)
+
+
+@task('import_books')
+def import_books(path: str, chunk_size: int = 500) -> dict:
+    """Imports books from a CSV file (same as python manage.py import_books)."""
+    return import_books_csv(path, chunk_size=chunk_size)
+
+
+@task('build_recommendations')
+def build_recommendations(top_k: int = recommendations.TOP_K) -> dict:
+    """Rebuilds the "patrons also borrowed" recommendations (same as python manage.py build_recommendations)."""
+    return recommendations.build_recommendations(top_k=top_k)
+
+
+@task('rebuild_popularity')
+def rebuild_popularity() -> int:
+    """Recomputes the popularity rankings from the loan history (same as python manage.py rebuild_popularity)."""
+    return popularity.rebuild_popularity()
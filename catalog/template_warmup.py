@@ -0,0 +1,39 @@
+import logging
+from pathlib import Path
+from django.apps import apps
+from django.conf import settings
+from django.template import TemplateDoesNotExist, TemplateSyntaxError
+from django.template.loader import get_template
+
+logger = logging.getLogger(__name__)
+
+
+def warmup_template_names() -> list:
+    """Returns the names of all catalog and registration templates, relative to their template directory."""
+    template_dirs = [Path(apps.get_app_config('catalog').path) / 'templates']
+    for engine in settings.TEMPLATES:
+        template_dirs += [Path(directory) for directory in engine.get('DIRS', [])]
+
+    names = set()
+    for template_dir in template_dirs:
+        if template_dir.is_dir():
+            names.update(path.relative_to(template_dir).as_posix() for path in template_dir.rglob('*.html'))
+    return sorted(names)
+
+
+def warm_template_cache() -> int:
+    """Compiles every catalog and registration template so the cached loader keeps them in memory.
+
+    Returns the number of templates that were compiled. Only useful when the cached template loader
+    is enabled (see locallibrary/settings_production.py).
+    """
+    compiled = 0
+    for name in warmup_template_names():
+        try:
+            get_template(name)
+        except (TemplateDoesNotExist, TemplateSyntaxError):
+            # A broken template shouldn't stop the worker from booting; it will fail on render as usual
+            logger.exception('Could not pre-compile template %s', name)
+        else:
+            compiled += 1
+    return compiled
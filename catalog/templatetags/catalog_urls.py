@@ -0,0 +1,13 @@
+from django import template
+from catalog.url_builder import build_url
+
+register = template.Library()
+
+# Usage in a template (after {% load catalog_urls %}):
+#   {% fast_url 'renew-book-librarian' bookinst.id %}
+# Produces the same output as {% url 'renew-book-librarian' bookinst.id %} but uses the cached
+# URL templates from catalog/url_builder.py instead of going through the URL resolver for every row.
+@register.simple_tag
+def fast_url(url_name, pk):
+    """Template tag version of catalog.url_builder.build_url()."""
+    return build_url(url_name, pk)
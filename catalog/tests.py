@@ -1,3 +1,969 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import gzip
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from unittest import mock
+from django.contrib.auth import BACKEND_SESSION_KEY
+from django.contrib.auth.models import Group, Permission, User
+from django.contrib.messages import get_messages
+from django.core import mail
+from django.core.cache import cache
+from django.db import IntegrityError, connection, connections, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import NoReverseMatch, reverse
+from django.utils import timezone
+from reversion.models import Version
+from catalog import archive, backup, holds, jobs, live, popularity
+from catalog.conditional import changes_version
+from catalog.models import (ArchivedBookInstance, ArchivedLoan, Author, Book, BookInstance, CatalogCounts, CatalogJob, Genre, Hold, Language, LoanReminder,
+                            Loan, PopularityScore)
+from catalog.book_import import import_books
+from catalog.forms import BookModelForm
+from catalog.reminders import send_loan_reminders
+from catalog.routers import CatalogReplicaRouter, use_read_replicas
+from catalog.static_middleware import StaticFilesMiddleware
+from catalog.tasks import index_counts
+from catalog.url_builder import build_url
+from catalog.urls import urlpatterns as catalog_urlpatterns
+from catalog.throttling import take_token
 
 # Create your tests here.
+
+TODAY = datetime.date(2026, 3, 10)
+
+
+class LoanReminderTest(TestCase):
+    """The reminder digests (catalog/reminders.py), sent through the locmem email backend."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.book = Book.objects.create(title='Reminder book', summary='Summary', isbn='9780306406157')
+        cls.borrowers = [
+            User.objects.create_user(f'borrower{n}', email=f'borrower{n}@example.com') for n in range(5)
+        ]
+        for borrower in cls.borrowers:
+            cls.lend(borrower, TODAY - datetime.timedelta(days=2))  # Overdue
+        # A second loan of the first borrower, due soon: in the same digest
+        cls.lend(cls.borrowers[0], TODAY + datetime.timedelta(days=1))
+        # Not due soon: no reminder
+        cls.lend(cls.borrowers[1], TODAY + datetime.timedelta(days=20))
+        # No email address: skipped
+        cls.lend(User.objects.create_user('no-email'), TODAY - datetime.timedelta(days=1))
+
+    @classmethod
+    def lend(cls, borrower, due_back):
+        return BookInstance.objects.create(book=cls.book, imprint='Imprint', status='o', borrower=borrower,
+                                           due_back=due_back)
+
+    def send(self, batch_size=2):
+        connection = mail.get_connection()
+        batches = []
+        send_messages = connection.send_messages
+
+        def record_batch(messages):
+            # The list is reused for the next batch, so record its size now
+            batches.append(len(messages))
+            return send_messages(messages)
+
+        with mock.patch.object(connection, 'send_messages', record_batch):
+            stats = send_loan_reminders(today=TODAY, batch_size=batch_size, connection=connection)
+        return stats, batches
+
+    def test_one_digest_per_borrower_sent_in_batches(self):
+        stats, batches = self.send(batch_size=2)
+
+        self.assertEqual(batches, [2, 2, 1])
+        self.assertEqual(stats, {'emails': 5, 'loans': 6, 'skipped_no_email': 1})
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox),
+                         [f'borrower{n}@example.com' for n in range(5)])
+        first = next(message for message in mail.outbox if message.to == ['borrower0@example.com'])
+        self.assertEqual(first.subject, 'Local Library: overdue books')
+        self.assertEqual(first.body.count('Reminder book'), 2)
+        self.assertEqual(LoanReminder.objects.count(), 6)
+
+    def test_sent_reminders_are_not_sent_again(self):
+        self.send()
+        mail.outbox.clear()
+
+        stats, batches = self.send()
+
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(batches, [])
+        self.assertEqual(stats['emails'], 0)
+        self.assertEqual(LoanReminder.objects.count(), 6)
+
+    def test_renewed_loan_gets_a_new_reminder(self):
+        self.send()
+        mail.outbox.clear()
+        copy = BookInstance.objects.filter(borrower=self.borrowers[2]).get()
+        copy.due_back = TODAY + datetime.timedelta(days=2)
+        copy.save()
+
+        stats, _ = self.send()
+
+        self.assertEqual([message.to for message in mail.outbox], [['borrower2@example.com']])
+        self.assertEqual(mail.outbox[0].subject, 'Local Library: books due soon')
+        self.assertEqual(stats['loans'], 1)
+
+
+class HoldTest(TestCase):
+    """The hold queue (catalog/holds.py) and the closing of fulfilled holds."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.book = Book.objects.create(title='Held book', summary='Summary', isbn='9780306406157')
+        cls.patron = User.objects.create_user('patron')
+        cls.other_patron = User.objects.create_user('other-patron')
+
+    def setUp(self):
+        self.copy = BookInstance.objects.create(book=self.book, imprint='Imprint', status='o',
+                                                borrower=self.other_patron, due_back=TODAY)
+
+    def return_copy(self):
+        self.copy.status = 'a'
+        self.copy.borrower = None
+        self.copy.save()
+
+    def test_place_reserve_checkout_closes_the_hold(self):
+        hold = holds.place_hold(self.book, self.patron)
+        self.assertEqual(hold.status, 'w')
+
+        self.return_copy()
+        hold.refresh_from_db()
+        self.copy.refresh_from_db()
+        self.assertEqual((hold.status, hold.copy_id), ('f', self.copy.pk))
+        self.assertEqual((self.copy.status, self.copy.borrower_id), ('r', self.patron.pk))
+
+        # The librarian lends the reserved copy to the patron
+        self.copy.status = 'o'
+        self.copy.due_back = TODAY + datetime.timedelta(weeks=3)
+        self.copy.save()
+        hold.refresh_from_db()
+        self.assertEqual(hold.status, 'o')
+        self.assertFalse(Hold.objects.filter(patron=self.patron, status__in=['w', 'f']).exists())
+
+    def test_released_copy_expires_the_hold_and_goes_to_the_next_patron(self):
+        hold = holds.place_hold(self.book, self.patron)
+        next_hold = holds.place_hold(self.book, self.other_patron)
+        self.return_copy()
+
+        # The librarian releases the reservation
+        copy = BookInstance.objects.get(pk=self.copy.pk)
+        copy.status = 'a'
+        copy.borrower = None
+        copy.save()
+
+        hold.refresh_from_db()
+        next_hold.refresh_from_db()
+        self.assertEqual(hold.status, 'e')
+        self.assertEqual((next_hold.status, next_hold.copy_id), ('f', self.copy.pk))
+
+    def test_concurrent_place_hold_returns_the_existing_hold(self):
+        hold = holds.place_hold(self.book, self.patron)
+        tickets_issued = Book.objects.get(pk=self.book.pk).hold_tickets_issued
+
+        # As if a concurrent request had placed the hold after the check for an existing one
+        no_existing_hold = mock.Mock(first=mock.Mock(return_value=None))
+        with mock.patch.object(Hold.objects, 'filter', return_value=no_existing_hold):
+            self.assertEqual(holds.place_hold(self.book, self.patron), hold)
+
+        self.assertEqual(Hold.objects.filter(book=self.book, patron=self.patron).count(), 1)
+        # The ticket taken in the failed savepoint was rolled back
+        self.assertEqual(Book.objects.get(pk=self.book.pk).hold_tickets_issued, tickets_issued)
+
+
+class CatalogInvalidationTest(TestCase):
+    """Which copy saves change the catalog version and the facet counts (catalog/signals.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.book = Book.objects.create(title='Invalidated book', summary='Summary', isbn='9780306406157')
+        cls.borrower = User.objects.create_user('borrower')
+
+    def save_changes_version(self, copy, **changes):
+        """Saves the copy (loaded from the database) with the changes; returns whether the catalog version changed."""
+        copy = BookInstance.objects.get(pk=copy.pk)
+        for name, value in changes.items():
+            setattr(copy, name, value)
+        version = changes_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            copy.save()
+        return changes_version() != version
+
+    def test_only_status_and_book_changes_invalidate(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            copy = BookInstance.objects.create(book=self.book, imprint='Imprint', status='a')
+        other_book = Book.objects.create(title='Other book', summary='Summary', isbn='9780306406164')
+
+        self.assertTrue(self.save_changes_version(copy, status='o', borrower=self.borrower, due_back=TODAY))
+        # A renewal and a change of borrower
+        self.assertFalse(self.save_changes_version(copy, due_back=TODAY + datetime.timedelta(weeks=1)))
+        self.assertFalse(self.save_changes_version(copy, borrower=User.objects.create_user('other')))
+        self.assertTrue(self.save_changes_version(copy, book=other_book))
+
+
+class JobQueueTest(TestCase):
+    """The database-backed job queue (catalog/jobs.py)."""
+
+    def setUp(self):
+        self.calls = []
+        tasks = {
+            'test_ok': lambda **kwargs: self.calls.append(kwargs) or len(self.calls),
+            'test_failing': self.fail_task,
+            'test_not_json': lambda: object(),
+        }
+        patcher = mock.patch.dict(jobs._registry, tasks)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fail_task(self):
+        raise RuntimeError('Task failed')
+
+    def test_claim_takes_due_jobs_once(self):
+        later = jobs.enqueue('test_ok', run_after=timezone.now() + datetime.timedelta(hours=1))
+        due = jobs.enqueue('test_ok', n=1)
+
+        claimed = jobs.claim_next_job()
+        self.assertEqual((claimed.pk, claimed.status, claimed.attempts), (due.pk, 'r', 1))
+        # Already running, and the other job isn't due yet
+        self.assertIsNone(jobs.claim_next_job())
+
+        jobs.run_job(claimed)
+        claimed.refresh_from_db()
+        self.assertEqual((claimed.status, claimed.result), ('d', 1))
+        self.assertEqual(self.calls, [{'n': 1}])
+        self.assertEqual(CatalogJob.objects.get(pk=later.pk).status, 'q')
+
+    def test_retry_backoff_until_max_attempts(self):
+        job = jobs.enqueue('test_failing', max_attempts=3)
+        for attempt, delay in [(1, 10), (2, 20)]:
+            with self.assertLogs('catalog.jobs', 'ERROR'):
+                before = timezone.now()
+                jobs.run_job(jobs.claim_next_job())
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), ('q', attempt))
+            self.assertIn('Task failed', job.last_error)
+            self.assertAlmostEqual((job.run_after - before).total_seconds(), delay, delta=1)
+            # Due again
+            CatalogJob.objects.filter(pk=job.pk).update(run_after=timezone.now())
+
+        with self.assertLogs('catalog.jobs', 'ERROR'):
+            jobs.run_job(jobs.claim_next_job())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('f', 3))
+        self.assertIsNotNone(job.finished_at)
+        self.assertIsNone(jobs.claim_next_job())
+
+    def test_result_that_is_not_json_fails_the_job(self):
+        jobs.enqueue('test_not_json')
+        with self.assertLogs('catalog.jobs', 'ERROR'):
+            jobs.run_job(jobs.claim_next_job())
+        job = CatalogJob.objects.get()
+        self.assertEqual((job.status, job.result), ('f', None))
+        self.assertIn('not JSON serializable', job.last_error)
+
+    def test_enqueue_once(self):
+        job = jobs.enqueue_once('test_ok')
+        self.assertEqual(jobs.enqueue_once('test_ok'), job)
+        # Plain enqueue() still queues as many jobs as asked
+        jobs.enqueue('test_ok')
+
+        # As if a concurrent request had queued the job after the check for a pending one
+        pending = mock.Mock(first=mock.Mock(side_effect=[None, job]))
+        with mock.patch.object(CatalogJob.objects, 'filter', return_value=pending):
+            self.assertEqual(jobs.enqueue_once('test_ok'), job)
+        self.assertEqual(CatalogJob.objects.filter(name='test_ok', once=True).count(), 1)
+
+        jobs.run_job(jobs.claim_next_job())
+        self.assertNotEqual(jobs.enqueue_once('test_ok'), job)
+
+    def test_home_page_counts_are_only_read(self):
+        CatalogCounts.objects.create(pk=1, counts={'num_books': 42},
+                                     computed_at=timezone.now() - datetime.timedelta(days=1))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(index_counts(), {'num_books': 42})
+            self.assertEqual(index_counts(), {'num_books': 42})
+        writes = [query['sql'] for query in queries.captured_queries
+                  if not query['sql'].startswith(('SELECT', 'SAVEPOINT', 'RELEASE'))]
+        # Only the one job that recomputes them
+        self.assertEqual(len(writes), 1)
+        self.assertTrue(writes[0].startswith('INSERT INTO "catalog_catalogjob"'))
+
+
+class PopularityTest(TestCase):
+    """The decayed popularity scores (catalog/popularity.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(first_name='Ursula', last_name='Le Guin')
+        cls.classic = Book.objects.create(title='Classic', summary='Summary', isbn='9780306406157', author=cls.author)
+        cls.new_release = Book.objects.create(title='New release', summary='Summary', isbn='9780306406164')
+
+    def test_recent_checkouts_rank_higher_in_the_decayed_windows(self):
+        now = timezone.now()
+        for _ in range(10):
+            popularity.record_checkout(self.classic.pk, now - datetime.timedelta(days=3))
+        for _ in range(2):
+            popularity.record_checkout(self.new_release.pk, now)
+
+        # 10 checkouts three half-lives ago are worth 1.25 checkouts today, and 10 all time
+        today = popularity.top('b', 'd')
+        self.assertEqual([book for book, _ in today], [self.new_release, self.classic])
+        self.assertAlmostEqual(today[0][1], 2, places=3)
+        self.assertAlmostEqual(today[1][1], 1.25, places=3)
+        all_time = popularity.top('b', 't')
+        self.assertEqual([(book, round(score, 6)) for book, score in all_time], [(self.classic, 10), (self.new_release, 2)])
+        self.assertEqual(popularity.top('b', 't', limit=1), all_time[:1])
+        self.assertEqual([(author, round(score, 6)) for author, score in popularity.top('a', 't')], [(self.author, 10)])
+
+    def test_concurrent_first_checkouts_dont_fail(self):
+        now = timezone.now()
+        popularity.record_checkout(self.new_release.pk, now)
+
+        # As if the scores had been created by a concurrent checkout after they were looked up
+        lookups = [mock.Mock(filter=mock.Mock(return_value=[])), PopularityScore.objects.select_for_update()]
+        with mock.patch.object(PopularityScore.objects, 'select_for_update', side_effect=lookups):
+            popularity.record_checkout(self.new_release.pk, now)
+
+        self.assertEqual(PopularityScore.objects.filter(object_id=self.new_release.pk, kind='b').count(), 3)
+        self.assertEqual([(book, round(score, 6)) for book, score in popularity.top('b', 't')], [(self.new_release, 2)])
+
+
+class ArchiveTest(TestCase):
+    """Moving retired copies and old loans to the archive tables and back (catalog/archive.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.book = Book.objects.create(title='Archived book', summary='Summary', isbn='9780306406157')
+        cls.borrower = User.objects.create_user('borrower')
+        long_ago = timezone.now() - datetime.timedelta(days=archive.LOANS_KEPT_DAYS + 30)
+        cls.retired = [BookInstance.objects.create(book=cls.book, imprint=f'Retired {n}', status='m') for n in range(3)]
+        cls.in_use = BookInstance.objects.create(book=cls.book, imprint='In use', status='a')
+        cls.loans = [
+            Loan.objects.create(book_instance=copy, book=cls.book, borrower=cls.borrower,
+                                borrowed_at=long_ago, returned_at=long_ago + datetime.timedelta(days=14))
+            for copy in [cls.retired[0], cls.retired[0], cls.in_use]
+        ]
+        # Unchanged for longer than RETIRED_AFTER_DAYS
+        BookInstance.objects.update(updated_at=timezone.now() - datetime.timedelta(days=archive.RETIRED_AFTER_DAYS + 1))
+
+    def test_archive_and_restore_copies_keeps_ids_and_loans(self):
+        copy_ids = {copy.pk for copy in self.retired}
+        copy_loan_ids = {loan.pk for loan in self.loans[:2]}
+
+        self.assertEqual(archive.archive_copies(chunk_size=2), {'copies': 3, 'loans': 2})
+        self.assertEqual(set(ArchivedBookInstance.objects.values_list('pk', flat=True)), copy_ids)
+        self.assertEqual(set(ArchivedLoan.objects.values_list('pk', flat=True)), copy_loan_ids)
+        self.assertEqual(list(BookInstance.objects.values_list('pk', flat=True)), [self.in_use.pk])
+        self.assertEqual(list(Loan.objects.values_list('pk', flat=True)), [self.loans[2].pk])
+
+        self.assertEqual(archive.restore_copies(copy_ids, chunk_size=2), {'copies': 3, 'loans': 2})
+        self.assertFalse(ArchivedBookInstance.objects.exists())
+        self.assertFalse(ArchivedLoan.objects.exists())
+        restored = BookInstance.objects.get(pk=self.retired[0].pk)
+        self.assertEqual((restored.imprint, restored.status, restored.book_id), ('Retired 0', 'm', self.book.pk))
+        loans = Loan.objects.filter(pk__in=copy_loan_ids)
+        self.assertEqual({(loan.book_instance_id, loan.borrowed_at, loan.returned_at) for loan in loans},
+                         {(loan.book_instance_id, loan.borrowed_at, loan.returned_at) for loan in self.loans[:2]})
+        # Restored copies count as changed now, so the next run doesn't archive them again
+        self.assertEqual(archive.archive_copies(), {'copies': 0, 'loans': 0})
+
+    def test_archive_and_restore_loans(self):
+        self.assertEqual(archive.archive_loans(chunk_size=2), {'loans': 3})
+        self.assertFalse(Loan.objects.exists())
+
+        # The loans of archived copies stay in the archive
+        archive.archive_copies()
+        returned_after = timezone.now() - datetime.timedelta(days=archive.LOANS_KEPT_DAYS + 60)
+        self.assertEqual(archive.restore_loans(returned_after), {'loans': 1})
+        self.assertEqual(list(Loan.objects.values_list('pk', flat=True)), [self.loans[2].pk])
+        self.assertEqual(ArchivedLoan.objects.count(), 2)
+
+    def test_copy_lent_after_the_ids_were_read_is_skipped(self):
+        read_chunks = archive._chunks
+        lent = self.retired[1]
+
+        def chunks_then_lend(queryset, chunk_size):
+            for chunk in read_chunks(queryset, chunk_size):
+                # Lent by a librarian between reading the ids and moving them
+                BookInstance.objects.filter(pk=lent.pk).update(status='o', borrower=self.borrower)
+                yield chunk
+
+        with mock.patch.object(archive, '_chunks', chunks_then_lend):
+            self.assertEqual(archive.archive_copies(), {'copies': 2, 'loans': 2})
+        self.assertEqual(BookInstance.objects.get(pk=lent.pk).status, 'o')
+        self.assertFalse(ArchivedBookInstance.objects.filter(pk=lent.pk).exists())
+
+    def test_dry_run_counts_match(self):
+        copies_dry_run = archive.archive_copies(dry_run=True)
+        self.assertFalse(ArchivedBookInstance.objects.exists())
+        self.assertEqual(archive.archive_copies(), copies_dry_run)
+
+        loans_dry_run = archive.archive_loans(dry_run=True)
+        self.assertFalse(ArchivedLoan.objects.filter(pk=self.loans[2].pk).exists())
+        self.assertEqual(archive.archive_loans(), loans_dry_run)
+        self.assertEqual(loans_dry_run, {'loans': 1})
+
+
+class BackupTest(SimpleTestCase):
+    """Online backups and restores (catalog/backup.py) of a temporary SQLite database."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.database = self.path('live.sqlite3')
+        with sqlite3.connect(self.database) as db:
+            db.execute('CREATE TABLE book (id INTEGER PRIMARY KEY, title TEXT)')
+            db.executemany('INSERT INTO book (title) VALUES (?)', [(f'Book {n}' * 20,) for n in range(2000)])
+        db.close()
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def titles(self, path):
+        db = sqlite3.connect(path)
+        try:
+            return db.execute('SELECT COUNT(*), MAX(title) FROM book').fetchone()
+        finally:
+            db.close()
+
+    def test_gzip_round_trip(self):
+        before = self.titles(self.database)
+        target = self.path('backup.sqlite3.gz')
+        stats = backup.backup(self.database, target, pages=16)
+        self.assertGreater(stats['pages'], 16)
+        with gzip.open(target) as gz:
+            self.assertEqual(gz.read(16), b'SQLite format 3\x00')
+        # No temporary files left next to the backup
+        self.assertEqual(sorted(os.listdir(self.directory)), ['backup.sqlite3.gz', 'live.sqlite3'])
+
+        with sqlite3.connect(self.database) as db:
+            db.execute('DELETE FROM book')
+        db.close()
+        backup.restore(target, self.database)
+        self.assertEqual(self.titles(self.database), before)
+
+    def test_busy_database_is_copied_in_one_step_after_too_many_restarts(self):
+        writer = sqlite3.connect(self.database)
+        self.addCleanup(writer.close)
+
+        def write(done, total):
+            # Another connection writes between the steps, so SQLite starts the copy again
+            writer.execute("INSERT INTO book (title) VALUES ('Written during the backup')")
+            writer.commit()
+
+        stats = backup.backup(self.database, self.path('backup.sqlite3'), pages=1, sleep=0, progress=write)
+        self.assertEqual(stats['restarts'], backup.MAX_RESTARTS + 1)
+        # A consistent snapshot of some point during the backup
+        count, _ = self.titles(self.path('backup.sqlite3'))
+        self.assertGreaterEqual(count, 2000)
+        self.assertLessEqual(count, self.titles(self.database)[0])
+
+    def test_truncated_backup_is_rejected(self):
+        target = self.path('backup.sqlite3')
+        backup.backup(self.database, target)
+        with open(target, 'r+b') as file:
+            file.truncate(os.path.getsize(target) // 2)
+
+        with self.assertRaises(backup.BackupError):
+            backup._check_integrity(target)
+        # ... and the live database isn't touched
+        before = self.titles(self.database)
+        with self.assertRaises(backup.BackupError):
+            backup.restore(target, self.database)
+        self.assertEqual(self.titles(self.database), before)
+
+
+class ConditionalPageTest(TestCase):
+    """ETag revalidation of the catalog pages (catalog/conditional.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.book = Book.objects.create(title='Cached book', summary='Summary', isbn='9780306406157')
+        cls.copy = BookInstance.objects.create(book=cls.book, imprint='Imprint', status='a')
+        cls.user = User.objects.create_user('patron')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.url = reverse('book-detail', args=[self.book.pk])
+        self.etag = self.client.get(self.url)['ETag']
+
+    def revalidate(self):
+        return self.client.get(self.url, HTTP_IF_NONE_MATCH=self.etag).status_code
+
+    def test_unchanged_page_is_not_modified(self):
+        self.assertEqual(self.revalidate(), 304)
+
+    def test_copy_status_change_changes_the_page(self):
+        copy = BookInstance.objects.get(pk=self.copy.pk)
+        copy.status = 'm'
+        with self.captureOnCommitCallbacks(execute=True):
+            copy.save()
+        self.assertEqual(self.revalidate(), 200)
+
+    def test_permission_grant_changes_the_page(self):
+        self.user.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+        self.assertEqual(self.revalidate(), 200)
+
+
+class StaticFilesTest(SimpleTestCase):
+    """Content negotiation of the pre-compressed static files (catalog/static_middleware.py)."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        for suffix, content in [('', b'body { color: black; }'), ('.gz', b'gzip'), ('.br', b'brotli')]:
+            with open(os.path.join(directory.name, 'styles.css' + suffix), 'wb') as file:
+                file.write(content)
+        with override_settings(CATALOG_SERVE_STATIC=True, STATIC_ROOT=directory.name, STATIC_URL='/static/'):
+            self.middleware = StaticFilesMiddleware(lambda request: HttpResponse(status=404))
+
+    def get(self, accept_encoding=None, if_none_match=None):
+        headers = {}
+        if accept_encoding is not None:
+            headers['HTTP_ACCEPT_ENCODING'] = accept_encoding
+        if if_none_match is not None:
+            headers['HTTP_IF_NONE_MATCH'] = if_none_match
+        response = self.middleware(RequestFactory().get('/static/styles.css', **headers))
+        self.addCleanup(response.close)
+        return response
+
+    def test_encoding_follows_the_q_values(self):
+        for accept_encoding, expected in [
+            ('gzip, deflate, br', 'br'),
+            ('gzip, br;q=0', 'gzip'),
+            ('br;q=0.5, gzip', 'gzip'),
+            ('br;q=0, gzip;q=0', None),
+            ('*', 'br'),
+            ('*;q=0, gzip', 'gzip'),
+            ('identity', None),
+            ('', None),
+        ]:
+            with self.subTest(accept_encoding=accept_encoding):
+                response = self.get(accept_encoding)
+                self.assertEqual(response.get('Content-Encoding'), expected)
+                self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    def test_each_encoding_has_its_own_etag(self):
+        etags = {encoding: self.get(encoding)['ETag'] for encoding in ['br', 'gzip', 'identity']}
+        self.assertEqual(len(set(etags.values())), 3)
+        self.assertTrue(etags['br'].endswith('-br"'))
+
+        self.assertEqual(self.get('br', if_none_match=etags['br']).status_code, 304)
+        # The browser's cached brotli copy isn't valid for a request that only accepts gzip
+        self.assertEqual(self.get('gzip', if_none_match=etags['br']).status_code, 200)
+        self.assertEqual(self.get('gzip', if_none_match=f"{etags['br']}, {etags['gzip']}").status_code, 304)
+
+
+class UrlBuilderTest(SimpleTestCase):
+    """build_url() (catalog/url_builder.py) builds the same URLs as reverse()."""
+
+    PKS = [42, uuid.UUID('3f2a9c1b-0000-7000-8000-000000000001')]
+
+    def test_matches_reverse_for_every_pk_url(self):
+        pk_url_names = [pattern.name for pattern in catalog_urlpatterns
+                        if pattern.name and list(pattern.pattern.regex.groupindex) == ['pk']]
+        self.assertIn('book-detail', pk_url_names)
+        self.assertIn('renew-book-librarian', pk_url_names)
+        for url_name in pk_url_names:
+            with self.subTest(url_name=url_name):
+                urls = []
+                for pk in self.PKS:
+                    try:
+                        urls.append((build_url(url_name, pk), reverse(url_name, args=[pk])))
+                    except NoReverseMatch:
+                        continue
+                self.assertEqual(len(urls), 1)
+                self.assertEqual(urls[0][0], urls[0][1])
+
+    def test_no_url_for_an_unsaved_object(self):
+        for pk in [None, '']:
+            with self.subTest(pk=pk), self.assertRaises(NoReverseMatch):
+                build_url('book-detail', pk)
+        with self.assertRaises(NoReverseMatch):
+            Book(title='Unsaved').get_absolute_url()
+
+    def test_string_pks_are_quoted(self):
+        self.assertEqual(build_url('book-detail', '42'), reverse('book-detail', args=['42']))
+        self.assertTrue(build_url('book-detail', 'a b/c?').startswith('/catalog/book/a%20b/c%3F'))
+
+
+class UniqueISBNTest(TestCase):
+    """The same book can't be in the catalog twice under different ISBN formats (Book.isbn13)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(first_name='Ursula', last_name='Le Guin')
+        cls.genre = Genre.objects.create(name='Fantasy')
+        cls.language = Language.objects.create(name='English')
+        cls.book = Book.objects.create(title='Catalogued', summary='Summary', isbn='9780306406157')
+        cls.librarian = User.objects.create_user('librarian', is_superuser=True)
+
+    def test_isbn10_of_a_catalogued_isbn13_is_rejected(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Book.objects.create(title='Same book', summary='Summary', isbn='0306406152')
+        # Books without a valid ISBN (old records) don't count
+        Book.objects.create(title='Old record 1', summary='Summary', isbn='123')
+        Book.objects.create(title='Old record 2', summary='Summary', isbn='456')
+
+    def test_concurrent_save_is_a_form_error(self):
+        self.client.force_login(self.librarian)
+        # As if the same book had been saved between the form's duplicate check and the save
+        with mock.patch.object(BookModelForm, 'clean_isbn', lambda form: form.cleaned_data['isbn'].replace('-', '')):
+            response = self.client.post(reverse('book-create'), {
+                'title': 'Same book', 'summary': 'Summary', 'isbn': '0-306-40615-2',
+                'author': self.author.pk, 'genre': [self.genre.pk], 'language': self.language.pk,
+            })
+        self.assertEqual(response.status_code, 200)
+        self.assertFormError(response.context['form'], 'isbn', 'This ISBN is already in the catalog.')
+        self.assertEqual(Book.objects.count(), 1)
+
+    def test_import_skips_isbns_saved_concurrently(self):
+        rows = [
+            {'title': 'Same book', 'isbn': '0306406152', 'summary': 'Summary'},
+            {'title': 'New book', 'isbn': '9781861972712', 'summary': 'Summary'},
+        ]
+        # The first duplicate check misses the catalogued book, as if it had been saved just after
+        with mock.patch('catalog.book_import.find_existing_isbns', side_effect=[{}, {'9780306406157': self.book.pk}]):
+            stats = import_books(rows)
+        self.assertEqual(stats, {'created': 1, 'duplicates': 1, 'invalid': 0})
+        self.assertEqual(sorted(Book.objects.values_list('title', flat=True)), ['Catalogued', 'New book'])
+
+
+class PermissionBackendTest(TestCase):
+    """The permission checks and logins with the backends of the settings (catalog/permissions.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.librarians = Group.objects.create(name='Librarians')
+        cls.librarians.permissions.add(Permission.objects.get(codename='can_mark_returned'))
+        cls.librarian = User.objects.create_user('librarian', password='correct horse battery')
+        cls.librarian.groups.add(cls.librarians)
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def can_mark_returned(self):
+        # A fresh user object for every check, like a new request
+        return User.objects.get(pk=self.librarian.pk).has_perm('catalog.can_mark_returned')
+
+    def test_logins_are_recorded_as_model_backend_logins(self):
+        self.assertTrue(self.client.login(username='librarian', password='correct horse battery'))
+        self.assertEqual(self.client.session[BACKEND_SESSION_KEY], 'django.contrib.auth.backends.ModelBackend')
+        self.assertFalse(self.client.login(username='librarian', password='wrong'))
+
+    def test_existing_sessions_stay_valid(self):
+        for backend in ['django.contrib.auth.backends.ModelBackend', 'catalog.permissions.CachedPermissionBackend']:
+            with self.subTest(backend=backend):
+                self.client.force_login(self.librarian, backend=backend)
+                response = self.client.get(reverse('my-borrowed'))
+                self.assertEqual(response.wsgi_request.user, self.librarian)
+
+    def test_process_local_cache_is_not_used_across_requests(self):
+        self.assertTrue(self.can_mark_returned())
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(self.can_mark_returned())
+        self.assertTrue(any('auth_permission' in query['sql'] for query in queries.captured_queries))
+
+    def test_revocation_with_shared_cache(self):
+        with mock.patch('catalog.permissions.cache_is_shared', return_value=True):
+            self.assertTrue(self.can_mark_returned())
+            with CaptureQueriesContext(connection) as queries:
+                self.assertTrue(self.can_mark_returned())
+            self.assertFalse(any('auth_permission' in query['sql'] for query in queries.captured_queries))
+
+            self.librarian.groups.remove(self.librarians)
+            self.assertFalse(self.can_mark_returned())
+
+
+class ThrottlingTest(TestCase):
+    """The token buckets of the rate limits (catalog/throttling.py)."""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def take(self, now, rate='10/m'):
+        return take_token('test', 'ip:10.0.0.1', rate, now=now)
+
+    def test_burst_then_one_request_per_interval(self):
+        start = 1_000_000.0
+        self.assertEqual([self.take(start) for _ in range(10)], [None] * 10)
+        self.assertEqual(self.take(start), 6)
+        # Rejected requests don't count: one request every 6 seconds
+        self.assertIsNone(self.take(start + 6))
+        self.assertEqual(self.take(start + 6), 6)
+        self.assertEqual(self.take(start + 11), 1)
+        self.assertIsNone(self.take(start + 12))
+
+    def test_no_double_rate_at_the_end_of_a_minute(self):
+        # A fixed window of a minute would let 10 requests through at 59.5 s and 10 more at 60.5 s
+        start = 1_000_020.0  # A whole minute
+        allowed = sum(self.take(start + second) is None for second in [59.5] * 10 + [60.5] * 10)
+        self.assertEqual(allowed, 10)
+
+    def test_full_bucket_after_a_period(self):
+        start = 1_000_000.0
+        for _ in range(11):
+            self.take(start)
+        self.assertEqual([self.take(start + 60) for _ in range(10)], [None] * 10)
+
+    def test_middleware(self):
+        url = reverse('authors')  # 20/m
+        with override_settings(DEBUG=True), self.assertLogs('django.request', 'WARNING'):
+            statuses = [self.client.get(url, REMOTE_ADDR='10.0.0.2').status_code for _ in range(21)]
+            self.assertEqual(statuses, [200] * 20 + [429])
+            response = self.client.get(url, REMOTE_ADDR='10.0.0.2')
+            self.assertEqual(response['Retry-After'], '3')
+
+    def test_switched_off_with_a_process_local_cache(self):
+        # Not DEBUG, so not the single process development server
+        url = reverse('authors')
+        statuses = [self.client.get(url, REMOTE_ADDR='10.0.0.3').status_code for _ in range(21)]
+        self.assertEqual(statuses, [200] * 21)
+
+
+class LiveStreamTest(SimpleTestCase):
+    """Idle live copy streams (catalog/live.py) through the ASGI application, with clients that go away."""
+
+    STREAMS = 200
+
+    def scope(self, book_id):
+        return {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': '/catalog/live/copies/', 'raw_path': b'/catalog/live/copies/',
+            'query_string': f'book={book_id}'.encode(), 'root_path': '', 'headers': [(b'host', b'testserver')],
+            'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+        }
+
+    def test_idle_streams_end_when_the_clients_disconnect(self):
+        from locallibrary.asgi import application
+        threads_start = threading.active_count()
+        results = asyncio.run(self.open_idle_streams(application))
+
+        self.assertEqual(results['subscribers'], self.STREAMS)
+        # Idle streams only wait: well under 5% of a core for all of them
+        self.assertLess(results['cpu_seconds'], 0.05 * results['idle_seconds'])
+        self.assertEqual(live.hub.subscriber_count(), 0)
+        self.assertEqual(threading.active_count(), threads_start)
+
+    async def open_idle_streams(self, application):
+        disconnect = asyncio.Event()
+
+        def make_receive():
+            # No request body, then the client stays until it disconnects
+            state = {'sent_body': False}
+
+            async def receive():
+                if not state['sent_body']:
+                    state['sent_body'] = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                await disconnect.wait()
+                return {'type': 'http.disconnect'}
+            return receive
+
+        async def send(message):
+            # Like an ASGI server, drops what is sent after the disconnect without an error
+            pass
+
+        tasks = [asyncio.create_task(application(self.scope(1 + n % 10), make_receive(), send))
+                 for n in range(self.STREAMS)]
+        await asyncio.wait_for(self.subscribers(self.STREAMS), 30)
+        subscribers = live.hub.subscriber_count()
+
+        idle_seconds = 1
+        cpu_start = time.process_time()
+        await asyncio.sleep(idle_seconds)
+        cpu_seconds = time.process_time() - cpu_start
+
+        disconnect.set()
+        # Every stream ends on its own: the tasks aren't cancelled
+        await asyncio.wait_for(asyncio.gather(*tasks), 30)
+        return {'subscribers': subscribers, 'idle_seconds': idle_seconds, 'cpu_seconds': cpu_seconds}
+
+    async def subscribers(self, count):
+        while live.hub.subscriber_count() < count:
+            await asyncio.sleep(0.01)
+
+
+class MinimalWriteTest(TestCase):
+    """The update paths write only the changed columns, and nothing at all for a no-op submit (TimestampedModel.save_changes)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(first_name='Ursula', last_name='Le Guin')
+        cls.genre = Genre.objects.create(name='Fantasy')
+        cls.language = Language.objects.create(name='English')
+        cls.book = Book.objects.create(title='A Wizard of Earthsea', author=cls.author, summary='Summary',
+                                       isbn='9780306406157', language=cls.language)
+        cls.book.genre.add(cls.genre)
+        cls.borrower = User.objects.create_user('borrower')
+        cls.due_back = datetime.date.today() + datetime.timedelta(weeks=1)
+        cls.copy = BookInstance.objects.create(book=cls.book, imprint='Imprint', status='o', borrower=cls.borrower,
+                                               due_back=cls.due_back)
+        cls.librarian = User.objects.create_user('librarian', is_staff=True, is_superuser=True)
+
+    def setUp(self):
+        self.client.force_login(self.librarian)
+
+    def updates(self, queries, table):
+        """The UPDATE statements of the captured queries on the table, as sorted lists of the columns they set."""
+        updates = []
+        for query in queries.captured_queries:
+            match = re.match(rf'UPDATE "{table}" SET (.*) WHERE', query['sql'])
+            if match:
+                updates.append(sorted(re.findall(r'"(\w+)" = ', match.group(1))))
+        return updates
+
+    def author_data(self, **changes):
+        data = {
+            'updated_first_name': 'Ursula', 'updated_last_name': 'Le Guin',
+            'updated_date_of_birth_year': '', 'updated_date_of_birth_month': '', 'updated_date_of_birth_day': '',
+            'updated_date_of_death_year': '', 'updated_date_of_death_month': '', 'updated_date_of_death_day': '',
+        }
+        data.update(changes)
+        return data
+
+    def book_data(self, **changes):
+        data = {
+            'title': 'A Wizard of Earthsea', 'author': self.author.pk, 'summary': 'Summary',
+            'isbn': '9780306406157', 'genre': [self.genre.pk], 'language': self.language.pk,
+        }
+        data.update(changes)
+        return data
+
+    def renew_data(self, **changes):
+        data = {'new_due_date': self.due_back.isoformat(), 'new_borrower': self.borrower.pk}
+        data.update(changes)
+        return data
+
+    def test_no_op_submits_write_nothing(self):
+        # author_update shows its form again with a warning, the others redirect: the forms were valid
+        submits = [
+            (reverse('author-update', args=[self.author.pk]), self.author_data(), 200),
+            (reverse('book-update', args=[self.book.pk]), self.book_data(), 302),
+            (reverse('renew-book-librarian', args=[self.copy.pk]), self.renew_data(), 302),
+        ]
+        for url, data, status_code in submits:
+            with self.subTest(url=url), CaptureQueriesContext(connection) as queries:
+                response = self.client.post(url, data)
+            self.assertEqual(response.status_code, status_code)
+            self.assertIn('No changes were made.', [str(message) for message in get_messages(response.wsgi_request)])
+            writes = [query['sql'] for query in queries.captured_queries
+                      if query['sql'].startswith(('UPDATE "catalog_', 'INSERT INTO "catalog_', 'DELETE FROM "catalog_'))]
+            self.assertEqual(writes, [])
+
+    def test_one_field_change_updates_that_column_only(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('author-update', args=[self.author.pk]), self.author_data(updated_first_name='Ursula K.'))
+        self.assertEqual(self.updates(queries, 'catalog_author'), [['first_name', 'updated_at']])
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('book-update', args=[self.book.pk]), self.book_data(title='Tehanu'))
+        self.assertEqual(self.updates(queries, 'catalog_book'), [['title', 'updated_at']])
+
+        new_due_back = (self.due_back + datetime.timedelta(days=3)).isoformat()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('renew-book-librarian', args=[self.copy.pk]), self.renew_data(new_due_date=new_due_back))
+        self.assertEqual(self.updates(queries, 'catalog_bookinstance'), [['due_back', 'updated_at']])
+
+    def test_no_op_save_creates_no_version(self):
+        url = reverse('admin:catalog_author_change', args=[self.author.pk])
+        data = {'first_name': 'Ursula', 'last_name': 'Le Guin', 'date_of_birth': '', 'date_of_death': '', '_save': 'Save'}
+
+        self.assertEqual(self.client.post(url, data).status_code, 302)
+        self.assertEqual(Version.objects.get_for_object(self.author).count(), 0)
+
+        self.client.post(url, {**data, 'first_name': 'Ursula K.'})
+        self.assertEqual(Version.objects.get_for_object(self.author).count(), 1)
+
+    def test_author_update_fetches_the_author_once(self):
+        url = reverse('author-update', args=[self.author.pk])
+        for data in [None, self.author_data(updated_first_name='Ursula K.')]:
+            with self.subTest(method='POST' if data else 'GET'), CaptureQueriesContext(connection) as queries:
+                self.client.post(url, data) if data else self.client.get(url)
+            author_selects = [query['sql'] for query in queries.captured_queries
+                              if query['sql'].startswith('SELECT') and 'FROM "catalog_author"' in query['sql']]
+            self.assertEqual(len(author_selects), 1)
+
+
+class ListColumnsTest(TestCase):
+    """The list pages only load the columns they print."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = Author.objects.create(first_name='Ursula', last_name='Le Guin')
+        Book.objects.create(title='A Wizard of Earthsea', author=author, summary='Summary', isbn='9780306406157')
+
+    def test_author_list_loads_no_book_summaries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('authors'))
+        self.assertContains(response, 'Le Guin')
+        self.assertFalse([query['sql'] for query in queries.captured_queries if '"summary"' in query['sql']])
+
+
+@override_settings(CATALOG_READ_REPLICAS=['replica'])
+class ReplicaRoutingTest(TransactionTestCase):
+    """Read replica routing (catalog/routers.py) with two separate SQLite databases.
+
+    The replica only gets the primary's changes when sync_replica() copies them over, like a replica
+    that is lagging behind until then.
+    """
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.author = Author.objects.create(first_name='Ursula', last_name='Le Guin')
+        self.librarian = User.objects.create_user('librarian')
+        self.librarian.user_permissions.add(Permission.objects.get(codename='can_mark_returned'))
+        self.sync_replica()
+
+    def sync_replica(self):
+        """Copies the primary database into the replica (SQLite's online backup)."""
+        primary, replica = connections['default'], connections['replica']
+        primary.ensure_connection()
+        replica.ensure_connection()
+        primary.connection.backup(replica.connection)
+
+    def rename_author(self, client, first_name):
+        return client.post(reverse('author-update', args=[self.author.pk]), {
+            'updated_first_name': first_name,
+            'updated_last_name': 'Le Guin',
+        })
+
+    def test_reads_outside_requests_use_the_primary(self):
+        Author.objects.filter(pk=self.author.pk).update(first_name='Ursula K.')
+
+        # Code outside a request (commands, the job worker, this test) never reads stale data
+        self.assertEqual(Author.objects.get(pk=self.author.pk).first_name, 'Ursula K.')
+        self.assertEqual(CatalogReplicaRouter().db_for_read(Author), 'default')
+
+    def test_read_your_writes(self):
+        librarian = self.client
+        librarian.force_login(self.librarian)
+        detail_url = reverse('author-detail', args=[self.author.pk])
+
+        self.assertEqual(self.rename_author(librarian, 'Ursula K.').status_code, 302)
+
+        # The librarian who wrote reads from the primary, other visitors from the (stale) replica
+        self.assertContains(librarian.get(detail_url), 'Ursula K.')
+        other_visitor = self.client_class()
+        self.assertNotContains(other_visitor.get(detail_url), 'Ursula K.')
+
+        self.sync_replica()
+        self.assertContains(other_visitor.get(detail_url), 'Ursula K.')
+
+    def test_request_reads_from_the_primary_after_writing(self):
+        with use_read_replicas():
+            self.assertEqual(CatalogReplicaRouter().db_for_read(Author), 'replica')
+            Author.objects.filter(pk=self.author.pk).update(first_name='Ursula K.')
+            self.assertEqual(Author.objects.get(pk=self.author.pk).first_name, 'Ursula K.')
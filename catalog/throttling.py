@@ -0,0 +1,139 @@
+import functools
+import logging
+import math
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from catalog.shared_cache import cache_is_shared
+
+logger = logging.getLogger(__name__)
+
+# Rate limiting of the expensive catalog pages, so that a crawler can't use up all the workers.
+#
+# Each client gets a bucket of N requests per period for each throttled page: a bucket per user for
+# logged in users and a bucket per IP address for anonymous ones (staff users are never throttled).
+# The bucket is a token bucket that refills continuously, one request every period/N, implemented as
+# the generic cell rate algorithm (GCRA): the cache keeps a single number per bucket, the time at which
+# the bucket will be full again (the "theoretical arrival time"). Each request moves it on by period/N
+# with cache.incr(), which is atomic, so no locks and no database writes are needed; a request that
+# would move it more than a period ahead is over the limit and gets a 429 response with a Retry-After
+# header. Unlike counting requests per fixed window, this never lets more than N requests through in
+# any period, not even 2N around the end of a window.
+#
+# The limits are set per URL name in THROTTLE_RATES in catalog/urls.py (ThrottleMiddleware), or on a
+# single view with the @throttle('10/m') decorator. The buckets must be in a cache shared by all the
+# workers (e.g. the Redis cache of locallibrary/settings_production.py): with a cache local to each
+# process, every worker would let N requests through. So without DEBUG (i.e. anywhere but the single
+# process development server), throttling is switched off with a warning unless the cache is shared.
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+
+@functools.lru_cache(maxsize=None)
+def parse_rate(rate: str) -> tuple:
+    """Returns (number of requests, period in seconds) for a rate such as '30/m'."""
+    count, _, period = rate.partition('/')
+    return int(count), PERIODS[period[:1]]
+
+
+def client_key(request) -> str:
+    """The bucket owner: the user if logged in, otherwise the IP address."""
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    # REMOTE_ADDR is the address of the reverse proxy, if any: have the proxy set it from X-Forwarded-For
+    return f"ip:{request.META.get('REMOTE_ADDR', '')}"
+
+
+def throttling_enabled() -> bool:
+    if not getattr(settings, 'CATALOG_THROTTLING', True):
+        return False
+    return settings.DEBUG or cache_is_shared()
+
+
+def expires_in(arrival: int, now: int) -> int:
+    """Cache timeout (whole seconds) of a bucket that is full again at arrival."""
+    return max(1, math.ceil((arrival - now) / 1000))
+
+
+def take_token(scope: str, key: str, rate: str, now=None):
+    """Takes a request from the client's bucket for the scope. Returns None, or the seconds until the next request is allowed."""
+    limit, period = parse_rate(rate)
+    # Integer milliseconds, for cache.incr()
+    now = int((time.time() if now is None else now) * 1000)
+    period = period * 1000
+    interval = math.ceil(period / limit)
+    bucket = f'catalog:throttle:{scope}:{key}'
+
+    # The bucket expires when it is full again, so an existing one always holds a time in the future
+    # (to within the second of the cache timeouts, which only makes the limit a little stricter)
+    if cache.add(bucket, now + interval, expires_in(now + interval, now)):
+        return None
+    try:
+        arrival = cache.incr(bucket, interval)
+    except ValueError:  # Expired or evicted between add() and incr()
+        cache.set(bucket, now + interval, expires_in(now + interval, now))
+        return None
+    if arrival - now > period:
+        # Over the limit: give the request back, it wasn't let through
+        cache.decr(bucket, interval)
+        return max(1, math.ceil((arrival - period - now) / 1000))
+    cache.touch(bucket, expires_in(arrival, now))
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def warn_switched_off() -> None:
+    """Logs (once per process) that throttling is off because the cache isn't shared."""
+    logger.warning('Throttling is switched off: the default cache is local to each process '
+                   '(see catalog/shared_cache.py).')
+
+
+def throttled_response(retry_after: int) -> HttpResponse:
+    response = HttpResponse('Too many requests, please try again later.', status=429, content_type='text/plain')
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def check_throttle(request, scope: str, rate: str):
+    """Returns a 429 response if the request is over the rate, None if it may go ahead."""
+    if not throttling_enabled() or request.user.is_staff:
+        return None
+    retry_after = take_token(scope, client_key(request), rate)
+    return throttled_response(retry_after) if retry_after else None
+
+
+def throttle(rate: str, scope: str = None):
+    """View decorator limiting each client to rate requests (e.g. '10/m') to the view."""
+    def decorator(view_func):
+        view_scope = scope or f'{view_func.__module__}.{view_func.__qualname__}'
+
+        @functools.wraps(view_func)
+        def wrapped_view(request, *args, **kwargs):
+            return check_throttle(request, view_scope, rate) or view_func(request, *args, **kwargs)
+        return wrapped_view
+    return decorator
+
+
+class ThrottleMiddleware:
+    """Applies the THROTTLE_RATES of catalog/urls.py to the requests for those URL names."""
+
+    def __init__(self, get_response):
+        if not throttling_enabled():
+            if getattr(settings, 'CATALOG_THROTTLING', True):
+                warn_switched_off()
+            raise MiddlewareNotUsed
+        from .urls import THROTTLE_RATES  # Not at import time: the URLconf imports the views
+        self.rates = THROTTLE_RATES
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # view_name includes the namespace, if any ('admin:index' isn't the catalog's 'index')
+        view_name = request.resolver_match.view_name
+        if view_name not in self.rates:
+            return None
+        return check_throttle(request, view_name, self.rates[view_name])
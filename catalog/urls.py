@@ -1,6 +1,16 @@
 from django.urls import path, re_path
 from . import views
 
+# Requests per client (user or IP address) to the expensive pages, by URL name, e.g. '30/m' = 30 a
+# minute. Over the limit the client gets a 429 response (see catalog/throttling.py).
+THROTTLE_RATES = {
+    'books': '60/m',
+    'books-export': '5/m',
+    # Loads every author and their books
+    'authors': '20/m',
+    'popular': '60/m',
+}
+
 urlpatterns = [
     # Index/Home Page Url implementation
     path('', views.index, name='index'),
@@ -16,6 +26,7 @@ urlpatterns = [
     # This demonstrates that the 3rd argument is not necessary because books.html is implied via the "name=" argument
     # All Books
     path('books/', views.BookListView.as_view(), name='books'),
+    path('books/export.csv', views.export_books_csv, name='books-export'),
 
     # BookDetailView Page Url implementation
     # Without regex
@@ -23,6 +34,12 @@ urlpatterns = [
     # With Regex
     re_path(r'^book/(?P<pk>\d+)$', views.BookDetailView.as_view(), name='book-detail'),
 
+    # Most borrowed books, authors and genres
+    path('popular/', views.popular, name='popular'),
+
+    # Book lookup by ISBN (for barcode scanners), e.g. /catalog/isbn/978-0-306-40615-7
+    path('isbn/<str:isbn>', views.isbn_lookup, name='isbn-lookup'),
+
     path('book/create/', views.BookCreate.as_view(), name='book-create'),
     path('book/<int:pk>/update/', views.BookUpdate.as_view(), name='book-update'),
     path('book/<int:pk>/delete/', views.BookDelete.as_view(), name='book-delete'),
@@ -39,6 +56,10 @@ urlpatterns = [
     # Books On Loan for the logged in user
     path('mybooks/', views.LoanedBooksByUserListView.as_view(), name='my-borrowed'),
 
+    # Hold queue for a Book (all copies on loan)
+    path('book/<int:pk>/hold/', views.place_hold, name='book-hold'),
+    path('hold/<int:pk>/cancel/', views.cancel_hold, name='hold-cancel'),
+
     # All Books On Loan
     path(r'borrowed/', views.LoanedBooksAllListView.as_view(), name='all-borrowed'),
 
@@ -49,7 +70,6 @@ urlpatterns = [
     #### BEGIN Author Views ####
     # AuthorListView Page Url implementation
     path('authors/', views.AuthorListView.as_view(), name='authors'),
-    path('set_author_changes/', views.set_author_changes, name='set_author_changes'),
 
     # AuthorDetailView Page Url implementation
     # Without regex
@@ -62,4 +82,21 @@ urlpatterns = [
     path('author/<int:pk>/update/', views.author_update, name='author-update'),
     path('author/<int:pk>/delete/', views.AuthorDelete.as_view(), name='author-delete'),
     #### END Author Views ####
+
+    #### BEGIN Request Profile Views ####
+    # Staff only: profiles of requests made with ?_profile (see catalog/profiling.py)
+    path('profiles/', views.RequestProfileListView.as_view(), name='request-profiles'),
+    path('profile/<int:pk>', views.RequestProfileDetailView.as_view(), name='request-profile-detail'),
+    #### END Request Profile Views ####
+
+    #### BEGIN Live Update Views ####
+    # Server-sent events with the copy status changes (ASGI only, see catalog/live.py)
+    path('live/copies/', views.copy_events, name='copy-events'),
+    #### END Live Update Views ####
+
+    #### BEGIN Archive Views ####
+    # Staff only: copies and loans moved to the archive tables (see catalog/archive.py)
+    path('archive/', views.ArchivedBookInstanceListView.as_view(), name='archived-copies'),
+    path('archive/<uuid:pk>', views.ArchivedBookInstanceDetailView.as_view(), name='archived-copy-detail'),
+    #### END Archive Views ####
 ]
\ No newline at end of file
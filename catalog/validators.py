@@ -103,3 +103,52 @@ def Compare_FirstLastName(
     return True
 
 
+
+#### BEGIN ISBN validation/normalisation ####
+# ISBNs are printed with hyphens or spaces (978-0-306-40615-7) and come in two formats:
+#   ISBN-10: 9 digits + check digit (0-9 or X), weights 10..1, sum divisible by 11
+#   ISBN-13: 12 digits + check digit, weights alternating 1 and 3, sum divisible by 10
+# Every ISBN-10 has an ISBN-13 equivalent ('978' prefix + first 9 digits + new check digit), which is
+# what we index (Book.isbn13) so the same book is found whichever format was scanned or typed.
+
+def Compact_ISBN(value: str) -> str:
+    """Removes hyphens and spaces from an ISBN (and uppercases a trailing x)."""
+    return ''.join(value.split()).replace('-', '').upper()
+
+def ISBN10_Check_Digit(first_nine_digits: str) -> str:
+    total = sum((10 - i) * int(digit) for i, digit in enumerate(first_nine_digits))
+    check = (11 - total % 11) % 11
+    return 'X' if check == 10 else str(check)
+
+def ISBN13_Check_Digit(first_twelve_digits: str) -> str:
+    total = sum((3 if i % 2 else 1) * int(digit) for i, digit in enumerate(first_twelve_digits))
+    return str((10 - total % 10) % 10)
+
+def Is_Valid_ISBN(value: str) -> bool:
+    """True if value (hyphens/spaces allowed) is an ISBN-10 or ISBN-13 with a correct check digit."""
+    isbn = Compact_ISBN(value)
+    if len(isbn) == 10 and isbn[:9].isdigit() and (isbn[9].isdigit() or isbn[9] == 'X'):
+        return ISBN10_Check_Digit(isbn[:9]) == isbn[9]
+    if len(isbn) == 13 and isbn.isdigit():
+        return ISBN13_Check_Digit(isbn[:12]) == isbn[12]
+    return False
+
+def To_ISBN13(value: str):
+    """Returns the ISBN-13 for a valid ISBN-10 or ISBN-13, or None if value isn't a valid ISBN."""
+    if not Is_Valid_ISBN(value):
+        return None
+    isbn = Compact_ISBN(value)
+    if len(isbn) == 13:
+        return isbn
+    return '978' + isbn[:9] + ISBN13_Check_Digit('978' + isbn[:9])
+
+class ISBNValidator:
+    # Same pattern as MinDateValidator above, so it can be used in validators=[] of a form field
+    def __init__(self, errmsg=None):
+        self.errmsg = errmsg
+
+    def __call__(self, value: str) -> None:
+        if not Is_Valid_ISBN(value):
+            error_message = self.errmsg or "Invalid ISBN - enter a valid ISBN-10 or ISBN-13."
+            raise ValidationError(error_message, code="invalid_isbn")
+#### END ISBN validation/normalisation ####
@@ -1,74 +1,76 @@
 from django.shortcuts import render
-from .models import Book, Author, BookInstance, Genre
-from django.db.models import Q
+from .models import Book, Author, BookInstance, Genre, Hold, RequestProfile, BookRecommendation, PopularityScore
+from .models import ArchivedBookInstance, ArchivedLoan
 from django.views import generic
 from django.contrib.auth.mixins import LoginRequiredMixin # For class views
 from django.contrib.auth.mixins import PermissionRequiredMixin # For class views
 from django.contrib.auth.decorators import login_required, permission_required # For function views
+from django.contrib.admin.views.decorators import staff_member_required
 from django.utils.decorators import method_decorator # Needed to add the above decorators to class views
 from django.shortcuts import get_object_or_404
-from django.http import HttpResponse
 from django.http import HttpResponseRedirect
+from django.http import JsonResponse
+from django.http import StreamingHttpResponse
+from django.http import HttpResponse
+from django.http import HttpResponseForbidden
+from django.http import HttpResponseNotAllowed
 from django.urls import reverse
+from django.db import IntegrityError, transaction
+import csv
 import datetime
-from django.contrib.auth.decorators import login_required, permission_required
+import itertools
 from catalog.forms import RenewBookForm
-from catalog.forms import RenewBookModelForm
 from catalog.forms import AuthorUpdateForm
 from catalog.forms import AuthorUpdateModelForm
 from catalog.forms import BookInstanceCreateForm
 from catalog.forms import BookInstanceUpdateForm
+from catalog.forms import BookModelForm
 from django.views.generic.edit import CreateView, UpdateView, DeleteView
-from django.urls import reverse_lazy
-from catalog.models import Author
-from django import forms
 from django.contrib import messages
-from django.http import JsonResponse
+from django.contrib.messages.views import SuccessMessageMixin
+from django.urls import reverse_lazy
+from django.views.decorators.http import require_POST
+from catalog import facets
+from catalog import holds
+from catalog import popularity
+from catalog.readmodels import iter_book_rows
+from catalog.dashboard import patron_dashboard
+from catalog.validators import To_ISBN13
+from catalog.url_builder import build_url
+from catalog.routers import primary_db_view
+from catalog import conditional
+from catalog import live
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from catalog.tasks import index_counts
+from django.utils.http import urlencode
 
 # Create your views here.
 def index(request):
     """View function for home page of site."""
 
-    # Generate counts of some of the main objects
-    # ManyToManyField to a related model requires .all()
-    num_books = Book.objects.all().count()
-    num_instances = BookInstance.objects.all().count()
-
-    # Available books (status = 'a')
-    num_instances_available = BookInstance.objects.filter(status__exact='a').count()
-
-    # Get count of books with Harry in the title AND in the Fantasy genre
-    harry_condition = Q(title__contains='Harry')
-    fantasy_condition = Q(genre__name__contains='Fantasy')
-    # Combine conditions using logical operators
-    # For 'AND' conditions, use '&' (bitwise AND)
-    # For 'OR' conditions, use '|' (bitwise OR)
-    # For 'NOT' conditions, use '~' (bitwise NOT)
-    combined_conditions = harry_condition & fantasy_condition
-    # Apply the filter to your model using the filter() method
-    num_books_harry_fantasy = Book.objects.filter(combined_conditions).count()
-
-    # The 'all()' is implied by default because it is not a ManyToManyField to a related model
-    num_authors = Author.objects.count()
+    # The counts are recomputed in the background by the 'recompute_catalog_counts' task (see catalog/tasks.py)
+    counts = index_counts()
 
     # Session Framework Implementation: Number of visits to this view, as counted in the session variable.
     num_visits = request.session.get('num_visits', 0)
     request.session['num_visits'] = num_visits + 1
 
     context = {
-        'num_books': num_books,
-        'num_books_harry_fantasy': num_books_harry_fantasy,
-        'num_instances': num_instances,
-        'num_instances_available': num_instances_available,
-        'num_authors': num_authors,
+        **counts,
         'num_visits': num_visits,
     }
 
     # Render the HTML template index.html with the data in the context variable
     return render(request, 'index.html', context=context)
 
+@method_decorator(conditional.conditional_page(conditional.book_list_changed), name='get') # ETag/Last-Modified, see conditional.py
 class BookListView(generic.ListView):
     model = Book
+    # Only load the columns book_list.html prints (no summary), and each book's author in the same query
+    queryset = Book.objects.select_related('author').only(
+        'id', 'title', 'author__id', 'author__first_name', 'author__last_name',
+    )
     context_object_name = 'book_list' # This is how we refer to it in jinja syntax in .html templates
     paginate_by = 10 # To access page 2 you would use the URL /catalog/books/?page=2
     
@@ -82,20 +84,54 @@ class BookListView(generic.ListView):
     #def get_queryset(self):
     #    return Book.objects.filter(title__icontains='Harry')[:3] # Get 3 books containing the title Harry
 
+    # Faceted browsing: books/?genre=<id>&language=<id>&author=<id>&available=1 (see catalog/facets.py)
+    def get_queryset(self):
+        self.filters = facets.selected_filters(self.request.GET)
+        return facets.filter_books(super(BookListView, self).get_queryset(), self.filters)
+
     # Override the built-in get_context_data function as an alternate way of doing "context = {}" similar to how we did with index() above
     def get_context_data(self, **kwargs):
         # Call the base implementation first to get the context
         context = super(BookListView, self).get_context_data(**kwargs)
         # Create any data and add it to the context
         context['some_data'] = 'This is just some data'
+        context['facets'] = facets.facet_options(self.filters)
+        # Keeps the selected filters in the pagination links (see base_generic.html)
+        context['page_query'] = urlencode(sorted(self.filters.items()))
         return context
 
+def isbn_lookup(request, isbn):
+    """View function returning the book with the given ISBN (ISBN-10 or ISBN-13, hyphens optional) as JSON."""
+    # A single lookup on the indexed isbn13 column, e.g. for barcode scanners
+    isbn13 = To_ISBN13(isbn)
+    book = None
+    if isbn13 is not None:
+        book = Book.objects.filter(isbn13=isbn13).values('id', 'title', 'isbn', 'isbn13', 'author_id').first()
+    if book is None:
+        return JsonResponse({'error': 'No book with this ISBN'}, status=404)
+    book['url'] = build_url('book-detail', book['id'])
+    return JsonResponse(book)
+
+@method_decorator(conditional.conditional_page(conditional.book_detail_changed), name='get')
 class BookDetailView(generic.DetailView):
     model = Book
     context_object_name = 'book_detail' # This is how we refer to it in jinja syntax in .html templates
 
+    def get_context_data(self, **kwargs):
+        context = super(BookDetailView, self).get_context_data(**kwargs)
+        # "Patrons also borrowed": precomputed by build_recommendations, one lookup on the (book, rank) index
+        context['recommendations'] = (
+            BookRecommendation.objects.filter(book=self.object)
+            .select_related('recommended')
+            .only('recommended__id', 'recommended__title')
+            .order_by('rank')
+        )
+        return context
+
+@method_decorator(conditional.conditional_page(conditional.author_list_changed), name='get')
 class AuthorListView(generic.ListView):
     model = Author
+    queryset = Author.objects.only('id', 'first_name', 'last_name') # The columns author_list.html prints
     context_object_name = 'author_list' # This is how we refer to it in jinja syntax in .html templates
     paginate_by = 10 # To access page 2 you would use the URL /catalog/authors/?page=2
 
@@ -103,17 +139,12 @@ class AuthorListView(generic.ListView):
     # How to reference the actual request and get access to associated session variable and...
     # How to have more flexibility with setting Context for templates
     def get(self, request, *args, **kwargs):
-        # Set the session variable
-        #request.session['author_changes'] = False
-        # The ABOVE is commented out because 'author_changes' is set before the page...
-        # ...is fully rendered, so the code that relies on it being True never fires.
-        # Instead we add some javascript to author_list.html and create a new view...
-        # ...called set_author_changes (see below) that simply acts as an endpoint...
-        # to set the session variable ['author_changes'] to False AFTER...
-        # author_list.html fully renders.
-
-        # Fetch data from the Book Model
-        all_books = Book.objects.all()
+        # Notifications after an edit ("Author data has been updated.") are one-shot messages rendered
+        # by base_generic.html (see author_update), so this view doesn't need to touch the session.
+
+        # Fetch data from the Book Model: only the columns needed to list an author's books (not the
+        # summary etc.). The queryset is lazy, so it is only run if the template uses it.
+        all_books = Book.objects.only('id', 'title', 'author_id')
 
         # Add additional context data here
         context = {
@@ -123,15 +154,12 @@ class AuthorListView(generic.ListView):
 
         return render(request, 'catalog/author_list.html', context)
 
-def set_author_changes(request):
-    request.session['author_changes'] = False
-    request.session.save()
-    return JsonResponse({'message': 'Author changes set to False'})
-
+@method_decorator(conditional.conditional_page(conditional.author_detail_changed), name='get')
 class AuthorDetailView(generic.DetailView):
     model = Author
     context_object_name = 'author_detail' # This is how we refer to it in jinja syntax in .html templates
 
+@method_decorator(conditional.conditional_page(conditional.bookinstance_list_changed), name='get')
 class BookInstanceListView(PermissionRequiredMixin, LoginRequiredMixin, generic.ListView):
     """Generic class-based view listing all books on loan. Only visible to users with can_mark_returned permission."""
     model = BookInstance
@@ -140,23 +168,50 @@ class BookInstanceListView(PermissionRequiredMixin, LoginRequiredMixin, generic.
     template_name = 'catalog/bookinstance_list_all.html'
     paginate_by = 50
 
-    #def get_queryset(self):
-    #    return BookInstance.objects.all()
+    def get_queryset(self):
+        # Only the columns bookinstance_list_all.html prints, with book and borrower loaded in the same query
+        return BookInstance.objects.select_related('book', 'borrower').only(
+            'id', 'status', 'due_back',
+            'book__id', 'book__title',
+            'borrower__id', 'borrower__first_name', 'borrower__last_name',
+        )
 
-class LoanedBooksByUserListView(LoginRequiredMixin, generic.ListView):
-    """Generic class-based view listing books on loan to current user."""
-    model = BookInstance
+class LoanedBooksByUserListView(LoginRequiredMixin, generic.list.MultipleObjectMixin, generic.TemplateView):
+    """Patron dashboard: the current user's loans, holds and loan history counts."""
     template_name = 'catalog/bookinstance_list_borrowed_user.html'
-    paginate_by = 10
+    context_object_name = 'loan_list'
+    paginate_by = 10 # The current loans are paged like the other lists: /catalog/mybooks/?page=2
 
-    # In order to restrict our query to just the BookInstance objects for the current user, we re-implement get_queryset()
-    def get_queryset(self):
-        return (
-            BookInstance.objects.filter(borrower=self.request.user)
-            .filter(status__exact='o')
-            .order_by('due_back')
-        )
+    def get_context_data(self, **kwargs):
+        # Counts and current loans: 2 queries at most, whatever the number of loans, cached per user.
+        # The page of loans is sliced from the cached list.
+        dashboard = patron_dashboard(self.request.user)
+        context = super(LoanedBooksByUserListView, self).get_context_data(object_list=dashboard['loans'], **kwargs)
+        context['summary'] = dashboard['summary']
+        # The user's waiting and fulfilled holds, with their queue positions computed in the same query.
+        # Not cached: the queue positions change whenever other patrons' holds do.
+        context['hold_list'] = holds.with_queue_position(
+            Hold.objects.filter(patron=self.request.user, status__in=['w', 'f']).select_related('book', 'copy')
+        ).order_by('status', 'placed_at')
+        return context
+
+@login_required
+@require_POST
+def place_hold(request, pk):
+    """View function for putting the current user in the hold queue for a Book."""
+    book = get_object_or_404(Book, pk=pk)
+    holds.place_hold(book, request.user)
+    return HttpResponseRedirect(reverse('my-borrowed'))
+
+@login_required
+@require_POST
+def cancel_hold(request, pk):
+    """View function for cancelling one of the current user's holds."""
+    hold = get_object_or_404(Hold, pk=pk, patron=request.user, status__in=['w', 'f'])
+    holds.cancel_hold(hold)
+    return HttpResponseRedirect(reverse('my-borrowed'))
     
+@method_decorator(conditional.conditional_page(conditional.bookinstance_list_changed), name='get')
 class LoanedBooksAllListView(PermissionRequiredMixin, generic.ListView):
     """Generic class-based view listing all books on loan. Only visible to users with can_mark_returned permission."""
     model = BookInstance
@@ -165,10 +220,37 @@ class LoanedBooksAllListView(PermissionRequiredMixin, generic.ListView):
     paginate_by = 10
 
     def get_queryset(self):
-        return BookInstance.objects.filter(status__exact='o').order_by('due_back')
+        return (
+            BookInstance.objects.filter(status__exact='o')
+            .select_related('book', 'borrower')
+            .only('id', 'due_back', 'book__id', 'book__title', 'borrower__id', 'borrower__first_name', 'borrower__last_name')
+            .order_by('due_back')
+        )
+
+@login_required
+@permission_required('catalog.can_mark_returned', raise_exception=True)
+def export_books_csv(request):
+    """View function streaming the whole catalog (optionally filtered like books/) as a CSV file."""
+    books = facets.filter_books(Book.objects.all(), facets.selected_filters(request.GET))
+    # csv.writer only needs an object with a write() method; returning the line lets us stream it
+    writer = csv.writer(Echo())
+    rows = (
+        writer.writerow([row.id, row.title, row.author_name, row.isbn, row.language or ''])
+        for row in iter_book_rows(books)
+    )
+    header = writer.writerow(['id', 'title', 'author', 'isbn', 'language'])
+    response = StreamingHttpResponse(itertools.chain([header], rows), content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="books.csv"'
+    return response
+
+class Echo:
+    """File-like object that returns what is written to it instead of storing it (used by export_books_csv)."""
+    def write(self, value):
+        return value
     
 @login_required
 @permission_required('catalog.can_mark_returned', raise_exception=True)
+@primary_db_view # Read from the primary database, not a read replica (see routers.py)
 def renew_book_librarian(request, pk):
     """View function for renewing a specific BookInstance by librarian."""
     book_instance = get_object_or_404(BookInstance, pk=pk)
@@ -188,7 +270,11 @@ def renew_book_librarian(request, pk):
             # Process the data in form.cleaned_data as required (here we just write it to the model due_back field)
             book_instance.due_back = form.cleaned_data['new_due_date']
             book_instance.borrower = form.cleaned_data['new_borrower']
-            book_instance.save()
+            # UPDATE only due_back/borrower if they changed, and nothing at all if they didn't
+            if book_instance.save_changes():
+                messages.success(request, f'The loan has been renewed until {book_instance.due_back}.')
+            else:
+                messages.info(request, 'No changes were made.')
 
             # redirect to a new URL:
             return HttpResponseRedirect(reverse('all-borrowed'))
@@ -212,6 +298,21 @@ def renew_book_librarian(request, pk):
     return render(request, 'catalog/book_renew_librarian.html', context)
 
 
+class MinimalWriteUpdateMixin(SuccessMessageMixin):
+    """UpdateView mixin saving only the changed columns, and nothing at all (no UPDATE, no signals, no
+    revision) when the submitted form didn't change anything. See TimestampedModel.save_changes()."""
+    no_changes_message = 'No changes were made.'
+
+    def form_valid(self, form):
+        self.object = form.save(commit=False)
+        changed = self.object.save_changes()
+        form.save_m2m() # Many-to-many fields (e.g. Book.genre) only add/remove the rows that differ
+        if changed or form.has_changed():
+            messages.success(self.request, self.get_success_message(form.cleaned_data))
+        else:
+            messages.info(self.request, self.no_changes_message)
+        return HttpResponseRedirect(self.get_success_url())
+
 #### BEGIN Views to Create/Update/Delete Authors ####
 # IMPORTANT NOTE: CreateView, UpdateView, and DeleteView all use the same syntax as
 # ModelForm in forms.py
@@ -221,25 +322,30 @@ def renew_book_librarian(request, pk):
 # In this case that would be author_confirm_delete.html
 @method_decorator(login_required, name='dispatch') # IMPORTANT NOTE: "dispatch" is the method of the class view that is being targeted by the @method_decorator decorator.
 @method_decorator(permission_required('catalog.can_mark_returned'), name='dispatch')
-class AuthorCreate(CreateView):
+@method_decorator(primary_db_view, name='dispatch') # Read from the primary database, not a read replica (see routers.py)
+class AuthorCreate(SuccessMessageMixin, CreateView):
     model = Author
     fields = ['first_name', 'last_name', 'date_of_birth', 'date_of_death']
     template_name = 'catalog/author_form.html'
     initial = {'date_of_death': '11/06/2020'}
     success_url = reverse_lazy('authors') # After form is submitted, page redirects to author_list.html
+    success_message = 'Author %(first_name)s %(last_name)s has been created.' # One-shot notification shown on the next page (see base_generic.html)
     context_object_name = 'author_object'
 
 @method_decorator(login_required, name='dispatch') # IMPORTANT NOTE: "dispatch" is the method of the class view that is being targeted by the @method_decorator decorator.
 @method_decorator(permission_required('catalog.can_mark_returned'), name='dispatch')
-class AuthorUpdate(UpdateView):
+@method_decorator(primary_db_view, name='dispatch') # Read from the primary database, not a read replica (see routers.py)
+class AuthorUpdate(MinimalWriteUpdateMixin, UpdateView):
     model = Author
     form_class = AuthorUpdateModelForm # Use the custom form class from forms.py
     template_name = 'catalog/author_form.html'
     success_url = reverse_lazy('authors') # After form is submitted, page redirects to author_list.html
+    success_message = 'Author data has been updated.'
     context_object_name = 'author_object'
     
 @login_required
 @permission_required('catalog.can_mark_returned', raise_exception=True)
+@primary_db_view # Read from the primary database, not a read replica (see routers.py)
 def author_update(request, pk):
     author_object = get_object_or_404(Author, pk=pk)
 
@@ -247,14 +353,8 @@ def author_update(request, pk):
     if request.method == 'POST':
         # Create a form instance and populate it with data from the request (binding):
         form = AuthorUpdateForm(
-            author_id=pk,
+            author=author_object,
             data=request.POST,  # Pass the POST data to the form
-            initial={
-                'first_name': author_object.first_name,
-                'last_name': author_object.last_name,
-                'date_of_birth': author_object.date_of_birth,
-                'date_of_death': author_object.date_of_death
-            },
         )
 
         # Check if the form is valid:
@@ -265,12 +365,12 @@ def author_update(request, pk):
                 author_object.last_name = form.cleaned_data['updated_last_name']
                 author_object.date_of_birth = form.cleaned_data['updated_date_of_birth']
                 author_object.date_of_death = form.cleaned_data['updated_date_of_death']
-                author_object.save()
+                # UPDATE only the columns that changed (see TimestampedModel.save_changes in models.py)
+                author_object.save_changes()
 
-                # Set a session variable to indicate changes
-                # author_changes can be referenced no matter what template we end up navigating to
-                # In this app, author_changes is referenced in author_list.html
-                request.session['author_changes'] = True
+                # One-shot notification shown by whatever page we end up on (here author_list.html), see base_generic.html.
+                # Stored in a cookie (MESSAGE_STORAGE in settings.py) and consumed on render: no session writes.
+                messages.success(request, 'Author data has been updated.')
 
                 # Redirect to a new URL:
                 #return HttpResponseRedirect(reverse('authors'))
@@ -280,19 +380,11 @@ def author_update(request, pk):
 
             else:
                 # No changes were made, show a toast notification
-                return render(request, 'catalog/author_form.html', {'form': form, 'author_object': author_object, 'no_changes': True})
-                #messages.info(request, 'No changes were made.')
+                messages.warning(request, 'No changes were made.')
+                return render(request, 'catalog/author_form.html', {'form': form, 'author_object': author_object})
     else:
         # This is a GET request or other method, create the form without POST data
-        form = AuthorUpdateForm(
-            author_id=pk,
-            initial={
-                'first_name': author_object.first_name,
-                'last_name': author_object.last_name,
-                'date_of_birth': author_object.date_of_birth,
-                'date_of_death': author_object.date_of_death
-            },
-        )
+        form = AuthorUpdateForm(author=author_object)
 
     context = {
         'form': form,
@@ -303,39 +395,58 @@ def author_update(request, pk):
 
 @method_decorator(login_required, name='dispatch') # IMPORTANT NOTE: "dispatch" is the method of the class view that is being targeted by the @method_decorator decorator.
 @method_decorator(permission_required('catalog.can_mark_returned'), name='dispatch')
-class AuthorDelete(DeleteView):
+@method_decorator(primary_db_view, name='dispatch') # Read from the primary database, not a read replica (see routers.py)
+class AuthorDelete(SuccessMessageMixin, DeleteView):
     model = Author
     template_name = 'catalog/author_confirm_delete.html'
     success_url = reverse_lazy('authors') # After form is submitted, page redirects to author_list.html
+    success_message = 'The author has been deleted.'
     context_object_name = 'author_object'
 #### END Views to Create/Update/Delete Authors ####
 
 
 #### BEGIN Views to Create/Update/Delete Books ####
+class DuplicateISBNMixin:
+    """Book form view mixin: a duplicate ISBN that got past BookModelForm.clean_isbn() (a book saved
+    with the same ISBN in the meantime) fails the unique constraint on Book.isbn13. Show it as a form error."""
+    def form_valid(self, form):
+        try:
+            with transaction.atomic():
+                return super().form_valid(form)
+        except IntegrityError:
+            form.add_error('isbn', 'This ISBN is already in the catalog.')
+            return self.form_invalid(form)
+
 @method_decorator(login_required, name='dispatch') # IMPORTANT NOTE: "dispatch" is the method of the class view that is being targeted by the @method_decorator decorator.
 @method_decorator(permission_required('catalog.can_mark_returned'), name='dispatch')
-class BookCreate(CreateView):
+@method_decorator(primary_db_view, name='dispatch') # Read from the primary database, not a read replica (see routers.py)
+class BookCreate(DuplicateISBNMixin, SuccessMessageMixin, CreateView):
     model = Book
-    fields = ['title', 'author', 'summary', 'isbn', 'genre', 'language']
+    form_class = BookModelForm # Use the custom form class from forms.py (ISBN validation and duplicate detection)
     template_name = 'catalog/book_form.html'
     success_url = reverse_lazy('books') # After form is submitted, page redirects to book_list.html
+    success_message = 'Book "%(title)s" has been created.'
     context_object_name = 'book_object'
 
 @method_decorator(login_required, name='dispatch') # IMPORTANT NOTE: "dispatch" is the method of the class view that is being targeted by the @method_decorator decorator.
 @method_decorator(permission_required('catalog.can_mark_returned'), name='dispatch')
-class BookUpdate(UpdateView):
+@method_decorator(primary_db_view, name='dispatch') # Read from the primary database, not a read replica (see routers.py)
+class BookUpdate(DuplicateISBNMixin, MinimalWriteUpdateMixin, UpdateView):
     model = Book
-    fields = ['title', 'author', 'summary', 'isbn', 'genre', 'language']
+    form_class = BookModelForm # Use the custom form class from forms.py (ISBN validation and duplicate detection)
     template_name = 'catalog/book_form.html'
     success_url = reverse_lazy('books') # After form is submitted, page redirects to book_list.html
+    success_message = 'Book "%(title)s" has been updated.'
     context_object_name = 'book_object'
 
 @method_decorator(login_required, name='dispatch') # IMPORTANT NOTE: "dispatch" is the method of the class view that is being targeted by the @method_decorator decorator.
 @method_decorator(permission_required('catalog.can_mark_returned'), name='dispatch')
-class BookDelete(DeleteView):
+@method_decorator(primary_db_view, name='dispatch') # Read from the primary database, not a read replica (see routers.py)
+class BookDelete(SuccessMessageMixin, DeleteView):
     model = Book
     template_name = 'catalog/book_confirm_delete.html'
     success_url = reverse_lazy('books') # After form is submitted, page redirects to book_list.html
+    success_message = 'The book has been deleted.'
     context_object_name = 'book_object'
 #### END Views to Create/Update/Delete Books ####
 
@@ -343,27 +454,120 @@ class BookDelete(DeleteView):
 #### BEGIN Views to Create/Update/Delete BookInstances ####
 @method_decorator(login_required, name='dispatch') # IMPORTANT NOTE: "dispatch" is the method of the class view that is being targeted by the @method_decorator decorator.
 @method_decorator(permission_required('catalog.can_mark_returned'), name='dispatch')
-class BookInstanceCreate(CreateView):
+@method_decorator(primary_db_view, name='dispatch') # Read from the primary database, not a read replica (see routers.py)
+class BookInstanceCreate(SuccessMessageMixin, CreateView):
     model = BookInstance
     context_object_name = 'bookinstance_object'
     form_class = BookInstanceCreateForm  # Use the custom form class from forms.py
     template_name = 'catalog/bookinstance_form.html'
     success_url = reverse_lazy('bookinstances') # After form is submitted, page redirects to book_list.html
+    success_message = 'The copy has been created.'
 
 @method_decorator(login_required, name='dispatch') # IMPORTANT NOTE: "dispatch" is the method of the class view that is being targeted by the @method_decorator decorator.
 @method_decorator(permission_required('catalog.can_mark_returned'), name='dispatch')
-class BookInstanceUpdate(UpdateView):
+@method_decorator(primary_db_view, name='dispatch') # Read from the primary database, not a read replica (see routers.py)
+class BookInstanceUpdate(MinimalWriteUpdateMixin, UpdateView):
     model = BookInstance
     context_object_name = 'bookinstance_object'
     form_class = BookInstanceUpdateForm  # Use the custom form class from forms.py
     template_name = 'catalog/bookinstance_form.html'
     success_url = reverse_lazy('bookinstances') # After form is submitted, page redirects to book_list.html
+    success_message = 'The copy has been updated.'
 
 @method_decorator(login_required, name='dispatch') # IMPORTANT NOTE: "dispatch" is the method of the class view that is being targeted by the @method_decorator decorator.
 @method_decorator(permission_required('catalog.can_mark_returned'), name='dispatch')
-class BookInstanceDelete(DeleteView):
+@method_decorator(primary_db_view, name='dispatch') # Read from the primary database, not a read replica (see routers.py)
+class BookInstanceDelete(SuccessMessageMixin, DeleteView):
     model = BookInstance
     context_object_name = 'bookinstance_object'
     template_name = 'catalog/bookinstance_confirm_delete.html'
     success_url = reverse_lazy('bookinstances') # After form is submitted, page redirects to book_list.html
+    success_message = 'The copy has been deleted.'
 #### END Views to Create/Update/Delete BookInstances ####
+
+def popular(request):
+    """View function for the most borrowed books, authors and genres (today, this week or of all time)."""
+    window = request.GET.get('window', 'w')
+    if window not in popularity.HALF_LIVES:
+        window = 'w'
+    context = {
+        'window': window,
+        'windows': PopularityScore.WINDOW,
+        # Each list is one index range scan of the ranking table plus one lookup of the names
+        'popular_books': popularity.top('b', window),
+        'popular_authors': popularity.top('a', window),
+        'popular_genres': popularity.top('g', window),
+    }
+    return render(request, 'catalog/popular.html', context=context)
+
+#### BEGIN Request Profile Views ####
+# Profiles recorded by catalog.profiling.RequestProfilingMiddleware (add ?_profile to any URL as a staff user)
+@method_decorator(staff_member_required, name='dispatch')
+class RequestProfileListView(generic.ListView):
+    """Generic class-based view listing the recent request profiles. Staff only."""
+    model = RequestProfile
+    paginate_by = 20
+
+    def get_queryset(self):
+        # The function and query lists can be large; they are only shown on the detail page
+        return RequestProfile.objects.defer('functions', 'queries').select_related('user')
+
+@method_decorator(staff_member_required, name='dispatch')
+class RequestProfileDetailView(generic.DetailView):
+    """Generic class-based view for a request profile: its slowest functions and queries. Staff only."""
+    model = RequestProfile
+#### END Request Profile Views ####
+
+#### BEGIN Live Update Views ####
+async def copy_events(request):
+    """Async view streaming the copy status changes of ?book=<id> (or of all books, for librarians) as server-sent events."""
+    # Not @require_GET: Django's view decorators only support async views from Django 5.0
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    if not isinstance(request, ASGIRequest):
+        # A stream would hold a WSGI worker for as long as the page is open: 204 tells EventSource to stop
+        return HttpResponse(status=204)
+    book_id = request.GET.get('book', '')
+    if book_id:
+        if not book_id.isdigit():
+            return HttpResponse('book must be a book id', status=400, content_type='text/plain')
+        book_id = int(book_id)
+    else:
+        # Every copy of every book: only for the librarians' bookinstances/ page
+        # request.user loads the session and the user from the database: not in the event loop
+        can_manage = await sync_to_async(lambda: request.user.has_perm('catalog.can_mark_returned'))()
+        if not can_manage:
+            return HttpResponseForbidden()
+        book_id = live.ALL_BOOKS
+
+    response = StreamingHttpResponse(live.event_stream(book_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stops nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+#### END Live Update Views ####
+
+#### BEGIN Archive Views ####
+# Read-only views of the copies and loans moved to the archive tables (see catalog/archive.py)
+@method_decorator(staff_member_required, name='dispatch')
+class ArchivedBookInstanceListView(generic.ListView):
+    """Generic class-based view listing the archived copies. Staff only."""
+    model = ArchivedBookInstance
+    paginate_by = 20
+
+    def get_queryset(self):
+        return ArchivedBookInstance.objects.select_related('book')
+
+@method_decorator(staff_member_required, name='dispatch')
+class ArchivedBookInstanceDetailView(generic.DetailView):
+    """Generic class-based view for an archived copy and its archived loan history. Staff only."""
+    model = ArchivedBookInstance
+
+    def get_queryset(self):
+        return ArchivedBookInstance.objects.select_related('book')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['loan_list'] = ArchivedLoan.objects.filter(book_instance_id=self.object.pk).select_related('borrower')
+        return context
+#### END Archive Views ####
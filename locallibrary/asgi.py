@@ -5,6 +5,10 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.1/howto/deployment/asgi/
+
+The live copy availability streams (catalog/live.py) need an ASGI server, e.g.
+``uvicorn locallibrary.asgi:application``; under WSGI the pages work without live updates.
+DisconnectMiddleware ends a stream when its browser goes away.
 """
 
 import os
@@ -13,4 +17,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "locallibrary.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# After the setup done by get_asgi_application(): catalog.live imports the models
+from catalog.live import DisconnectMiddleware  # noqa: E402
+
+application = DisconnectMiddleware(django_application)
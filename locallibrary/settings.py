@@ -48,7 +48,10 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "catalog.throttling.ThrottleMiddleware",
+    "catalog.profiling.RequestProfilingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
+    "catalog.routers.ReplicaRoutingMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
@@ -83,6 +86,54 @@ DATABASES = {
     }
 }
 
+# Read replicas for the catalog app (see catalog/routers.py)
+# The catalog reads of safe requests go to the aliases in CATALOG_READ_REPLICAS, everything else goes to
+# "default". To try this locally, set LOCALLIBRARY_REPLICA_DB to the path of a copy of db.sqlite3 that is
+# kept in sync with it (e.g. with python manage.py backup_db). The "replica" alias is always defined so
+# that the tests can use it: they get a separate test database for it, which they sync themselves.
+DATABASE_ROUTERS = ['catalog.routers.CatalogReplicaRouter']
+DATABASES["replica"] = {
+    "ENGINE": "django.db.backends.sqlite3",
+    "NAME": os.environ.get('LOCALLIBRARY_REPLICA_DB', BASE_DIR / "db_replica.sqlite3"),
+}
+CATALOG_READ_REPLICAS = ["replica"] if os.environ.get('LOCALLIBRARY_REPLICA_DB') else []
+# Seconds a browser keeps reading from "default" after it wrote something (read-your-writes)
+CATALOG_REPLICA_STICKY_SECONDS = 5
+
+
+# Cache
+# The local memory cache is per process, which is fine for the development server. The production
+# profile uses a cache shared by all the workers (see catalog/shared_cache.py).
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+
+
+# Permission checks go through the backend that also caches each user's permissions across requests
+# (with a shared cache, see catalog/permissions.py), logins through ModelBackend as before, so the
+# existing sessions stay valid
+AUTHENTICATION_BACKENDS = [
+    'catalog.permissions.CachedPermissionBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+CATALOG_PERMISSION_CACHE_TIMEOUT = 300
+
+# One-shot notifications (django.contrib.messages) are kept in a cookie until they are shown, so
+# flashing one after an edit costs no session write
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
+# Rate limits of the expensive pages, set per URL name in catalog/urls.py (see catalog/throttling.py)
+CATALOG_THROTTLING = True
+
+# Primary keys of new book copies: 7 = time-ordered UUIDs (fast, compact indexes), 4 = random UUIDs
+# (see catalog/ids.py)
+CATALOG_COPY_ID_VERSION = 7
+
+# Staff users can profile any request by adding ?_profile to its URL (see catalog/profiling.py)
+CATALOG_PROFILING = True
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -120,6 +171,9 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+# Where "python manage.py collectstatic" collects the static files for production
+STATIC_ROOT = BASE_DIR / "staticfiles"
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
 
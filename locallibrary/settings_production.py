@@ -0,0 +1,73 @@
+"""
+Production settings profile for locallibrary.
+
+Select it with:
+    DJANGO_SETTINGS_MODULE=locallibrary.settings_production
+
+Everything not overridden here comes from locallibrary/settings.py.
+"""
+
+import copy
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+from .settings import MIDDLEWARE, TEMPLATES
+
+# SECURITY WARNING: keep the secret key used in production secret!
+# Never fall back to the development key, which is in the repository
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', '')
+if not SECRET_KEY:
+    raise ImproperlyConfigured('Set the DJANGO_SECRET_KEY environment variable for the production settings.')
+
+DEBUG = False
+
+ALLOWED_HOSTS = [host for host in os.environ.get('DJANGO_ALLOWED_HOSTS', 'localhost').split(',') if host]
+
+# Cache shared by all the worker processes: the catalog's cache invalidations and rate limits must be
+# seen by every worker (see catalog/shared_cache.py). Needs the redis package (pip install redis).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/0'),
+        'KEY_PREFIX': 'locallibrary',
+    }
+}
+
+# Templates
+# Enable the cached loader explicitly so that every template is read from disk and compiled only
+# once per process. APP_DIRS must be False when 'loaders' is given, so the app_directories loader
+# is listed explicitly instead.
+TEMPLATES = copy.deepcopy(TEMPLATES)
+TEMPLATES[0]['APP_DIRS'] = False
+TEMPLATES[0]['OPTIONS']['loaders'] = [
+    ('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]),
+]
+
+# Pre-compile all catalog and registration templates in CatalogConfig.ready() (see catalog/apps.py)
+# so that the first request served by a fresh worker doesn't pay for template parsing.
+CATALOG_TEMPLATE_WARMUP = True
+
+# Static files
+# collectstatic writes content-hashed copies of every file (styles.3f2a9c1b.css, cacheable forever)
+# plus pre-compressed .gz/.br versions of them (see catalog/storage.py).
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'catalog.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
+# Serve STATIC_ROOT from the Django process (see catalog/static_middleware.py). Set
+# CATALOG_SERVE_STATIC=0 when a front proxy or CDN serves /static/ instead.
+CATALOG_SERVE_STATIC = os.environ.get('CATALOG_SERVE_STATIC', '1') == '1'
+MIDDLEWARE = list(MIDDLEWARE)
+# Right after SecurityMiddleware, so static requests skip sessions, auth etc.
+MIDDLEWARE.insert(MIDDLEWARE.index('django.middleware.security.SecurityMiddleware') + 1,
+                  'catalog.static_middleware.StaticFilesMiddleware')
@@ -26,7 +26,8 @@ urlpatterns = [
     path('', RedirectView.as_view(url='catalog/', permanent=True)), # Redirect website root http://127.0.0.1:8000/ to http://127.0.0.1:8000/catalog/
 ]
 
-# Serve static files during development
+# Serve static files during development (static() does nothing when DEBUG is False; in production the
+# files are served by catalog.static_middleware.StaticFilesMiddleware or a front proxy, see settings_production.py)
 urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
 
 # Add Django site authentication urls (for login, logout, password management)